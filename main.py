@@ -1,10 +1,33 @@
 """
 Woodgate CLI (command line interface).
 """
+import os
+import sys
+import json
 from absl import app
 from absl import flags
 
 from woodgate.woodgate_process import WoodgateProcess
+from woodgate.trainer.trainer import Trainer
+from woodgate.trainer.autotuner import Autotuner
+from woodgate.trainer.distiller import Distiller
+from woodgate.trainer.warm_starter import WarmStarter
+from woodgate.trainer.pruner import Pruner
+from woodgate.trainer.factorizer import Factorizer
+from woodgate.trainer.artifact_store import ArtifactStore
+from woodgate.serving.predictor import Predictor
+from woodgate.serving.server import (
+    MicroBatcher,
+    InferenceServer,
+    MultiModelServer
+)
+from woodgate.serving.model_registry import ModelRegistry
+from woodgate.serving.prediction_cache import PredictionCache
+from woodgate.serving.batch_predictor import BatchPredictor
+from woodgate.runtime_profile import RuntimeProfile
+from woodgate.compiler.compiler import Compiler
+from woodgate.tuning.sweep import Sweep
+from woodgate.tuning.successive_halving import SuccessiveHalving
 from woodgate.woodgate_settings import (
     Architecture,
     Build,
@@ -95,6 +118,21 @@ flags.DEFINE_enum(
     """
 )
 
+flags.DEFINE_integer(
+    "adapter_size",
+    None,
+    """
+    #: The `--adapter_size` flag represents the hidden size of
+    #: the adapter modules inserted into each BERT encoder. When
+    #: the `--adapter_size` flag is set, the original BERT
+    #: weights (except the layer norms) are frozen and only the
+    #: adapter modules and the classifier head are trained. If
+    #: the `--adapter_size` flag is not set, then all BERT
+    #: weights are fine tuned.
+    """,
+    lower_bound=1
+)
+
 # Trainer
 flags.DEFINE_float(
     "validation_split",
@@ -157,6 +195,805 @@ flags.DEFINE_boolean(
     """
 )
 
+flags.DEFINE_integer(
+    "early_stopping_patience",
+    None,
+    """
+    #: The `--early_stopping_patience` flag represents the number
+    #: of epochs without improvement of the
+    #: `--early_stopping_monitor` metric after which training is
+    #: stopped and the best weights are restored. If the
+    #: `--early_stopping_patience` flag is not set, then early
+    #: stopping is disabled.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_string(
+    "early_stopping_monitor",
+    "val_loss",
+    """
+    #: The `--early_stopping_monitor` flag represents the name of
+    #: the metric watched for early stopping, as it appears in
+    #: `buildHistory.json`. If the `--early_stopping_monitor`
+    #: flag is not set, then `--early_stopping_monitor` will
+    #: default to `val_loss`.
+    """
+)
+
+flags.DEFINE_float(
+    "time_budget",
+    None,
+    """
+    #: The `--time_budget` flag represents the wall clock budget
+    #: (in seconds) for training. Training stops once the budget
+    #: is spent. If the `--time_budget` flag is not set, then
+    #: training is not time limited.
+    """,
+    lower_bound=1.0
+)
+
+flags.DEFINE_boolean(
+    "autotune",
+    False,
+    """
+    #: The `--autotune` flag represents a boolean value. This
+    #: value indicates whether or not a short calibration phase
+    #: is run before training to select the batch size with the
+    #: highest throughput on the host. When set, `--batch_size`
+    #: is ignored. If the `--autotune` flag is unset, then
+    #: `--autotune` will default to `False`.
+    """
+)
+
+flags.DEFINE_list(
+    "autotune_batch_sizes",
+    ["8", "16", "32", "64"],
+    """
+    #: The `--autotune_batch_sizes` flag represents a comma
+    #: separated list of the batch sizes tried by `--autotune`.
+    #: If the `--autotune_batch_sizes` flag is not set, then
+    #: `--autotune_batch_sizes` will default to `8,16,32,64`.
+    """
+)
+
+flags.DEFINE_integer(
+    "autotune_memory_limit",
+    None,
+    """
+    #: The `--autotune_memory_limit` flag represents the maximum
+    #: peak resident memory (in MB) a batch size tried by
+    #: `--autotune` may reach. If the `--autotune_memory_limit`
+    #: flag is not set, then batch sizes are not limited by
+    #: memory.
+    """,
+    lower_bound=1
+)
+
+# Distillation
+flags.DEFINE_string(
+    "teacher_model_uuid",
+    None,
+    """
+    #: The `--teacher_model_uuid` flag represents the
+    #: `--model_uuid` of a previous (larger) build used as the
+    #: teacher for knowledge distillation. When the
+    #: `--teacher_model_uuid` flag is set, the model is trained on
+    #: a blend of hard labels and the temperature scaled outputs
+    #: of the teacher.
+    """
+)
+
+flags.DEFINE_string(
+    "teacher_build_version",
+    None,
+    """
+    #: The `--teacher_build_version` flag represents the build
+    #: version (`%Y%m%d%H%M%S`) of the teacher build. If not set,
+    #: the latest build of `--teacher_model_uuid` is used.
+    """
+)
+
+flags.DEFINE_float(
+    "distillation_alpha",
+    0.5,
+    """
+    #: The `--distillation_alpha` flag represents the weight of
+    #: the hard label loss, the teacher loss is weighted by
+    #: `1 - alpha`. If the `--distillation_alpha` flag is not
+    #: set, then `--distillation_alpha` defaults to `0.5`.
+    """,
+    lower_bound=0.0,
+    upper_bound=1.0
+)
+
+flags.DEFINE_float(
+    "distillation_temperature",
+    2.0,
+    """
+    #: The `--distillation_temperature` flag represents the
+    #: softmax temperature applied to the teacher and student
+    #: logits. If the `--distillation_temperature` flag is not
+    #: set, then `--distillation_temperature` defaults to `2.0`.
+    """,
+    lower_bound=1.0
+)
+
+# Warm start
+flags.DEFINE_boolean(
+    "warm_start",
+    False,
+    """
+    #: The `--warm_start` flag represents whether or not the
+    #: build is initialized from a previous build of the same
+    #: `--model_name` and `--model_uuid` instead of the stock
+    #: BERT checkpoint. Logits of intents known to the previous
+    #: build are kept, only new intents are initialized. If the
+    #: `--warm_start` flag is not set, then `--warm_start`
+    #: defaults to `False`.
+    """
+)
+
+flags.DEFINE_string(
+    "warm_start_build_version",
+    None,
+    """
+    #: The `--warm_start_build_version` flag represents the build
+    #: version (`%Y%m%d%H%M%S`) of the previous build. If the
+    #: `--warm_start_build_version` flag is not set, then the
+    #: latest previous build is used.
+    """
+)
+
+flags.DEFINE_integer(
+    "warm_start_epochs",
+    1,
+    """
+    #: The `--warm_start_epochs` flag represents the number of
+    #: epochs of a warm started build, it replaces `--epochs`.
+    #: If the `--warm_start_epochs` flag is not set, then
+    #: `--warm_start_epochs` defaults to `1`.
+    """,
+    lower_bound=1
+)
+
+# Optimizer
+flags.DEFINE_enum(
+    "optimizer",
+    "Adam",
+    [
+        "Adam", "Adamax", "Adadelta", "Adagrad", "Ftrl", "SGD",
+        "RMSprop", "AdamW", "LAMB", "Adafactor"
+    ],
+    """
+    #: The `--optimizer` flag represents the optimizer used to fit
+    #: the model. `AdamW` and `LAMB` decouple the weight decay
+    #: from the gradient, `LAMB` also scales each update to the
+    #: weight norm, which allows batch sizes of several hundred
+    #: examples. `Adafactor` keeps factored second moments and no
+    #: first moment, which saves most of the optimizer memory of
+    #: `Adam`. If the `--optimizer` flag is not set, then
+    #: `--optimizer` defaults to `Adam`.
+    """
+)
+
+flags.DEFINE_float(
+    "learning_rate",
+    1e-5,
+    """
+    #: The `--learning_rate` flag represents the learning rate of
+    #: the `--optimizer`. If the `--learning_rate` flag is not
+    #: set, then `--learning_rate` defaults to `1e-5`.
+    """,
+    lower_bound=0.0
+)
+
+flags.DEFINE_float(
+    "weight_decay_rate",
+    0.01,
+    """
+    #: The `--weight_decay_rate` flag represents the decoupled
+    #: weight decay rate of the `AdamW` and `LAMB` optimizers.
+    #: Biases and layer norms are not decayed. If the
+    #: `--weight_decay_rate` flag is not set, then
+    #: `--weight_decay_rate` defaults to `0.01`.
+    """,
+    lower_bound=0.0
+)
+
+flags.DEFINE_enum(
+    "learning_rate_schedule",
+    "constant",
+    ["constant", "linear", "cosine", "polynomial"],
+    """
+    #: The `--learning_rate_schedule` flag represents the learning
+    #: rate schedule of the `--optimizer`. Every schedule but
+    #: `constant` warms up linearly to `--learning_rate` and then
+    #: decays to zero over the training steps derived from the
+    #: dataset size, `--batch_size` and `--epochs`. If the
+    #: `--learning_rate_schedule` flag is not set, then
+    #: `--learning_rate_schedule` defaults to `constant`.
+    """
+)
+
+flags.DEFINE_float(
+    "warmup_proportion",
+    0.1,
+    """
+    #: The `--warmup_proportion` flag represents the proportion of
+    #: the training steps over which the learning rate warms up.
+    #: If the `--warmup_proportion` flag is not set, then
+    #: `--warmup_proportion` defaults to `0.1`.
+    """,
+    lower_bound=0.0,
+    upper_bound=1.0
+)
+
+flags.DEFINE_enum(
+    "compile_profile",
+    "default",
+    ["default", "throughput", "low-memory", "debug"],
+    """
+    #: The `--compile_profile` flag represents a named bundle of
+    #: compile settings (steps per execution, XLA, precision
+    #: policy and eager execution). `throughput` runs several
+    #: steps per call with XLA, `low-memory` trains in bfloat16
+    #: mixed precision and `debug` runs eagerly. If the
+    #: `--compile_profile` flag is not set, then
+    #: `--compile_profile` defaults to `default`.
+    """
+)
+
+flags.DEFINE_boolean(
+    "compile_benchmark",
+    False,
+    """
+    #: The `--compile_benchmark` flag represents whether or not a
+    #: smoke benchmark of the `--compile_profile` is run before
+    #: training. The step time is logged and recorded in
+    #: `compileProfile.json`. If the `--compile_benchmark` flag is
+    #: not set, then `--compile_benchmark` defaults to `False`.
+    """
+)
+
+# Export
+flags.DEFINE_boolean(
+    "export_serving_model",
+    False,
+    """
+    #: The `--export_serving_model` flag represents whether or
+    #: not a serving SavedModel with in-graph tokenization is
+    #: exported to `$BUILD_DIR/serving_model` in addition to the
+    #: build. Its serving signature takes raw utterances, so
+    #: clients need neither `vocab.txt` nor the `Preprocessor`.
+    #: If the `--export_serving_model` flag is not set, then
+    #: `--export_serving_model` defaults to `False`.
+    """
+)
+
+flags.DEFINE_enum(
+    "tflite_quantization",
+    None,
+    ["dynamic", "int8"],
+    """
+    #: The `--tflite_quantization` flag represents the post
+    #: training quantization of a TFLite model exported to
+    #: `$BUILD_DIR/model.tflite` alongside the build. `dynamic`
+    #: quantizes the weights to int8, `int8` also quantizes the
+    #: activations, calibrated on the training tokens. The
+    #: accuracy delta and latency speedup on the regression data
+    #: are written to `quantizationReport.json`. If the
+    #: `--tflite_quantization` flag is not set, then no TFLite
+    #: model is exported.
+    """
+)
+
+# Runtime
+flags.DEFINE_integer(
+    "inter_op_threads",
+    None,
+    """
+    #: The `--inter_op_threads` flag represents the size of the
+    #: TensorFlow thread pool running independent operations. If
+    #: the `--inter_op_threads` flag is not set, then TensorFlow
+    #: chooses the size.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "intra_op_threads",
+    None,
+    """
+    #: The `--intra_op_threads` flag represents the size of the
+    #: TensorFlow thread pool used within a single operation. If
+    #: the `--intra_op_threads` flag is not set, then the number
+    #: of `--cpu_affinity` CPUs is used, or TensorFlow chooses the
+    #: size if the process is not pinned.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_list(
+    "cpu_affinity",
+    None,
+    """
+    #: The `--cpu_affinity` flag represents a comma separated list
+    #: of the CPUs the build process is pinned to, e.g. `0,1,2,3`.
+    #: If the `--cpu_affinity` flag is not set, then the process
+    #: is not pinned.
+    """
+)
+
+flags.DEFINE_enum(
+    "onednn",
+    "default",
+    ["default", "on", "off"],
+    """
+    #: The `--onednn` flag represents whether or not TensorFlow
+    #: oneDNN optimizations are enabled. If the `--onednn` flag is
+    #: not set, then the TensorFlow default is kept. Otherwise the
+    #: process is restarted with the setting in its environment.
+    """
+)
+
+flags.DEFINE_boolean(
+    "runtime_benchmark",
+    False,
+    """
+    #: The `--runtime_benchmark` flag represents whether or not a
+    #: short matrix multiplication benchmark of the runtime
+    #: settings is recorded in `runtimeProfile.json`. If the
+    #: `--runtime_benchmark` flag is not set, then
+    #: `--runtime_benchmark` defaults to `False`.
+    """
+)
+
+# Sweep
+flags.DEFINE_string(
+    "sweep_space",
+    "{}",
+    """
+    #: The `--sweep_space` flag represents the search space of
+    #: `main.py sweep` as a JSON object mapping hyperparameter
+    #: names to the list of values to try, e.g.
+    #: `{"learning_rate": [1e-5, 3e-5], "batch_size": [16, 32]}`.
+    #: Hyperparameters which are not swept keep their default
+    #: values.
+    """
+)
+
+flags.DEFINE_integer(
+    "sweep_workers",
+    1,
+    """
+    #: The `--sweep_workers` flag represents the maximum number of
+    #: trials `main.py sweep` runs at the same time. If the
+    #: `--sweep_workers` flag is not set, then `--sweep_workers`
+    #: defaults to `1`.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_enum(
+    "sweep_scheduler",
+    "grid",
+    ["grid", "successive_halving", "hyperband"],
+    """
+    #: The `--sweep_scheduler` flag represents how `main.py sweep`
+    #: schedules trials. `grid` runs every trial for `epochs`
+    #: epochs, `successive_halving` and `hyperband` give trials a
+    #: small epoch budget and only promote the best trials to
+    #: larger budgets. If the `--sweep_scheduler` flag is not set,
+    #: then `--sweep_scheduler` defaults to `grid`.
+    """
+)
+
+flags.DEFINE_integer(
+    "sweep_min_epochs",
+    1,
+    """
+    #: The `--sweep_min_epochs` flag represents the smallest epoch
+    #: budget given to a trial by `--sweep_scheduler`.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "sweep_max_epochs",
+    9,
+    """
+    #: The `--sweep_max_epochs` flag represents the largest epoch
+    #: budget given to a trial by `--sweep_scheduler`.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "sweep_reduction_factor",
+    3,
+    """
+    #: The `--sweep_reduction_factor` flag represents the factor
+    #: by which `--sweep_scheduler` reduces the number of trials
+    #: (and increases the epoch budget) in each rung.
+    """,
+    lower_bound=2
+)
+
+flags.DEFINE_string(
+    "sweep_metric",
+    "val_loss",
+    """
+    #: The `--sweep_metric` flag represents the validation metric
+    #: used by `--sweep_scheduler` to rank trials. Metrics whose
+    #: name contains `loss` are minimized, others are maximized.
+    """
+)
+
+flags.DEFINE_float(
+    "prune_flops_ratio",
+    None,
+    """
+    #: The `--prune_flops_ratio` flag represents the encoder FLOPs
+    #: of the pruned model relative to the trained model. If set,
+    #: feed forward channels and encoder layers are pruned after
+    #: training.
+    """,
+    lower_bound=0,
+    upper_bound=1
+)
+
+flags.DEFINE_integer(
+    "prune_recovery_epochs",
+    1,
+    """
+    #: The `--prune_recovery_epochs` flag represents the number of
+    #: epochs the pruned model is fine tuned for.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_float(
+    "factorize_energy",
+    None,
+    """
+    #: The `--factorize_energy` flag represents the share of the
+    #: squared singular values kept by the low rank factorization
+    #: of the encoder dense layers. If set, the layers are
+    #: factorized after training.
+    """,
+    lower_bound=0,
+    upper_bound=1
+)
+
+flags.DEFINE_float(
+    "factorize_max_rank_ratio",
+    0.5,
+    """
+    #: The `--factorize_max_rank_ratio` flag represents the largest
+    #: cost of a factorized layer relative to its full kernel.
+    """,
+    lower_bound=0,
+    upper_bound=1
+)
+
+flags.DEFINE_float(
+    "factorize_max_accuracy_drop",
+    None,
+    """
+    #: The `--factorize_max_accuracy_drop` flag represents the
+    #: largest test accuracy drop of the factorization, above it
+    #: the full kernels are kept.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_list(
+    "factorize_targets",
+    None,
+    """
+    #: The `--factorize_targets` flag represents the encoder dense
+    #: layers which are factorized, e.g. `intermediate,output/dense`.
+    """
+)
+
+flags.DEFINE_integer(
+    "factorize_recovery_epochs",
+    0,
+    """
+    #: The `--factorize_recovery_epochs` flag represents the number
+    #: of epochs the factorized model is fine tuned for.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_boolean(
+    "artifact_store",
+    False,
+    """
+    #: The `--artifact_store` flag represents whether or not the
+    #: build artifacts are stored by content in `ARTIFACT_STORE_DIR`,
+    #: which shares unchanged weights across builds.
+    """
+)
+
+flags.DEFINE_integer(
+    "artifact_chunk_size",
+    4 * 1024 * 1024,
+    """
+    #: The `--artifact_chunk_size` flag represents the size in bytes
+    #: of the blobs of the artifact store.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_boolean(
+    "artifact_store_prune",
+    False,
+    """
+    #: The `--artifact_store_prune` flag represents whether or not
+    #: the stored artifacts are removed from the build directory,
+    #: they are checked out again by `Storage.load_model`.
+    """
+)
+
+flags.DEFINE_boolean(
+    "fast_model",
+    False,
+    """
+    #: The `--fast_model` flag represents whether or not to also
+    #: export a fast model, which is loaded from the model
+    #: configuration and memory mapped weights. `serve` loads the
+    #: fast model of the build if set. It is not supported with
+    #: `--factorize_energy`.
+    """
+)
+
+flags.DEFINE_boolean(
+    "cold_start_benchmark",
+    False,
+    """
+    #: The `--cold_start_benchmark` flag represents whether or not
+    #: to compare the cold start of the fast model with the
+    #: SavedModel, it requires `--fast_model`.
+    """
+)
+
+flags.DEFINE_boolean(
+    "serving_warmup",
+    False,
+    """
+    #: The `--serving_warmup` flag represents whether or not to
+    #: save TensorFlow Serving warmup requests
+    #: (`assets.extra/tf_serving_warmup_requests`) with the build,
+    #: so a new version is warmed up before it serves traffic.
+    """
+)
+
+flags.DEFINE_list(
+    "serving_warmup_batch_sizes",
+    ["1", "8", "32"],
+    """
+    #: The `--serving_warmup_batch_sizes` flag represents the batch
+    #: sizes of the warmup requests.
+    """
+)
+
+flags.DEFINE_string(
+    "serving_warmup_file",
+    None,
+    """
+    #: The `--serving_warmup_file` flag represents a CSV or JSON
+    #: lines file of representative requests (with a `text` field)
+    #: the warmup requests are sampled from. If not set, they are
+    #: sampled from the regression data.
+    """
+)
+
+flags.DEFINE_string(
+    "build_version",
+    None,
+    """
+    #: The `--build_version` flag represents the build (`%Y%m%d%H%M%S`)
+    #: of `--model_uuid` used by `serve` and `predict`. If not set,
+    #: the latest build is used.
+    """
+)
+
+flags.DEFINE_string(
+    "serve_host",
+    "0.0.0.0",
+    """
+    #: The `--serve_host` flag represents the address `serve`
+    #: listens on.
+    """
+)
+
+flags.DEFINE_integer(
+    "serve_port",
+    8080,
+    """
+    #: The `--serve_port` flag represents the port `serve` listens
+    #: on.
+    """,
+    lower_bound=1,
+    upper_bound=65535
+)
+
+flags.DEFINE_integer(
+    "serve_max_batch_size",
+    32,
+    """
+    #: The `--serve_max_batch_size` flag represents the largest
+    #: number of utterances `serve` predicts at once.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_float(
+    "serve_max_delay_ms",
+    5.0,
+    """
+    #: The `--serve_max_delay_ms` flag represents the longest time
+    #: an utterance waits for its micro-batch to fill.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_integer(
+    "serve_cache_size",
+    10000,
+    """
+    #: The `--serve_cache_size` flag represents the largest number
+    #: of predictions `serve` caches. If `0`, predictions are not
+    #: cached.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_float(
+    "serve_cache_ttl",
+    None,
+    """
+    #: The `--serve_cache_ttl` flag represents the seconds a
+    #: prediction stays cached. If not set, predictions stay
+    #: cached until they are evicted.
+    """,
+    lower_bound=0
+)
+
+flags.DEFINE_integer(
+    "serve_cache_max_bytes",
+    None,
+    """
+    #: The `--serve_cache_max_bytes` flag represents the largest
+    #: estimated memory of the cached predictions.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_string(
+    "predict_input",
+    None,
+    """
+    #: The `--predict_input` flag represents the CSV or JSON lines
+    #: file of utterances `predict` labels.
+    """
+)
+
+flags.DEFINE_string(
+    "predict_output",
+    None,
+    """
+    #: The `--predict_output` flag represents the CSV or JSON lines
+    #: file `predict` writes the input records with their `intent`
+    #: and `confidence` to. An interrupted `predict` resumes from
+    #: its last completed chunk.
+    """
+)
+
+flags.DEFINE_string(
+    "predict_text_field",
+    "text",
+    """
+    #: The `--predict_text_field` flag represents the field (or
+    #: column) of the utterances of `--predict_input`.
+    """
+)
+
+flags.DEFINE_integer(
+    "predict_chunk_size",
+    10000,
+    """
+    #: The `--predict_chunk_size` flag represents the number of
+    #: records `predict` reads, predicts and writes at once.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "predict_batch_size",
+    256,
+    """
+    #: The `--predict_batch_size` flag represents the number of
+    #: utterances per model call of `predict`.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "predict_workers",
+    None,
+    """
+    #: The `--predict_workers` flag represents the number of
+    #: processes `predict` tokenizes with. If not set, the number
+    #: of CPUs is used.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_integer(
+    "serve_memory_budget_mb",
+    4096,
+    """
+    #: The `--serve_memory_budget_mb` flag represents the largest
+    #: memory (weights) of the models `serve_models` keeps loaded.
+    #: Least recently used models are evicted beyond it.
+    """,
+    lower_bound=1
+)
+
+flags.DEFINE_list(
+    "serve_preload",
+    [],
+    """
+    #: The `--serve_preload` flag represents the model uuids (the
+    #: hot set) `serve_models` loads before it starts listening.
+    #: Other models are loaded on their first request.
+    """
+)
+
+
+def runtime_profile_factory() -> RuntimeProfile:
+    """This function returns the runtime profile of the runtime
+    flags.
+
+    :return:
+    :rtype: RuntimeProfile
+    """
+    return RuntimeProfile(
+        inter_op_threads=FLAGS.inter_op_threads,
+        intra_op_threads=FLAGS.intra_op_threads,
+        cpu_affinity=[
+            int(cpu) for cpu in FLAGS.cpu_affinity
+        ] if FLAGS.cpu_affinity else None,
+        onednn=None if FLAGS.onednn == "default"
+        else FLAGS.onednn == "on"
+    )
+
+
+def build_file_system(model: Model, build_version: str = None) -> FileSystem:
+    """This function returns the file system of the build
+    `build_version` of `model`. If `build_version` is `None`, the
+    latest build is used.
+
+    :param model:
+    :type model: Model
+    :param build_version:
+    :type build_version: str
+    :return:
+    :rtype: FileSystem
+    """
+    return FileSystem(
+        model,
+        Build(
+            build_version=build_version
+            or WarmStarter.latest_build_version(
+                FileSystem(model, Build())
+            )
+        )
+    )
+
 
 def main(argv) -> None:
     """
@@ -164,6 +1001,20 @@ def main(argv) -> None:
     :return:
     :rtype:
     """
+    # TensorFlow reads the oneDNN setting when it is loaded, so
+    # the process is restarted with the setting in its
+    # environment
+    onednn_environ = runtime_profile_factory().environ()
+    if any(
+            os.environ.get(key) != value
+            for key, value in onednn_environ.items()
+    ):
+        os.execve(
+            sys.executable,
+            [sys.executable] + sys.argv,
+            {**os.environ, **onednn_environ}
+        )
+
     if argv[1] == "run":
         model = Model(
             model_name=FLAGS.model_name,
@@ -172,8 +1023,229 @@ def main(argv) -> None:
         build = Build()
         file_system = FileSystem(model, build)
         file_system.configure()
+        architecture = Architecture(
+            clf_out_dropout_rate=FLAGS.clf_out_dropout_rate,
+            clf_out_activation=FLAGS.clf_out_activation,
+            logits_dropout_rate=FLAGS.logits_dropout_rate,
+            logits_activation=FLAGS.logits_activation,
+            adapter_size=FLAGS.adapter_size
+        )
+        autotuner = None
+        if FLAGS.autotune:
+            autotuner = Autotuner(
+                batch_sizes=[
+                    int(batch_size)
+                    for batch_size in FLAGS.autotune_batch_sizes
+                ],
+                memory_limit=FLAGS.autotune_memory_limit
+            )
+        trainer = Trainer(
+            validation_split=FLAGS.validation_split,
+            batch_size=FLAGS.batch_size,
+            epochs=FLAGS.epochs,
+            file_system=file_system if FLAGS.log_tensorboard
+            else None,
+            early_stopping_monitor=FLAGS.early_stopping_monitor,
+            early_stopping_patience=FLAGS.early_stopping_patience,
+            time_budget=FLAGS.time_budget,
+            autotuner=autotuner,
+            learning_rate_schedule=FLAGS.learning_rate_schedule,
+            warmup_proportion=FLAGS.warmup_proportion
+        )
+
+        if FLAGS.teacher_build_version and not FLAGS.teacher_model_uuid:
+            raise ValueError(
+                "--teacher_build_version requires --teacher_model_uuid"
+            )
+        distiller = None
+        if FLAGS.teacher_model_uuid:
+            teacher_file_system = build_file_system(
+                Model(
+                    model_name=FLAGS.model_name,
+                    model_uuid=FLAGS.teacher_model_uuid
+                ),
+                FLAGS.teacher_build_version
+            )
+            distiller = Distiller(
+                teacher_file_system=teacher_file_system,
+                alpha=FLAGS.distillation_alpha,
+                temperature=FLAGS.distillation_temperature
+            )
+
+        warm_starter = None
+        if FLAGS.warm_start:
+            warm_starter = WarmStarter(
+                base_file_system=build_file_system(
+                    model,
+                    FLAGS.warm_start_build_version
+                ),
+                epochs=FLAGS.warm_start_epochs
+            )
+
+        optimizer_kwargs = dict()
+        if FLAGS.optimizer in ("AdamW", "LAMB"):
+            optimizer_kwargs["weight_decay_rate"] = \
+                FLAGS.weight_decay_rate
+        optimizer = Compiler.optimizer_factory(
+            FLAGS.optimizer,
+            FLAGS.learning_rate,
+            **optimizer_kwargs
+        )
+
+        WoodgateProcess.run(
+            model=model,
+            file_system=file_system,
+            architecture=architecture,
+            trainer=trainer,
+            distiller=distiller,
+            warm_starter=warm_starter,
+            runtime_profile=runtime_profile_factory(),
+            runtime_benchmark=FLAGS.runtime_benchmark,
+            optimizer=optimizer,
+            compile_profile=FLAGS.compile_profile,
+            compile_benchmark=FLAGS.compile_benchmark,
+            export_serving_model=FLAGS.export_serving_model,
+            tflite_quantization=FLAGS.tflite_quantization,
+            pruner=Pruner(
+                flops_ratio=FLAGS.prune_flops_ratio,
+                recovery_epochs=FLAGS.prune_recovery_epochs,
+                batch_size=FLAGS.batch_size
+            ) if FLAGS.prune_flops_ratio is not None else None,
+            factorizer=Factorizer(
+                energy=FLAGS.factorize_energy,
+                max_rank_ratio=FLAGS.factorize_max_rank_ratio,
+                max_accuracy_drop=FLAGS.factorize_max_accuracy_drop,
+                targets=FLAGS.factorize_targets,
+                recovery_epochs=FLAGS.factorize_recovery_epochs
+            ) if FLAGS.factorize_energy is not None else None,
+            artifact_store=ArtifactStore(
+                store_dir=file_system.artifact_store_dir,
+                chunk_size=FLAGS.artifact_chunk_size,
+                prune=FLAGS.artifact_store_prune
+            ) if FLAGS.artifact_store else None,
+            fast_model=FLAGS.fast_model,
+            cold_start_benchmark=FLAGS.cold_start_benchmark,
+            serving_warmup_batch_sizes=[
+                int(batch_size)
+                for batch_size in FLAGS.serving_warmup_batch_sizes
+            ] if FLAGS.serving_warmup else None,
+            serving_warmup_file=FLAGS.serving_warmup_file
+        )
+    elif argv[1] == "serve":
+        model = Model(
+            model_name=FLAGS.model_name,
+            model_uuid=FLAGS.model_uuid
+        )
+        file_system = build_file_system(model, FLAGS.build_version)
+
+        runtime_profile_factory().apply()
+
+        predictor = Predictor(
+            file_system=file_system,
+            fast=FLAGS.fast_model
+        )
+        InferenceServer(
+            batcher=MicroBatcher(
+                predict=predictor.predict,
+                max_batch_size=FLAGS.serve_max_batch_size,
+                max_delay_ms=FLAGS.serve_max_delay_ms
+            ),
+            host=FLAGS.serve_host,
+            port=FLAGS.serve_port,
+            cache=PredictionCache(
+                max_entries=FLAGS.serve_cache_size,
+                ttl=FLAGS.serve_cache_ttl,
+                max_bytes=FLAGS.serve_cache_max_bytes,
+                normalize=predictor.normalize
+            ) if FLAGS.serve_cache_size > 0 else None,
+            fingerprint=predictor.fingerprint
+        ).run()
+    elif argv[1] == "serve_models":
+        runtime_profile_factory().apply()
+
+        def load(model_uuid: str) -> Predictor:
+            # the latest build of the model, invalid uuids and
+            # models without a build raise FileNotFoundError,
+            # which the server answers with 404
+            if not Model.is_model_uuid(model_uuid):
+                raise FileNotFoundError(f"{model_uuid} is not a model")
+            model = Model(
+                model_name=FLAGS.model_name,
+                model_uuid=model_uuid
+            )
+            return Predictor(
+                file_system=build_file_system(model),
+                fast=FLAGS.fast_model
+            )
+
+        MultiModelServer(
+            registry=ModelRegistry(
+                load=load,
+                size=lambda predictor: predictor.memory_bytes,
+                memory_budget=FLAGS.serve_memory_budget_mb * 1024 * 1024
+            ),
+            host=FLAGS.serve_host,
+            port=FLAGS.serve_port,
+            cache=PredictionCache(
+                max_entries=FLAGS.serve_cache_size,
+                ttl=FLAGS.serve_cache_ttl,
+                max_bytes=FLAGS.serve_cache_max_bytes
+            ) if FLAGS.serve_cache_size > 0 else None,
+            max_batch_size=FLAGS.serve_max_batch_size,
+            max_delay_ms=FLAGS.serve_max_delay_ms,
+            preload=FLAGS.serve_preload
+        ).run()
+    elif argv[1] == "predict":
+        model = Model(
+            model_name=FLAGS.model_name,
+            model_uuid=FLAGS.model_uuid
+        )
+        file_system = build_file_system(model, FLAGS.build_version)
+
+        runtime_profile_factory().apply()
+
+        batch_predictor = BatchPredictor(
+            predictor=Predictor(
+                file_system=file_system,
+                fast=FLAGS.fast_model
+            ),
+            chunk_size=FLAGS.predict_chunk_size,
+            batch_size=FLAGS.predict_batch_size,
+            workers=FLAGS.predict_workers,
+            text_field=FLAGS.predict_text_field
+        )
+        batch_predictor.predict_file(
+            FLAGS.predict_input,
+            FLAGS.predict_output
+        )
+    elif argv[1] == "sweep":
+        model = Model(
+            model_name=FLAGS.model_name,
+            model_uuid=FLAGS.model_uuid
+        )
+        build = Build()
+        file_system = FileSystem(model, build)
+        file_system.configure()
+
+        sweep = Sweep(
+            search_space=json.loads(FLAGS.sweep_space),
+            model=model,
+            file_system=file_system,
+            max_workers=FLAGS.sweep_workers,
+            validation_split=FLAGS.validation_split
+        )
 
-        WoodgateProcess.run(model=model, file_system=file_system)
+        if FLAGS.sweep_scheduler == "grid":
+            sweep.run()
+        else:
+            SuccessiveHalving(
+                sweep=sweep,
+                min_epochs=FLAGS.sweep_min_epochs,
+                max_epochs=FLAGS.sweep_max_epochs,
+                reduction_factor=FLAGS.sweep_reduction_factor,
+                metric=FLAGS.sweep_metric,
+                hyperband=FLAGS.sweep_scheduler == "hyperband"
+            ).run()
 
 
 if __name__ == "__main__":
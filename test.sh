@@ -9,3 +9,5 @@ coverage html
 coverage run -m pytest ./woodgate/woodgate_*
 coverage html
 
+coverage run -m pytest ./woodgate/serving/*
+coverage html
@@ -2,8 +2,17 @@
 compiler.py - The compiler.py module contains the Compiler class
 definition.
 """
-from typing import List
+import os
+import json
+import time
+import math
+from typing import Any, Dict, List, Union
+import numpy as np
+import tensorflow as tf
 from tensorflow import keras
+from woodgate.woodgate_settings import FileSystem
+from .optimizers import AdamW, LAMB, Adafactor
+from .schedules import WarmupDecay
 
 
 class Compiler:
@@ -12,11 +21,84 @@ class Compiler:
     compiling the evaluator.
     """
 
+    #: The `COMPILE_PROFILES` attribute is a constant which
+    #: represents the named bundles of compile settings:
+    #: `steps_per_execution` (batches run per call into the
+    #: graph), `xla` (XLA auto-clustering), `precision_policy`
+    #: (Keras mixed precision policy) and `run_eagerly`.
+    COMPILE_PROFILES: Dict[str, Dict[str, Any]] = {
+        "default": {
+            "steps_per_execution": 1,
+            "xla": False,
+            "precision_policy": "float32",
+            "run_eagerly": False
+        },
+        "throughput": {
+            "steps_per_execution": 32,
+            "xla": True,
+            "precision_policy": "float32",
+            "run_eagerly": False
+        },
+        "low-memory": {
+            "steps_per_execution": 1,
+            "xla": False,
+            "precision_policy": "mixed_bfloat16",
+            "run_eagerly": False
+        },
+        "debug": {
+            "steps_per_execution": 1,
+            "xla": False,
+            "precision_policy": "float32",
+            "run_eagerly": True
+        }
+    }
+
+    @classmethod
+    def get_compile_profile(cls, profile: str) -> Dict[str, Any]:
+        """This method returns the settings of the compile
+        profile named `profile`.
+
+        :param profile:
+        :type profile: str
+        :return: The compile settings.
+        :rtype: Dict[str, Any]
+        """
+        if profile not in cls.COMPILE_PROFILES:
+            raise ValueError(
+                "compile profile must be either: "
+                + ", ".join(f'"{name}"' for name in cls.COMPILE_PROFILES)
+            )
+
+        return cls.COMPILE_PROFILES[profile]
+
+    @classmethod
+    def configure(cls, profile: str = "default") -> Dict[str, Any]:
+        """This method applies the process wide settings of the
+        compile profile named `profile`, i.e. XLA and the
+        precision policy. It must be called before the model is
+        built, layers take their dtype from the policy in effect
+        when they are created.
+
+        :param profile:
+        :type profile: str
+        :return: The compile settings.
+        :rtype: Dict[str, Any]
+        """
+        settings = cls.get_compile_profile(profile)
+
+        tf.config.optimizer.set_jit(settings["xla"])
+        keras.mixed_precision.experimental.set_policy(
+            settings["precision_policy"]
+        )
+
+        return settings
+
     @staticmethod
     def optimizer_factory(
             name: str,
             learning_rate: float,
-            *args
+            *args,
+            **kwargs
     ) -> keras.optimizers.Optimizer:
         """
 
@@ -26,6 +108,10 @@ class Compiler:
         :type learning_rate:
         :param args:
         :type args:
+        :param kwargs: Keyword arguments of the optimizer, e.g. \
+        `weight_decay_rate` or `exclude_from_weight_decay` of \
+        `"adamw"` and `"lamb"`, or `beta_1` of `"adafactor"`.
+        :type kwargs:
         :return:
         :rtype:
         """
@@ -36,43 +122,139 @@ class Compiler:
         if name == "adam":
             return keras.optimizers.Adam(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "adamax":
             return keras.optimizers.Adamax(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "adadelta":
             return keras.optimizers.Adadelta(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "adagrad":
             return keras.optimizers.Adagrad(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "ftrl":
             return keras.optimizers.Ftrl(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "sgd":
             return keras.optimizers.SGD(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
             )
         elif name == "rmsprop":
             return keras.optimizers.RMSprop(
                 learning_rate,
-                *args
+                *args,
+                **kwargs
+            )
+        elif name == "adamw":
+            return AdamW(
+                learning_rate,
+                *args,
+                **kwargs
+            )
+        elif name == "lamb":
+            return LAMB(
+                learning_rate,
+                *args,
+                **kwargs
+            )
+        elif name == "adafactor":
+            return Adafactor(
+                learning_rate,
+                *args,
+                **kwargs
             )
         else:
             raise ValueError(
                 "optimizer must be either: "
                 + '"adam", "adamax", "adadelta", "adagrad", '
-                + '"ftrl", "sgd", or "rmsprop"'
+                + '"ftrl", "sgd", "rmsprop", "adamw", "lamb", '
+                + 'or "adafactor"'
+            )
+
+    @staticmethod
+    def get_total_steps(
+            examples: int,
+            batch_size: int,
+            epochs: int
+    ) -> int:
+        """This method returns the number of training steps of
+        `epochs` epochs over `examples` examples.
+
+        :param examples: The number of training examples.
+        :type examples: int
+        :param batch_size:
+        :type batch_size: int
+        :param epochs:
+        :type epochs: int
+        :return: The number of training steps.
+        :rtype: int
+        """
+        return math.ceil(examples / batch_size) * epochs
+
+    @staticmethod
+    def learning_rate_schedule_factory(
+            name: str,
+            learning_rate: float,
+            total_steps: int,
+            warmup_proportion: float = 0.1
+    ) -> Union[float, keras.optimizers.schedules.LearningRateSchedule]:
+        """This method returns the learning rate schedule `name`
+        peaking at `learning_rate`, which can be passed to
+        `optimizer_factory` as its `learning_rate`. Every schedule
+        but `"constant"` warms up linearly over the first
+        `warmup_proportion` of `total_steps` (see
+        `Compiler.get_total_steps`).
+
+        :param name: Either `"constant"`, `"linear"`, `"cosine"` \
+        or `"polynomial"`.
+        :type name: str
+        :param learning_rate:
+        :type learning_rate: float
+        :param total_steps:
+        :type total_steps: int
+        :param warmup_proportion:
+        :type warmup_proportion: float
+        :return: The learning rate schedule.
+        :rtype: Union[float, LearningRateSchedule]
+        """
+        # ensure the name is lower case before
+        # selecting the return statement
+        name = name.lower()
+
+        if warmup_proportion < 0 or warmup_proportion > 1:
+            raise ValueError(
+                "warmup_proportion must be a value [0, 1]"
+            )
+
+        if name == "constant":
+            return learning_rate
+        elif name in WarmupDecay.DECAYS:
+            return WarmupDecay(
+                learning_rate=learning_rate,
+                total_steps=total_steps,
+                warmup_steps=int(total_steps * warmup_proportion),
+                decay=name
+            )
+        else:
+            raise ValueError(
+                "learning rate schedule must be either: "
+                + '"constant", "linear", "cosine", or "polynomial"'
             )
 
     @staticmethod
@@ -259,11 +441,13 @@ class Compiler:
             model: keras.Model,
             optimizer: keras.optimizers.Optimizer,
             loss: keras.losses.Loss,
-            metrics: List[keras.metrics.Metric]
+            metrics: List[keras.metrics.Metric],
+            profile: str = "default"
     ) -> None:
         """This method will call the `compile` method on the
-        `keras.Model` setting the optimizer, the loss function
-        and various metrics.
+        `keras.Model` setting the optimizer, the loss function,
+        various metrics and the per model settings of the compile
+        profile named `profile`.
 
         :param model:
         :type model:
@@ -273,14 +457,111 @@ class Compiler:
         :type loss:
         :param metrics:
         :type metrics:
+        :param profile:
+        :type profile: str
         :return:
         :rtype:
         """
+        settings = cls.get_compile_profile(profile)
 
         model.compile(
             optimizer=optimizer,
             loss=loss,
-            metrics=metrics
+            metrics=metrics,
+            run_eagerly=settings["run_eagerly"],
+            experimental_steps_per_execution=settings[
+                "steps_per_execution"
+            ]
+        )
+
+        return None
+
+    @staticmethod
+    def benchmark(
+            model: keras.Model,
+            train_x: np.ndarray,
+            train_y: np.ndarray,
+            batch_size: int,
+            steps: int = 32
+    ) -> Dict[str, Any]:
+        """This method times `steps` training steps of the
+        compiled `model` on the first `batch_size` examples,
+        after one untimed pass which includes graph tracing. The
+        model weights and optimizer state are restored afterwards
+        so the benchmark does not affect training.
+
+        :param model: A compiled model.
+        :type model: keras.Model
+        :param train_x:
+        :type train_x: np.ndarray
+        :param train_y:
+        :type train_y: np.ndarray
+        :param batch_size:
+        :type batch_size: int
+        :param steps:
+        :type steps: int
+        :return: The step time in milliseconds and the examples \
+        per second.
+        :rtype: Dict[str, Any]
+        """
+        batch_x = train_x[:batch_size]
+        batch_y = train_y[:batch_size]
+        repeats = int(np.ceil(steps * batch_size / len(batch_x)))
+        x = np.concatenate([batch_x] * repeats)[:steps * batch_size]
+        y = np.concatenate([batch_y] * repeats)[:steps * batch_size]
+
+        weights = model.get_weights()
+
+        # warm up pass (graph tracing and XLA compilation)
+        model.fit(x, y, batch_size=batch_size, shuffle=False, verbose=0)
+
+        start = time.perf_counter()
+        model.fit(x, y, batch_size=batch_size, shuffle=False, verbose=0)
+        duration = time.perf_counter() - start
+
+        model.set_weights(weights)
+        for variable in model.optimizer.variables():
+            variable.assign(tf.zeros_like(variable))
+
+        return {
+            "batch_size": batch_size,
+            "steps": steps,
+            "step_time_ms": duration / steps * 1000,
+            "examples_per_second": len(x) / duration
+        }
+
+    @classmethod
+    def create_compile_profile_json(
+            cls,
+            profile: str,
+            benchmark: Dict[str, Any],
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the settings of the compile profile
+        named `profile` and the result of its smoke benchmark to
+        `compileProfile.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param profile:
+        :type profile: str
+        :param benchmark: The result of `Compiler.benchmark`, or \
+        `None` if the profile was not benchmarked.
+        :type benchmark: Dict[str, Any]
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        compile_profile_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "compileProfile.json"
         )
 
+        with open(compile_profile_json_path, "w+") as file:
+            file.write(json.dumps({
+                "profile": profile,
+                "settings": cls.get_compile_profile(profile),
+                "benchmark": benchmark
+            }))
+
         return None
@@ -3,8 +3,12 @@ compiler_test.py - The compiler_test.py module contains unit
 tests related to the compiler.py module.
 """
 import unittest
+import numpy as np
+import tensorflow as tf
 from tensorflow import keras
 from .compiler import Compiler
+from .optimizers import AdamW, LAMB, Adafactor
+from .schedules import WarmupDecay
 
 
 class TestCompile(unittest.TestCase):
@@ -46,6 +50,64 @@ class TestCompile(unittest.TestCase):
         )
 
 
+class TestCompileProfiles(unittest.TestCase):
+    """
+    TestCompileProfiles class encapsulates the unit tests related
+    to the compile profiles of the Compiler class.
+    """
+
+    def test_compile_profile(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        settings = Compiler.configure("debug")
+        self.assertTrue(settings["run_eagerly"])
+
+        model = keras.Sequential([
+            keras.layers.Dense(2, activation="softmax")
+        ])
+        Compiler.compile(
+            model=model,
+            optimizer=Compiler.optimizer_factory(
+                name="Adam",
+                learning_rate=1e-3
+            ),
+            loss=Compiler.loss_factory(
+                "Sparse_Categorical_Crossentropy",
+                *["", "0.5"]
+            ),
+            metrics=Compiler.metrics_factory(
+                "sparse_categorical_accuracy"
+            ),
+            profile="debug"
+        )
+        self.assertTrue(model.run_eagerly)
+
+        train_x = np.random.uniform(size=(8, 4)).astype(np.float32)
+        train_y = np.zeros(8, dtype=np.int32)
+        model.build(input_shape=(None, 4))
+        weights = model.get_weights()
+
+        benchmark = Compiler.benchmark(
+            model=model,
+            train_x=train_x,
+            train_y=train_y,
+            batch_size=4,
+            steps=2
+        )
+
+        self.assertGreater(benchmark["step_time_ms"], 0)
+        for expected, actual in zip(weights, model.get_weights()):
+            self.assertTrue((expected == actual).all())
+
+        Compiler.configure("default")
+
+        with self.assertRaises(ValueError):
+            Compiler.configure("invalid")
+
+
 class TestOptimizerFactory(unittest.TestCase):
     """
     TestOptimizerFactory class encapsulates unit tests related
@@ -121,6 +183,35 @@ class TestOptimizerFactory(unittest.TestCase):
             isinstance(optimizer, keras.optimizers.RMSprop)
         )
 
+        optimizer = Compiler.optimizer_factory(
+            name="AdamW",
+            learning_rate=1e-5,
+            weight_decay_rate=0.01
+        )
+
+        self.assertTrue(
+            isinstance(optimizer, AdamW)
+        )
+
+        optimizer = Compiler.optimizer_factory(
+            name="LAMB",
+            learning_rate=1e-5,
+            weight_decay_rate=0.01
+        )
+
+        self.assertTrue(
+            isinstance(optimizer, LAMB)
+        )
+
+        optimizer = Compiler.optimizer_factory(
+            name="Adafactor",
+            learning_rate=1e-3
+        )
+
+        self.assertTrue(
+            isinstance(optimizer, Adafactor)
+        )
+
         with self.assertRaises(ValueError):
             Compiler.optimizer_factory(
                 name="invalid",
@@ -128,6 +219,157 @@ class TestOptimizerFactory(unittest.TestCase):
             )
 
 
+class TestOptimizers(unittest.TestCase):
+    """
+    TestOptimizers class encapsulates unit tests related to the
+    optimizers which are not shipped with Keras.
+    """
+
+    def test_adamw_weight_decay(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        kernel = tf.Variable(
+            np.ones((2, 2), dtype=np.float32),
+            name="dense/kernel"
+        )
+        bias = tf.Variable(
+            np.ones(2, dtype=np.float32),
+            name="dense/bias"
+        )
+
+        # a zero gradient leaves only the decoupled weight decay
+        optimizer = AdamW(learning_rate=0.1, weight_decay_rate=0.5)
+        optimizer.apply_gradients([
+            (tf.zeros_like(kernel), kernel),
+            (tf.zeros_like(bias), bias)
+        ])
+
+        np.testing.assert_allclose(kernel.numpy(), 0.95)
+        np.testing.assert_allclose(bias.numpy(), 1.0)
+
+    def test_lamb_layer_adaptation(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        kernel = tf.Variable(
+            np.ones((2, 2), dtype=np.float32),
+            name="dense/kernel"
+        )
+
+        # the trust ratio scales the update to the weight norm
+        optimizer = LAMB(learning_rate=0.1, weight_decay_rate=0.5)
+        optimizer.apply_gradients([
+            (tf.zeros_like(kernel), kernel)
+        ])
+
+        np.testing.assert_allclose(kernel.numpy(), 0.9, rtol=1e-5)
+
+    def test_adafactor_factored_slots(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        kernel = tf.Variable(
+            np.ones((128, 256), dtype=np.float32),
+            name="dense/kernel"
+        )
+        bias = tf.Variable(
+            np.ones(256, dtype=np.float32),
+            name="dense/bias"
+        )
+
+        optimizer = Adafactor(learning_rate=0.1)
+        optimizer.apply_gradients([
+            (tf.ones_like(kernel), kernel),
+            (tf.ones_like(bias), bias)
+        ])
+
+        # the matrix keeps one row and one column factor, the
+        # vector a full second moment, neither a first moment
+        self.assertEqual(
+            optimizer.get_slot_names(),
+            ["vr", "vc", "v"]
+        )
+        self.assertEqual(
+            optimizer.get_slot(kernel, "vr").shape,
+            (128,)
+        )
+        self.assertEqual(
+            optimizer.get_slot(kernel, "vc").shape,
+            (256,)
+        )
+        self.assertTrue((kernel.numpy() < 1.0).all())
+
+
+class TestLearningRateScheduleFactory(unittest.TestCase):
+    """
+    TestLearningRateScheduleFactory class encapsulates unit tests
+    related to the learning rate schedules of the Compiler class.
+    """
+
+    def test_get_learning_rate_schedule(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        total_steps = Compiler.get_total_steps(
+            examples=45,
+            batch_size=16,
+            epochs=3
+        )
+        self.assertEqual(total_steps, 9)
+
+        self.assertEqual(
+            Compiler.learning_rate_schedule_factory(
+                name="constant",
+                learning_rate=1e-5,
+                total_steps=total_steps
+            ),
+            1e-5
+        )
+
+        schedule = Compiler.learning_rate_schedule_factory(
+            name="linear",
+            learning_rate=1.0,
+            total_steps=10,
+            warmup_proportion=0.2
+        )
+        self.assertTrue(isinstance(schedule, WarmupDecay))
+        np.testing.assert_allclose(
+            [float(schedule(step)) for step in [0, 1, 2, 6, 10]],
+            [0.5, 1.0, 1.0, 0.5, 0.0],
+            atol=1e-6
+        )
+
+        schedule = Compiler.learning_rate_schedule_factory(
+            name="cosine",
+            learning_rate=1.0,
+            total_steps=10,
+            warmup_proportion=0.2
+        )
+        np.testing.assert_allclose(float(schedule(6)), 0.5, atol=1e-6)
+
+        optimizer = Compiler.optimizer_factory(
+            name="Adam",
+            learning_rate=schedule
+        )
+        self.assertIs(optimizer.learning_rate, schedule)
+
+        with self.assertRaises(ValueError):
+            Compiler.learning_rate_schedule_factory(
+                name="invalid",
+                learning_rate=1e-5,
+                total_steps=total_steps
+            )
+
+
 class TestLossFactory(unittest.TestCase):
     """
     TestLossFactory class encapsulates unit tests related
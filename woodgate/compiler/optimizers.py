@@ -0,0 +1,545 @@
+"""
+optimizers.py - The optimizers.py module contains the definitions
+of the optimizers which are not shipped with Keras.
+"""
+import re
+from typing import List
+import tensorflow as tf
+from tensorflow import keras
+
+
+class AdamW(keras.optimizers.Optimizer):
+    """
+    AdamW - The AdamW class implements Adam with decoupled weight
+    decay (see `https://arxiv.org/abs/1711.05101`). The weight
+    decay is added to the Adam update instead of the gradient, so
+    it is not scaled by the second moment. Weights whose name
+    matches one of the `exclude_from_weight_decay` patterns, by
+    default biases and layer norms, are not decayed.
+    """
+
+    #: The `DEFAULT_EXCLUDE_FROM_WEIGHT_DECAY` attribute is a
+    #: constant which represents the patterns of the weight names
+    #: which are not decayed by default.
+    DEFAULT_EXCLUDE_FROM_WEIGHT_DECAY: List[str] = [
+        "bias",
+        "LayerNorm",
+        "layer_norm"
+    ]
+
+    def __init__(
+            self,
+            learning_rate: float = 0.001,
+            weight_decay_rate: float = 0.01,
+            beta_1: float = 0.9,
+            beta_2: float = 0.999,
+            epsilon: float = 1e-6,
+            exclude_from_weight_decay: List[str] = None,
+            name: str = "AdamW",
+            **kwargs
+    ):
+        """
+
+        :param learning_rate:
+        :type learning_rate: float
+        :param weight_decay_rate: The decoupled weight decay rate.
+        :type weight_decay_rate: float
+        :param beta_1:
+        :type beta_1: float
+        :param beta_2:
+        :type beta_2: float
+        :param epsilon:
+        :type epsilon: float
+        :param exclude_from_weight_decay: Regular expressions \
+        matched against the weight names, matching weights are \
+        not decayed.
+        :type exclude_from_weight_decay: List[str]
+        :param name:
+        :type name: str
+        """
+        super().__init__(name, **kwargs)
+        self._set_hyper(
+            "learning_rate",
+            kwargs.get("lr", learning_rate)
+        )
+        self._set_hyper("decay", self._initial_decay)
+        self._set_hyper("weight_decay_rate", weight_decay_rate)
+        self._set_hyper("beta_1", beta_1)
+        self._set_hyper("beta_2", beta_2)
+        self.epsilon: float = epsilon
+        self.exclude_from_weight_decay: List[str] = \
+            self.DEFAULT_EXCLUDE_FROM_WEIGHT_DECAY \
+            if exclude_from_weight_decay is None \
+            else exclude_from_weight_decay
+
+    def _create_slots(self, var_list):
+        """
+
+        :param var_list:
+        :type var_list:
+        :return:
+        :rtype:
+        """
+        for var in var_list:
+            self.add_slot(var, "m")
+        for var in var_list:
+            self.add_slot(var, "v")
+
+    @staticmethod
+    def _matches(name: str, patterns: List[str]) -> bool:
+        """This method returns `True` if `name` matches any of
+        the regular expressions in `patterns`.
+
+        :param name:
+        :type name: str
+        :param patterns:
+        :type patterns: List[str]
+        :return:
+        :rtype: bool
+        """
+        return any(re.search(pattern, name) for pattern in patterns)
+
+    def _update(self, grad, var):
+        """This method updates the moments of `var` and returns
+        the learning rate and the (unscaled) update direction,
+        including the decoupled weight decay.
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :return:
+        :rtype:
+        """
+        var_dtype = var.dtype.base_dtype
+        learning_rate = self._decayed_lr(var_dtype)
+        beta_1 = self._get_hyper("beta_1", var_dtype)
+        beta_2 = self._get_hyper("beta_2", var_dtype)
+        step = tf.cast(self.iterations + 1, var_dtype)
+
+        m = self.get_slot(var, "m")
+        v = self.get_slot(var, "v")
+        m_t = m.assign(
+            beta_1 * m + (1.0 - beta_1) * grad,
+            use_locking=self._use_locking
+        )
+        v_t = v.assign(
+            beta_2 * v + (1.0 - beta_2) * tf.square(grad),
+            use_locking=self._use_locking
+        )
+
+        m_hat = m_t / (1.0 - tf.pow(beta_1, step))
+        v_hat = v_t / (1.0 - tf.pow(beta_2, step))
+        update = m_hat / (tf.sqrt(v_hat) + self.epsilon)
+
+        if not self._matches(var.name, self.exclude_from_weight_decay):
+            update += self._get_hyper(
+                "weight_decay_rate",
+                var_dtype
+            ) * var
+
+        return learning_rate, update
+
+    def _resource_apply_dense(self, grad, var, apply_state=None):
+        """
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :param apply_state:
+        :type apply_state:
+        :return:
+        :rtype:
+        """
+        learning_rate, update = self._update(grad, var)
+
+        return var.assign_sub(
+            learning_rate * update,
+            use_locking=self._use_locking
+        )
+
+    def _resource_apply_sparse(self, grad, var, indices, apply_state=None):
+        """Sparse gradients (e.g. of the embeddings) are applied
+        densely, the weight decay touches every row anyway.
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :param indices:
+        :type indices:
+        :param apply_state:
+        :type apply_state:
+        :return:
+        :rtype:
+        """
+        return self._resource_apply_dense(
+            tf.convert_to_tensor(
+                tf.IndexedSlices(grad, indices, tf.shape(var))
+            ),
+            var,
+            apply_state
+        )
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        config = super().get_config()
+        config.update({
+            "learning_rate": self._serialize_hyperparameter(
+                "learning_rate"
+            ),
+            "decay": self._serialize_hyperparameter("decay"),
+            "weight_decay_rate": self._serialize_hyperparameter(
+                "weight_decay_rate"
+            ),
+            "beta_1": self._serialize_hyperparameter("beta_1"),
+            "beta_2": self._serialize_hyperparameter("beta_2"),
+            "epsilon": self.epsilon,
+            "exclude_from_weight_decay": self.exclude_from_weight_decay
+        })
+        return config
+
+
+class LAMB(AdamW):
+    """
+    LAMB - The LAMB class implements layer-wise adaptive moments
+    (see `https://arxiv.org/abs/1904.00962`). The AdamW update of
+    each weight is scaled by the ratio of the weight norm to the
+    update norm, which keeps training stable at large batch sizes.
+    Weights whose name matches one of the
+    `exclude_from_layer_adaptation` patterns use the plain AdamW
+    update.
+    """
+
+    def __init__(
+            self,
+            learning_rate: float = 0.001,
+            weight_decay_rate: float = 0.01,
+            beta_1: float = 0.9,
+            beta_2: float = 0.999,
+            epsilon: float = 1e-6,
+            exclude_from_weight_decay: List[str] = None,
+            exclude_from_layer_adaptation: List[str] = None,
+            name: str = "LAMB",
+            **kwargs
+    ):
+        """
+
+        :param learning_rate:
+        :type learning_rate: float
+        :param weight_decay_rate: The decoupled weight decay rate.
+        :type weight_decay_rate: float
+        :param beta_1:
+        :type beta_1: float
+        :param beta_2:
+        :type beta_2: float
+        :param epsilon:
+        :type epsilon: float
+        :param exclude_from_weight_decay: Regular expressions \
+        matched against the weight names, matching weights are \
+        not decayed.
+        :type exclude_from_weight_decay: List[str]
+        :param exclude_from_layer_adaptation: Regular expressions \
+        matched against the weight names, matching weights are \
+        not adapted. If `None`, `exclude_from_weight_decay` is \
+        used.
+        :type exclude_from_layer_adaptation: List[str]
+        :param name:
+        :type name: str
+        """
+        super().__init__(
+            learning_rate=learning_rate,
+            weight_decay_rate=weight_decay_rate,
+            beta_1=beta_1,
+            beta_2=beta_2,
+            epsilon=epsilon,
+            exclude_from_weight_decay=exclude_from_weight_decay,
+            name=name,
+            **kwargs
+        )
+        self.exclude_from_layer_adaptation: List[str] = \
+            self.exclude_from_weight_decay \
+            if exclude_from_layer_adaptation is None \
+            else exclude_from_layer_adaptation
+
+    def _resource_apply_dense(self, grad, var, apply_state=None):
+        """
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :param apply_state:
+        :type apply_state:
+        :return:
+        :rtype:
+        """
+        learning_rate, update = self._update(grad, var)
+
+        if not self._matches(
+                var.name,
+                self.exclude_from_layer_adaptation
+        ):
+            weight_norm = tf.norm(var)
+            update_norm = tf.norm(update)
+            trust_ratio = tf.where(
+                tf.logical_and(weight_norm > 0, update_norm > 0),
+                weight_norm / tf.maximum(update_norm, self.epsilon),
+                tf.ones_like(weight_norm)
+            )
+            learning_rate = learning_rate * trust_ratio
+
+        return var.assign_sub(
+            learning_rate * update,
+            use_locking=self._use_locking
+        )
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        config = super().get_config()
+        config.update({
+            "exclude_from_layer_adaptation":
+                self.exclude_from_layer_adaptation
+        })
+        return config
+
+
+class Adafactor(keras.optimizers.Optimizer):
+    """
+    Adafactor - The Adafactor class implements the Adafactor
+    optimizer (see `https://arxiv.org/abs/1804.04235`). The second
+    moment of a large matrix is stored as a row and a column
+    factor instead of a full size tensor, and the first moment is
+    only kept if `beta_1` is set, so the optimizer state of BERT is
+    a small fraction of the state of Adam.
+    """
+
+    def __init__(
+            self,
+            learning_rate: float = 0.001,
+            beta_1: float = None,
+            decay_rate: float = 0.8,
+            epsilon_1: float = 1e-30,
+            epsilon_2: float = 1e-3,
+            clipping_threshold: float = 1.0,
+            multiply_by_parameter_scale: bool = True,
+            min_dim_size_to_factor: int = 128,
+            name: str = "Adafactor",
+            **kwargs
+    ):
+        """
+
+        :param learning_rate:
+        :type learning_rate: float
+        :param beta_1: The decay of the first moment. If `None`, \
+        no first moment is kept.
+        :type beta_1: float
+        :param decay_rate: The second moment decay at step `t` is \
+        `1 - t ** -decay_rate`.
+        :type decay_rate: float
+        :param epsilon_1: Added to the squared gradients.
+        :type epsilon_1: float
+        :param epsilon_2: The smallest parameter scale.
+        :type epsilon_2: float
+        :param clipping_threshold: The maximum root mean square \
+        of an update.
+        :type clipping_threshold: float
+        :param multiply_by_parameter_scale: Whether or not the \
+        learning rate is relative to the root mean square of \
+        each weight.
+        :type multiply_by_parameter_scale: bool
+        :param min_dim_size_to_factor: The smallest size of both \
+        of the last two dimensions of a weight for its second \
+        moment to be factored.
+        :type min_dim_size_to_factor: int
+        :param name:
+        :type name: str
+        """
+        super().__init__(name, **kwargs)
+        self._set_hyper(
+            "learning_rate",
+            kwargs.get("lr", learning_rate)
+        )
+        self._set_hyper("decay", self._initial_decay)
+        self.beta_1: float = beta_1
+        self.decay_rate: float = decay_rate
+        self.epsilon_1: float = epsilon_1
+        self.epsilon_2: float = epsilon_2
+        self.clipping_threshold: float = clipping_threshold
+        self.multiply_by_parameter_scale: bool = \
+            multiply_by_parameter_scale
+        self.min_dim_size_to_factor: int = min_dim_size_to_factor
+
+    def _factored(self, shape) -> bool:
+        """This method returns `True` if the second moment of a
+        weight of `shape` is factored.
+
+        :param shape:
+        :type shape:
+        :return:
+        :rtype: bool
+        """
+        return len(shape) >= 2 \
+            and shape[-1] >= self.min_dim_size_to_factor \
+            and shape[-2] >= self.min_dim_size_to_factor
+
+    def _create_slots(self, var_list):
+        """
+
+        :param var_list:
+        :type var_list:
+        :return:
+        :rtype:
+        """
+        for var in var_list:
+            shape = var.shape.as_list()
+            if self._factored(shape):
+                self.add_slot(
+                    var,
+                    "vr",
+                    tf.zeros(shape[:-1], dtype=var.dtype)
+                )
+                self.add_slot(
+                    var,
+                    "vc",
+                    tf.zeros(shape[:-2] + shape[-1:], dtype=var.dtype)
+                )
+            else:
+                self.add_slot(var, "v")
+            if self.beta_1:
+                self.add_slot(var, "m")
+
+    @staticmethod
+    def _rms(x):
+        """
+
+        :param x:
+        :type x:
+        :return:
+        :rtype:
+        """
+        return tf.sqrt(tf.reduce_mean(tf.square(x)))
+
+    def _resource_apply_dense(self, grad, var, apply_state=None):
+        """
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :param apply_state:
+        :type apply_state:
+        :return:
+        :rtype:
+        """
+        var_dtype = var.dtype.base_dtype
+        learning_rate = self._decayed_lr(var_dtype)
+        step = tf.cast(self.iterations + 1, var_dtype)
+        beta_2 = 1.0 - tf.pow(step, -self.decay_rate)
+        grad_squared = tf.square(grad) + self.epsilon_1
+
+        if self._factored(var.shape.as_list()):
+            vr = self.get_slot(var, "vr")
+            vc = self.get_slot(var, "vc")
+            vr_t = vr.assign(
+                beta_2 * vr + (1.0 - beta_2)
+                * tf.reduce_mean(grad_squared, axis=-1),
+                use_locking=self._use_locking
+            )
+            vc_t = vc.assign(
+                beta_2 * vc + (1.0 - beta_2)
+                * tf.reduce_mean(grad_squared, axis=-2),
+                use_locking=self._use_locking
+            )
+            row_factor = tf.math.rsqrt(
+                vr_t / tf.reduce_mean(vr_t, axis=-1, keepdims=True)
+            )
+            col_factor = tf.math.rsqrt(vc_t)
+            update = grad \
+                * tf.expand_dims(row_factor, -1) \
+                * tf.expand_dims(col_factor, -2)
+        else:
+            v = self.get_slot(var, "v")
+            v_t = v.assign(
+                beta_2 * v + (1.0 - beta_2) * grad_squared,
+                use_locking=self._use_locking
+            )
+            update = grad * tf.math.rsqrt(v_t)
+
+        update = update / tf.maximum(
+            1.0,
+            self._rms(update) / self.clipping_threshold
+        )
+
+        if self.multiply_by_parameter_scale:
+            learning_rate = learning_rate * tf.maximum(
+                self.epsilon_2,
+                self._rms(var)
+            )
+
+        if self.beta_1:
+            m = self.get_slot(var, "m")
+            update = m.assign(
+                self.beta_1 * m + (1.0 - self.beta_1) * update,
+                use_locking=self._use_locking
+            )
+
+        return var.assign_sub(
+            learning_rate * update,
+            use_locking=self._use_locking
+        )
+
+    def _resource_apply_sparse(self, grad, var, indices, apply_state=None):
+        """Sparse gradients are densified, the factored second
+        moment has no sparse update.
+
+        :param grad:
+        :type grad:
+        :param var:
+        :type var:
+        :param indices:
+        :type indices:
+        :param apply_state:
+        :type apply_state:
+        :return:
+        :rtype:
+        """
+        return self._resource_apply_dense(
+            tf.convert_to_tensor(
+                tf.IndexedSlices(grad, indices, tf.shape(var))
+            ),
+            var,
+            apply_state
+        )
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        config = super().get_config()
+        config.update({
+            "learning_rate": self._serialize_hyperparameter(
+                "learning_rate"
+            ),
+            "decay": self._serialize_hyperparameter("decay"),
+            "beta_1": self.beta_1,
+            "decay_rate": self.decay_rate,
+            "epsilon_1": self.epsilon_1,
+            "epsilon_2": self.epsilon_2,
+            "clipping_threshold": self.clipping_threshold,
+            "multiply_by_parameter_scale":
+                self.multiply_by_parameter_scale,
+            "min_dim_size_to_factor": self.min_dim_size_to_factor
+        })
+        return config
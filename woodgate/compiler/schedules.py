@@ -0,0 +1,123 @@
+"""
+schedules.py - The schedules.py module contains the definitions of
+the learning rate schedules which are not shipped with Keras.
+"""
+import math
+from typing import List
+import tensorflow as tf
+from tensorflow import keras
+
+
+class WarmupDecay(keras.optimizers.schedules.LearningRateSchedule):
+    """
+    WarmupDecay - The WarmupDecay class implements the BERT fine
+    tuning learning rate schedule: the learning rate increases
+    linearly from zero during the first `warmup_steps` steps and
+    then decays (linearly, along a cosine or along a polynomial)
+    to `end_learning_rate` at `total_steps`.
+    """
+
+    #: The `DECAYS` attribute is a constant which represents the
+    #: supported decays.
+    DECAYS: List[str] = ["linear", "cosine", "polynomial"]
+
+    def __init__(
+            self,
+            learning_rate: float,
+            total_steps: int,
+            warmup_steps: int = 0,
+            decay: str = "linear",
+            end_learning_rate: float = 0.0,
+            power: float = 2.0,
+            name: str = None
+    ):
+        """
+
+        :param learning_rate: The peak learning rate, reached at \
+        the end of the warmup.
+        :type learning_rate: float
+        :param total_steps: The number of training steps.
+        :type total_steps: int
+        :param warmup_steps:
+        :type warmup_steps: int
+        :param decay: Either `"linear"`, `"cosine"` or \
+        `"polynomial"`.
+        :type decay: str
+        :param end_learning_rate:
+        :type end_learning_rate: float
+        :param power: The power of the polynomial decay.
+        :type power: float
+        :param name:
+        :type name: str
+        """
+        super().__init__()
+        if decay not in self.DECAYS:
+            raise ValueError(
+                "decay must be either: "
+                + ", ".join(f'"{decay}"' for decay in self.DECAYS)
+            )
+        if total_steps < 1:
+            raise ValueError("total_steps must be at least 1")
+        if warmup_steps < 0 or warmup_steps > total_steps:
+            raise ValueError(
+                "warmup_steps must be a value [0, total_steps]"
+            )
+
+        self.learning_rate: float = learning_rate
+        self.total_steps: int = total_steps
+        self.warmup_steps: int = warmup_steps
+        self.decay: str = decay
+        self.end_learning_rate: float = end_learning_rate
+        self.power: float = power
+        self.name: str = name
+
+    def __call__(self, step):
+        """
+
+        :param step: The (zero based) optimizer step.
+        :type step:
+        :return: The learning rate of `step`.
+        :rtype:
+        """
+        with tf.name_scope(self.name or "WarmupDecay"):
+            step = tf.cast(step, tf.float32)
+
+            warmup_learning_rate = self.learning_rate * (step + 1.0) \
+                / max(self.warmup_steps, 1)
+
+            progress = tf.clip_by_value(
+                (step - self.warmup_steps)
+                / max(self.total_steps - self.warmup_steps, 1),
+                0.0,
+                1.0
+            )
+            if self.decay == "linear":
+                decay = 1.0 - progress
+            elif self.decay == "cosine":
+                decay = 0.5 * (1.0 + tf.cos(math.pi * progress))
+            else:
+                decay = tf.pow(1.0 - progress, self.power)
+            decayed_learning_rate = self.end_learning_rate \
+                + (self.learning_rate - self.end_learning_rate) * decay
+
+            return tf.where(
+                step < self.warmup_steps,
+                warmup_learning_rate,
+                decayed_learning_rate
+            )
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        return {
+            "learning_rate": self.learning_rate,
+            "total_steps": self.total_steps,
+            "warmup_steps": self.warmup_steps,
+            "decay": self.decay,
+            "end_learning_rate": self.end_learning_rate,
+            "power": self.power,
+            "name": self.name
+        }
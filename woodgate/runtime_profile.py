@@ -0,0 +1,197 @@
+"""
+runtime_profile.py - The runtime_profile.py module contains the
+RuntimeProfile class definition.
+"""
+import os
+import json
+import time
+from typing import Any, Dict, List
+import tensorflow as tf
+from .woodgate_settings import FileSystem
+
+
+class RuntimeProfile:
+    """
+    RuntimeProfile - The RuntimeProfile class encapsulates logic
+    related to the TensorFlow runtime settings of a build, i.e.
+    the inter/intra op thread pool sizes, CPU affinity pinning
+    and oneDNN optimizations. When several builds share a host,
+    pinning each build to its own cores and sizing the thread
+    pools accordingly avoids oversubscribing the CPU.
+    """
+
+    def __init__(
+            self,
+            inter_op_threads: int = None,
+            intra_op_threads: int = None,
+            cpu_affinity: List[int] = None,
+            onednn: bool = None
+    ):
+        """
+
+        :param inter_op_threads: The size of the inter op thread \
+        pool. If `None`, TensorFlow chooses the size.
+        :type inter_op_threads: int
+        :param intra_op_threads: The size of the intra op thread \
+        pool. If `None` and `cpu_affinity` is set, the number of \
+        pinned CPUs is used, otherwise TensorFlow chooses the \
+        size.
+        :type intra_op_threads: int
+        :param cpu_affinity: The CPUs the build process is pinned \
+        to. If `None`, the process is not pinned.
+        :type cpu_affinity: List[int]
+        :param onednn: Whether or not oneDNN optimizations are \
+        enabled. If `None`, the TensorFlow default is kept.
+        :type onednn: bool
+        """
+        for threads in (inter_op_threads, intra_op_threads):
+            if threads is not None and threads < 1:
+                raise ValueError("thread pool sizes must be at least 1")
+        if cpu_affinity is not None and not cpu_affinity:
+            raise ValueError("cpu_affinity must not be empty")
+
+        #: The `inter_op_threads` attribute represents the size of
+        #: the thread pool running independent operations.
+        self.inter_op_threads: int = inter_op_threads
+
+        #: The `intra_op_threads` attribute represents the size of
+        #: the thread pool used within a single operation.
+        self.intra_op_threads: int = intra_op_threads
+
+        #: The `cpu_affinity` attribute represents the CPUs the
+        #: build process is pinned to.
+        self.cpu_affinity: List[int] = cpu_affinity
+
+        #: The `onednn` attribute represents whether or not oneDNN
+        #: optimizations are enabled.
+        self.onednn: bool = onednn
+
+        #: The `summary` attribute represents the effective
+        #: runtime settings after the last call to `apply`.
+        self.summary: Dict[str, Any] = dict()
+
+    def environ(self) -> Dict[str, str]:
+        """This method returns the environment variables of the
+        oneDNN setting. TensorFlow reads them when it is loaded,
+        so they must be set before the process imports
+        TensorFlow (see `main.py`).
+
+        :return: The environment variables.
+        :rtype: Dict[str, str]
+        """
+        if self.onednn is None:
+            return dict()
+
+        return {
+            "TF_ENABLE_ONEDNN_OPTS": "1" if self.onednn else "0",
+            # TensorFlow < 2.5 builds with MKL only honor the
+            # legacy variable
+            "TF_DISABLE_MKL": "0" if self.onednn else "1"
+        }
+
+    def apply(self) -> Dict[str, Any]:
+        """This method applies the profile to the current process.
+        It must be called before TensorFlow executes its first
+        operation, thread pools cannot be resized afterwards. The
+        oneDNN setting cannot be applied once TensorFlow is
+        imported, it is reported as requested next to the
+        effective setting.
+
+        :return: The effective runtime settings.
+        :rtype: Dict[str, Any]
+        """
+        if self.cpu_affinity is not None:
+            os.sched_setaffinity(0, self.cpu_affinity)
+
+        intra_op_threads = self.intra_op_threads
+        if intra_op_threads is None and self.cpu_affinity is not None:
+            intra_op_threads = len(self.cpu_affinity)
+
+        if self.inter_op_threads is not None:
+            tf.config.threading.set_inter_op_parallelism_threads(
+                self.inter_op_threads
+            )
+        if intra_op_threads is not None:
+            tf.config.threading.set_intra_op_parallelism_threads(
+                intra_op_threads
+            )
+
+        self.summary = self.effective_settings()
+        self.summary["onednn_requested"] = \
+            self.environ().get("TF_ENABLE_ONEDNN_OPTS")
+
+        return self.summary
+
+    @staticmethod
+    def effective_settings() -> Dict[str, Any]:
+        """This method returns the runtime settings in effect
+        for the current process. A thread pool size of `0` means
+        TensorFlow chooses the size.
+
+        :return: The effective runtime settings.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "cpu_count": os.cpu_count(),
+            "cpu_affinity": sorted(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity") else None,
+            "inter_op_threads":
+                tf.config.threading.get_inter_op_parallelism_threads(),
+            "intra_op_threads":
+                tf.config.threading.get_intra_op_parallelism_threads(),
+            "onednn": os.getenv("TF_ENABLE_ONEDNN_OPTS")
+        }
+
+    def benchmark(self, size: int = 512, steps: int = 20) -> float:
+        """This method times a matrix multiplication, which is
+        the dominant operation of BERT on CPU, with the effective
+        settings. The result is recorded in `summary` so
+        profiles can be compared across builds on the same host.
+
+        :param size: The size of the square matrices.
+        :type size: int
+        :param steps: The number of timed multiplications.
+        :type steps: int
+        :return: The mean milliseconds per multiplication.
+        :rtype: float
+        """
+        a = tf.random.uniform((size, size))
+        b = tf.random.uniform((size, size))
+
+        # warm up (kernel selection and thread pool start up)
+        tf.linalg.matmul(a, b).numpy()
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            tf.linalg.matmul(a, b).numpy()
+        step_time_ms = (time.perf_counter() - start) / steps * 1000
+
+        self.summary["benchmark"] = {
+            "matmul_size": size,
+            "matmul_ms": step_time_ms
+        }
+
+        return step_time_ms
+
+    def create_runtime_profile_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the effective runtime settings to
+        `runtimeProfile.json` in the `file_system.build_summary_dir`
+        directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        runtime_profile_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "runtimeProfile.json"
+        )
+
+        with open(runtime_profile_json_path, "w+") as file:
+            file.write(json.dumps(self.summary))
+
+        return None
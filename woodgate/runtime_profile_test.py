@@ -0,0 +1,75 @@
+"""
+runtime_profile_test.py - The runtime_profile_test.py module
+contains the unit tests related to the runtime_profile.py module.
+"""
+import os
+import json
+import unittest
+from .runtime_profile import RuntimeProfile
+from .woodgate_settings import Model, Build, FileSystem
+
+
+class TestRuntimeProfile(unittest.TestCase):
+    """
+    TestRuntimeProfile contains the unit tests related to the
+    RuntimeProfile class.
+    """
+
+    def test_runtime_profile(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        model = Model("test")
+        build = Build()
+        file_system = FileSystem(model, build)
+        file_system.configure()
+
+        original_affinity = os.sched_getaffinity(0)
+        self.addCleanup(os.sched_setaffinity, 0, original_affinity)
+
+        cpu_affinity = sorted(original_affinity)[:1]
+        runtime_profile = RuntimeProfile(cpu_affinity=cpu_affinity)
+        summary = runtime_profile.apply()
+
+        self.assertEqual(summary["cpu_affinity"], cpu_affinity)
+        self.assertEqual(summary["intra_op_threads"], 1)
+        self.assertGreater(runtime_profile.benchmark(steps=2), 0)
+
+        runtime_profile.create_runtime_profile_json(file_system)
+        with open(
+                os.path.join(
+                    file_system.build_summary_dir,
+                    "runtimeProfile.json"
+                )
+        ) as file:
+            self.assertIn("benchmark", json.load(file))
+
+        with self.assertRaises(ValueError):
+            RuntimeProfile(inter_op_threads=0)
+
+    def test_runtime_profile_onednn(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        self.assertEqual(RuntimeProfile().environ(), dict())
+        self.assertEqual(
+            RuntimeProfile(onednn=False).environ(),
+            {"TF_ENABLE_ONEDNN_OPTS": "0", "TF_DISABLE_MKL": "1"}
+        )
+
+        # TensorFlow is imported, the setting is only requested
+        summary = RuntimeProfile(onednn=True).apply()
+
+        self.assertEqual(summary["onednn_requested"], "1")
+        self.assertEqual(
+            summary["onednn"],
+            os.getenv("TF_ENABLE_ONEDNN_OPTS")
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
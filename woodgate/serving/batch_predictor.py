@@ -0,0 +1,405 @@
+"""
+batch_predictor.py - The batch_predictor.py module contains the
+BatchPredictor class definition.
+"""
+import os
+import csv
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.serving.predictor import Predictor
+
+
+class BatchPredictor:
+    """
+    BatchPredictor - The BatchPredictor class encapsulates logic
+    related to labelling large files of utterances offline. The
+    input (CSV or JSON lines) is streamed in chunks, chunks are
+    tokenized in a process pool ahead of the model, predicted in
+    batches and appended to the output with the input fields.
+    After each chunk the progress is recorded next to the
+    output, so an interrupted job resumes from the last completed
+    chunk. Memory stays bounded by the chunks in flight.
+    """
+
+    #: The `FORMATS` attribute is a constant which represents the
+    #: supported file formats by file extension.
+    FORMATS: Dict[str, str] = {
+        ".csv": "csv",
+        ".jsonl": "jsonl",
+        ".json": "jsonl"
+    }
+
+    # the tokenizer of a worker process, see `_init_worker`
+    _worker_tokenizer = None
+
+    def __init__(
+            self,
+            predictor: Predictor,
+            chunk_size: int = 10000,
+            batch_size: int = 256,
+            workers: int = None,
+            text_field: str = Preprocessor.data_column_title
+    ):
+        """
+
+        :param predictor: The predictor of the build.
+        :type predictor: Predictor
+        :param chunk_size: The number of records per chunk.
+        :type chunk_size: int
+        :param batch_size: The number of utterances per model call.
+        :type batch_size: int
+        :param workers: The number of tokenization processes. If \
+        `None`, the number of CPUs is used.
+        :type workers: int
+        :param text_field: The field (or column) of the utterances.
+        :type text_field: str
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        #: The `predictor` attribute represents the predictor of
+        #: the build.
+        self.predictor: Predictor = predictor
+
+        #: The `chunk_size` attribute represents the number of
+        #: records per chunk, the unit of progress.
+        self.chunk_size: int = chunk_size
+
+        #: The `batch_size` attribute represents the number of
+        #: utterances per model call.
+        self.batch_size: int = batch_size
+
+        #: The `workers` attribute represents the number of
+        #: tokenization processes.
+        self.workers: int = workers or os.cpu_count()
+
+        #: The `text_field` attribute represents the field of the
+        #: utterances.
+        self.text_field: str = text_field
+
+        #: The `summary` attribute represents the result of the
+        #: last call to `predict_file`.
+        self.summary: Dict[str, Any] = dict()
+
+    @classmethod
+    def file_format(cls, path: str) -> str:
+        """This method returns the format of `path` by its file
+        extension.
+
+        :param path:
+        :type path: str
+        :return: Either `"csv"` or `"jsonl"`.
+        :rtype: str
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in cls.FORMATS:
+            raise ValueError(
+                "file extension must be either: "
+                + ", ".join(f'"{extension}"' for extension in cls.FORMATS)
+            )
+
+        return cls.FORMATS[extension]
+
+    def read_chunks(
+            self,
+            input_path: str,
+            skip_chunks: int = 0
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """This method streams the records of `input_path` in
+        chunks of `chunk_size` records. The first `skip_chunks`
+        chunks are read but not returned.
+
+        :param input_path:
+        :type input_path: str
+        :param skip_chunks:
+        :type skip_chunks: int
+        :return: The chunks of records.
+        :rtype: Iterator[List[Dict[str, Any]]]
+        """
+        with open(input_path, newline="") as file:
+            if self.file_format(input_path) == "csv":
+                records = csv.DictReader(file)
+            else:
+                records = (json.loads(line) for line in file if line.strip())
+
+            chunk = list()
+            chunk_index = 0
+            for record in records:
+                chunk.append(record)
+                if len(chunk) == self.chunk_size:
+                    if chunk_index >= skip_chunks:
+                        yield chunk
+                    chunk = list()
+                    chunk_index += 1
+            if chunk and chunk_index >= skip_chunks:
+                yield chunk
+
+    @classmethod
+    def _init_worker(cls, vocab_file: str) -> None:
+        """This method initializes the tokenizer of a worker
+        process.
+
+        :param vocab_file:
+        :type vocab_file: str
+        :return: None
+        :rtype: NoneType
+        """
+        cls._worker_tokenizer = Preprocessor.tokenizer_factory(vocab_file)
+
+        return None
+
+    @classmethod
+    def _encode(
+            cls,
+            texts: List[str],
+            max_sequence_length: int
+    ) -> np.ndarray:
+        """This method returns the padded token ids of `texts`
+        in a worker process.
+
+        :param texts:
+        :type texts: List[str]
+        :param max_sequence_length:
+        :type max_sequence_length: int
+        :return:
+        :rtype: np.ndarray
+        """
+        return Preprocessor.encode(
+            cls._worker_tokenizer,
+            texts,
+            max_sequence_length
+        )
+
+    def _predict_chunk(
+            self,
+            token_ids: List[np.ndarray]
+    ) -> List[Dict[str, Any]]:
+        """This method returns the predictions of the token ids
+        of a chunk, in batches of `batch_size`.
+
+        :param token_ids: The token ids of the parts of a chunk.
+        :type token_ids: List[np.ndarray]
+        :return:
+        :rtype: List[Dict[str, Any]]
+        """
+        token_ids = np.concatenate(token_ids)
+
+        predictions = list()
+        for start in range(0, len(token_ids), self.batch_size):
+            predictions.extend(
+                self.predictor.predict_token_ids(
+                    token_ids[start:start + self.batch_size]
+                )
+            )
+
+        return predictions
+
+    @staticmethod
+    def _take(chunks: Iterator, count: int) -> List:
+        """This method returns up to `count` next chunks of
+        `chunks`.
+
+        :param chunks:
+        :type chunks: Iterator
+        :param count:
+        :type count: int
+        :return:
+        :rtype: List
+        """
+        return [chunk for _, chunk in zip(range(count), chunks)]
+
+    @staticmethod
+    def get_progress_path(output_path: str) -> str:
+        """This method returns the path of the progress file of
+        `output_path`.
+
+        :param output_path:
+        :type output_path: str
+        :return:
+        :rtype: str
+        """
+        return f"{output_path}.progress.json"
+
+    def _read_progress(
+            self,
+            input_path: str,
+            output_path: str
+    ) -> Dict[str, Any]:
+        """This method returns the progress of a previous run
+        writing `output_path`. The output is truncated to its last
+        completed chunk. Without (matching) progress the output
+        is started over, unless it is not empty.
+
+        :param input_path:
+        :type input_path: str
+        :param output_path:
+        :type output_path: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        progress = {
+            "input_path": os.path.abspath(input_path),
+            "chunk_size": self.chunk_size,
+            "chunks": 0,
+            "records": 0,
+            "output_bytes": 0,
+            "fields": None
+        }
+
+        progress_path = self.get_progress_path(output_path)
+        if os.path.isfile(progress_path) and os.path.isfile(output_path):
+            with open(progress_path) as file:
+                previous_progress = json.load(file)
+            if previous_progress["input_path"] == progress["input_path"] \
+                    and previous_progress["chunk_size"] == self.chunk_size:
+                progress = previous_progress
+
+        if progress["output_bytes"] == 0 and os.path.isfile(output_path) \
+                and os.path.getsize(output_path) > 0:
+            raise FileExistsError(
+                f"{output_path} exists without the progress of this "
+                "input, remove it to start over"
+            )
+
+        with open(output_path, "a") as file:
+            file.truncate(progress["output_bytes"])
+
+        return progress
+
+    def _write_chunk(
+            self,
+            output_path: str,
+            records: List[Dict[str, Any]],
+            predictions: List[Dict[str, Any]],
+            progress: Dict[str, Any]
+    ) -> None:
+        """This method appends the records of a chunk with their
+        predictions to `output_path` and records the progress.
+
+        :param output_path:
+        :type output_path: str
+        :param records:
+        :type records: List[Dict[str, Any]]
+        :param predictions:
+        :type predictions: List[Dict[str, Any]]
+        :param progress:
+        :type progress: Dict[str, Any]
+        :return: None
+        :rtype: NoneType
+        """
+        with open(output_path, "a", newline="") as file:
+            if self.file_format(output_path) == "csv":
+                if progress["fields"] is None:
+                    progress["fields"] = list(records[0]) + [
+                        field for field in predictions[0]
+                        if field not in records[0]
+                    ]
+                writer = csv.DictWriter(
+                    file,
+                    fieldnames=progress["fields"],
+                    extrasaction="ignore"
+                )
+                if progress["output_bytes"] == 0:
+                    writer.writeheader()
+                for record, prediction in zip(records, predictions):
+                    writer.writerow({**record, **prediction})
+            else:
+                for record, prediction in zip(records, predictions):
+                    file.write(json.dumps({**record, **prediction}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+            progress["output_bytes"] = file.tell()
+
+        progress["chunks"] += 1
+        progress["records"] += len(records)
+
+        # the progress is replaced at once, an interruption
+        # leaves either the previous or the new progress
+        progress_path = self.get_progress_path(output_path)
+        with open(f"{progress_path}.tmp", "w+") as file:
+            file.write(json.dumps(progress))
+        os.replace(f"{progress_path}.tmp", progress_path)
+
+        return None
+
+    def predict_file(
+            self,
+            input_path: str,
+            output_path: str
+    ) -> Dict[str, Any]:
+        """This method writes the records of `input_path` with
+        the predicted `intent` and its `confidence` to
+        `output_path`, resuming a previous run if its progress
+        is found. While a chunk is predicted, the next chunks are
+        tokenized by the worker processes.
+
+        :param input_path: A CSV or JSON lines file.
+        :type input_path: str
+        :param output_path: A CSV or JSON lines file.
+        :type output_path: str
+        :return: A summary of the run.
+        :rtype: Dict[str, Any]
+        """
+        self.file_format(output_path)
+        progress = self._read_progress(input_path, output_path)
+        resumed_chunks = progress["chunks"]
+
+        start = time.perf_counter()
+        records = 0
+        # tensorflow is not fork safe, so workers are spawned
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._init_worker,
+                initargs=(self.predictor.file_system.get_bert_vocab_path(),)
+        ) as executor:
+
+            def submit(chunk):
+                # each worker tokenizes a part of the chunk
+                texts = [record[self.text_field] for record in chunk]
+                part_size = -(-len(texts) // self.workers)
+                return chunk, [
+                    executor.submit(
+                        self._encode,
+                        texts[part:part + part_size],
+                        self.predictor.max_sequence_length
+                    )
+                    for part in range(0, len(texts), part_size)
+                ]
+
+            chunks = self.read_chunks(input_path, resumed_chunks)
+            # one chunk is tokenized ahead of the model
+            pending = [submit(chunk) for chunk in self._take(chunks, 2)]
+            while pending:
+                chunk, futures = pending.pop(0)
+                predictions = self._predict_chunk(
+                    [future.result() for future in futures]
+                )
+                pending.extend(
+                    submit(chunk) for chunk in self._take(chunks, 1)
+                )
+                self._write_chunk(output_path, chunk, predictions, progress)
+                records += len(chunk)
+
+        seconds = time.perf_counter() - start
+        self.summary = {
+            "input_path": input_path,
+            "output_path": output_path,
+            "chunks": progress["chunks"],
+            "records": progress["records"],
+            "resumed_chunks": resumed_chunks,
+            "seconds": seconds,
+            "records_per_second": records / max(seconds, 1e-9)
+        }
+
+        return self.summary
+
@@ -0,0 +1,187 @@
+"""
+batch_predictor_test.py - The batch_predictor_test.py module
+contains the unit tests related to the batch_predictor.py module.
+"""
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import numpy as np
+from .batch_predictor import BatchPredictor
+
+
+class FakePredictor:
+    """
+    FakePredictor - A predictor whose intent is the number of
+    tokens of an utterance.
+    """
+
+    def __init__(self, vocab_path: str):
+        """
+
+        :param vocab_path:
+        :type vocab_path: str
+        """
+        self.file_system = SimpleNamespace(
+            get_bert_vocab_path=lambda: vocab_path
+        )
+        self.max_sequence_length = 8
+        self.batches: List[int] = list()
+
+    def predict_token_ids(
+            self,
+            token_ids: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+
+        :param token_ids:
+        :type token_ids: np.ndarray
+        :return:
+        :rtype: List[Dict[str, Any]]
+        """
+        self.batches.append(len(token_ids))
+
+        return [
+            {"intent": str(int(np.count_nonzero(row))), "confidence": 1.0}
+            for row in token_ids
+        ]
+
+
+class TestBatchPredictor(unittest.TestCase):
+    """
+    TestBatchPredictor contains the unit tests related to the
+    BatchPredictor class.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        vocab_path = os.path.join(self.temp_dir, "vocab.txt")
+        with open(vocab_path, "w") as file:
+            file.write(
+                "\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "a", "b"])
+            )
+        self.predictor = FakePredictor(vocab_path)
+
+        # 25 utterances of 1 to 5 tokens
+        self.records = [
+            {"id": str(index), "text": " ".join(["a"] * (index % 5 + 1))}
+            for index in range(25)
+        ]
+
+    def test_predict_jsonl(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        input_path = os.path.join(self.temp_dir, "input.jsonl")
+        output_path = os.path.join(self.temp_dir, "output.jsonl")
+        with open(input_path, "w") as file:
+            for record in self.records:
+                file.write(json.dumps(record) + "\n")
+
+        batch_predictor = BatchPredictor(
+            self.predictor,
+            chunk_size=10,
+            batch_size=4,
+            workers=2
+        )
+        summary = batch_predictor.predict_file(input_path, output_path)
+
+        self.assertEqual(summary["chunks"], 3)
+        self.assertEqual(summary["records"], 25)
+        self.assertEqual(summary["resumed_chunks"], 0)
+        self.assertLessEqual(max(self.predictor.batches), 4)
+        with open(output_path) as file:
+            predictions = [json.loads(line) for line in file]
+        self.assertEqual(
+            predictions,
+            [
+                # [CLS] + tokens + [SEP]
+                {**record, "intent": str(index % 5 + 3), "confidence": 1.0}
+                for index, record in enumerate(self.records)
+            ]
+        )
+
+        # an interrupted run: one chunk completed, one partially
+        # written
+        with open(output_path) as file:
+            lines = file.readlines()
+        with open(output_path, "w") as file:
+            file.writelines(lines[:13])
+        progress_path = batch_predictor.get_progress_path(output_path)
+        with open(progress_path) as file:
+            progress = json.load(file)
+        progress.update({
+            "chunks": 1,
+            "records": 10,
+            "output_bytes": len("".join(lines[:10]))
+        })
+        with open(progress_path, "w") as file:
+            file.write(json.dumps(progress))
+
+        summary = batch_predictor.predict_file(input_path, output_path)
+
+        self.assertEqual(summary["resumed_chunks"], 1)
+        self.assertEqual(summary["records"], 25)
+        with open(output_path) as file:
+            self.assertEqual(file.readlines(), lines)
+
+    def test_predict_csv(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        input_path = os.path.join(self.temp_dir, "input.csv")
+        output_path = os.path.join(self.temp_dir, "output.csv")
+        with open(input_path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["id", "text"])
+            writer.writeheader()
+            writer.writerows(self.records)
+
+        BatchPredictor(
+            self.predictor,
+            chunk_size=7,
+            workers=1
+        ).predict_file(input_path, output_path)
+
+        with open(output_path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(
+            list(rows[0]),
+            ["id", "text", "intent", "confidence"]
+        )
+        self.assertEqual(
+            [row["intent"] for row in rows],
+            [str(index % 5 + 3) for index in range(25)]
+        )
+
+        with self.assertRaises(ValueError):
+            BatchPredictor.file_format("input.txt")
+
+        # an output of another job is not overwritten
+        os.remove(BatchPredictor.get_progress_path(output_path))
+        with self.assertRaises(FileExistsError):
+            BatchPredictor(self.predictor).predict_file(
+                input_path,
+                output_path
+            )
+        with open(output_path, newline="") as file:
+            self.assertEqual(len(list(csv.DictReader(file))), 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+"""
+model_registry.py - The model_registry.py module contains the
+ModelRegistry class definition.
+"""
+import gc
+import time
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+
+class ModelRegistry:
+    """
+    ModelRegistry - The ModelRegistry class keeps the builds of
+    many models, keyed by `Model.model_uuid`, within a memory
+    budget. A model is loaded on its first request and the least
+    recently used models are evicted once the resident models
+    exceed the budget. Concurrent requests for a model which is
+    loading await the same load. Loads run one at a time on a
+    worker thread, so at most one model is loading on top of the
+    budget and the event loop keeps serving resident models.
+    """
+
+    def __init__(
+            self,
+            load: Callable[[str], Any],
+            size: Callable[[Any], int],
+            memory_budget: int,
+            on_evict: Callable[[str, Any], None] = None
+    ):
+        """
+
+        :param load: A function returning the loaded model of a \
+        model uuid, e.g. a `Predictor` of its latest build.
+        :type load: Callable[[str], Any]
+        :param size: A function returning the estimated bytes of \
+        a loaded model, e.g. `Predictor.memory_bytes`.
+        :type size: Callable[[Any], int]
+        :param memory_budget: The largest estimated memory of the \
+        resident models, in bytes.
+        :type memory_budget: int
+        :param on_evict: A function called with the model uuid \
+        and the model when a model is evicted.
+        :type on_evict: Callable[[str, Any], None]
+        """
+        if memory_budget < 1:
+            raise ValueError("memory_budget must be at least 1")
+
+        #: The `load` attribute represents the function loading a
+        #: model by its uuid.
+        self.load: Callable[[str], Any] = load
+
+        #: The `size` attribute represents the function estimating
+        #: the bytes of a loaded model.
+        self.size: Callable[[Any], int] = size
+
+        #: The `memory_budget` attribute represents the largest
+        #: estimated memory of the resident models.
+        self.memory_budget: int = memory_budget
+
+        #: The `on_evict` attribute represents the function called
+        #: when a model is evicted.
+        self.on_evict: Callable[[str, Any], None] = on_evict
+
+        # model uuid -> model, least recently used first
+        self._models: OrderedDict = OrderedDict()
+        # model uuid -> estimated bytes, kept after eviction to
+        # make room before the model is loaded again
+        self._sizes: Dict[str, int] = dict()
+        self._loading: Dict[str, asyncio.Future] = dict()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._counts: Dict[str, Dict[str, Any]] = dict()
+        self._failures: int = 0
+        # the latencies of the most recent loads and evictions
+        self._load_ms: deque = deque(maxlen=1000)
+        self._evict_ms: deque = deque(maxlen=1000)
+
+    def _model_counts(self, model_uuid: str) -> Dict[str, Any]:
+        """This method returns the counters of `model_uuid`.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        return self._counts.setdefault(model_uuid, {
+            "hits": 0,
+            "coalesced": 0,
+            "loads": 0,
+            "failures": 0,
+            "evictions": 0,
+            "load_ms": None
+        })
+
+    @property
+    def resident(self) -> List[str]:
+        """This property returns the uuids of the resident
+        models, least recently used first.
+
+        :return:
+        :rtype: List[str]
+        """
+        return list(self._models)
+
+    @property
+    def resident_bytes(self) -> int:
+        """This property returns the estimated memory of the
+        resident models.
+
+        :return:
+        :rtype: int
+        """
+        return sum(self._sizes[model_uuid] for model_uuid in self._models)
+
+    def evict(self, model_uuid: str) -> None:
+        """This method evicts the model `model_uuid`. Requests
+        which hold the model keep it until they are done.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return: None
+        :rtype: NoneType
+        """
+        start = time.perf_counter()
+        model = self._models.pop(model_uuid)
+        if self.on_evict is not None:
+            self.on_evict(model_uuid, model)
+        del model
+        gc.collect()
+
+        self._evict_ms.append((time.perf_counter() - start) * 1000)
+        self._model_counts(model_uuid)["evictions"] += 1
+
+        return None
+
+    def _make_room(self, size: int, keep: str = None) -> None:
+        """This method evicts least recently used models until
+        `size` more bytes fit the budget. The model `keep` is
+        never evicted.
+
+        :param size:
+        :type size: int
+        :param keep:
+        :type keep: str
+        :return: None
+        :rtype: NoneType
+        """
+        for model_uuid in self.resident:
+            if self.resident_bytes + size <= self.memory_budget:
+                break
+            if model_uuid != keep:
+                self.evict(model_uuid)
+
+        return None
+
+    async def _load(self, model_uuid: str) -> Any:
+        """This method loads the model `model_uuid` and evicts
+        models to keep the budget.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return:
+        :rtype: Any
+        """
+        counts = self._model_counts(model_uuid)
+        try:
+            # a model loaded before makes room before its load
+            if model_uuid in self._sizes:
+                self._make_room(self._sizes[model_uuid])
+
+            start = time.perf_counter()
+            model = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                self.load,
+                model_uuid
+            )
+            load_ms = (time.perf_counter() - start) * 1000
+        except Exception:
+            self._failures += 1
+            counts["failures"] += 1
+            if counts["loads"] == 0:
+                # e.g. unknown models, which must not grow the
+                # counters
+                del self._counts[model_uuid]
+            raise
+        finally:
+            del self._loading[model_uuid]
+
+        self._load_ms.append(load_ms)
+        counts["loads"] += 1
+        counts["load_ms"] = load_ms
+
+        self._sizes[model_uuid] = self.size(model)
+        self._models[model_uuid] = model
+        # a model larger than the budget evicts all others
+        self._make_room(0, keep=model_uuid)
+
+        return model
+
+    async def get(self, model_uuid: str) -> Any:
+        """This method returns the model `model_uuid`, loading it
+        if it is not resident.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return:
+        :rtype: Any
+        """
+        model = self._models.get(model_uuid)
+        if model is not None:
+            self._models.move_to_end(model_uuid)
+            self._model_counts(model_uuid)["hits"] += 1
+            return model
+
+        if model_uuid in self._loading:
+            self._model_counts(model_uuid)["coalesced"] += 1
+        else:
+            self._loading[model_uuid] = asyncio.ensure_future(
+                self._load(model_uuid)
+            )
+
+        # a cancelled request must not cancel the load
+        return await asyncio.shield(self._loading[model_uuid])
+
+    async def preload(self, model_uuids: List[str]) -> None:
+        """This method loads the models `model_uuids` (the hot
+        set), in order. If they do not fit the budget, the last
+        ones stay resident.
+
+        :param model_uuids:
+        :type model_uuids: List[str]
+        :return: None
+        :rtype: NoneType
+        """
+        for model_uuid in model_uuids:
+            await self.get(model_uuid)
+
+        return None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """This property returns the residency metrics and the
+        load and eviction latencies, overall and per model.
+
+        :return:
+        :rtype: Dict[str, Any]
+        """
+
+        def latencies(values: deque) -> Dict[str, float]:
+            ordered = sorted(values)
+            return {
+                "count": len(ordered),
+                "mean": sum(ordered) / max(len(ordered), 1),
+                "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "max": ordered[-1] if ordered else 0.0
+            }
+
+        hits = sum(counts["hits"] for counts in self._counts.values())
+        coalesced = sum(
+            counts["coalesced"] for counts in self._counts.values()
+        )
+        loads = sum(counts["loads"] for counts in self._counts.values())
+
+        return {
+            "memory_budget": self.memory_budget,
+            "resident_bytes": self.resident_bytes,
+            "resident_models": len(self._models),
+            "loading": list(self._loading),
+            "hits": hits,
+            "coalesced": coalesced,
+            "loads": loads,
+            "failures": self._failures,
+            "hit_rate": (hits + coalesced)
+            / max(hits + coalesced + loads, 1),
+            "evictions": sum(
+                counts["evictions"] for counts in self._counts.values()
+            ),
+            "load_ms": latencies(self._load_ms),
+            "evict_ms": latencies(self._evict_ms),
+            "models": {
+                model_uuid: {
+                    **counts,
+                    "resident": model_uuid in self._models,
+                    "bytes": self._sizes.get(model_uuid)
+                }
+                for model_uuid, counts in self._counts.items()
+            }
+        }
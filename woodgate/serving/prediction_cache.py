@@ -0,0 +1,291 @@
+"""
+prediction_cache.py - The prediction_cache.py module contains the
+PredictionCache class definition.
+"""
+import sys
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class PredictionCache:
+    """
+    PredictionCache - The PredictionCache class implements a
+    bounded LRU cache of predictions with an optional time to
+    live, keyed by the model fingerprint and the normalized
+    utterance. Concurrent requests for an utterance which is not
+    cached yet are coalesced: the first one runs the prediction,
+    the others await its result.
+    """
+
+    #: The `ENTRY_OVERHEAD` attribute is a constant which
+    #: represents the estimated bytes of an entry on top of its
+    #: key and prediction (dictionary slots, tuples, floats).
+    ENTRY_OVERHEAD: int = 256
+
+    def __init__(
+            self,
+            max_entries: int = 10000,
+            ttl: float = None,
+            max_bytes: int = None,
+            normalize: Callable[[str], str] = None
+    ):
+        """
+
+        :param max_entries: The largest number of cached \
+        predictions.
+        :type max_entries: int
+        :param ttl: The seconds a prediction stays cached. If \
+        `None`, predictions stay cached until they are evicted.
+        :type ttl: float
+        :param max_bytes: The largest estimated memory of the \
+        cached predictions. If `None`, only `max_entries` bounds \
+        the cache.
+        :type max_bytes: int
+        :param normalize: The function mapping an utterance to \
+        its cache key. If `None`, whitespace is collapsed.
+        :type normalize: Callable[[str], str]
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be greater than 0")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+
+        #: The `max_entries` attribute represents the largest
+        #: number of cached predictions.
+        self.max_entries: int = max_entries
+
+        #: The `ttl` attribute represents the seconds a
+        #: prediction stays cached.
+        self.ttl: float = ttl
+
+        #: The `max_bytes` attribute represents the largest
+        #: estimated memory of the cached predictions.
+        self.max_bytes: int = max_bytes
+
+        #: The `normalize` attribute represents the function
+        #: mapping an utterance to its cache key.
+        self.normalize: Callable[[str], str] = \
+            normalize or (lambda text: " ".join(text.split()))
+
+        # key -> (prediction, expiry, estimated bytes), least
+        # recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = dict()
+        self._bytes: int = 0
+        self._counts: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def _size(self, key: Tuple[str, str], prediction: Any) -> int:
+        """This method returns the estimated bytes of an entry.
+
+        :param key:
+        :type key: Tuple[str, str]
+        :param prediction:
+        :type prediction: Any
+        :return:
+        :rtype: int
+        """
+        return sys.getsizeof(key[0]) + sys.getsizeof(key[1]) \
+            + len(json.dumps(prediction)) + self.ENTRY_OVERHEAD
+
+    def _evict(self) -> None:
+        """This method evicts least recently used predictions
+        until the cache is within its bounds.
+
+        :return: None
+        :rtype: NoneType
+        """
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None
+                and self._bytes > self.max_bytes
+                and self._entries
+        ):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._counts["evictions"] += 1
+
+        return None
+
+    def _key(
+            self,
+            fingerprint: str,
+            text: str,
+            normalize: Callable[[str], str] = None
+    ) -> Tuple[str, str]:
+        """This method returns the cache key of `text` by the
+        model `fingerprint`.
+
+        :param fingerprint:
+        :type fingerprint: str
+        :param text:
+        :type text: str
+        :param normalize: The normalization of the model. If \
+        `None`, `normalize` is used.
+        :type normalize: Callable[[str], str]
+        :return:
+        :rtype: Tuple[str, str]
+        """
+        return fingerprint, (normalize or self.normalize)(text)
+
+    def get(
+            self,
+            fingerprint: str,
+            text: str,
+            normalize: Callable[[str], str] = None
+    ) -> Any:
+        """This method returns the cached prediction of `text`
+        by the model `fingerprint`, `None` if it is not cached.
+
+        :param fingerprint:
+        :type fingerprint: str
+        :param text:
+        :type text: str
+        :param normalize: The normalization of the model, see \
+        `_key`.
+        :type normalize: Callable[[str], str]
+        :return:
+        :rtype: Any
+        """
+        key = self._key(fingerprint, text, normalize)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        prediction, expiry, size = entry
+        if expiry is not None and expiry <= time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            self._counts["expirations"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+
+        return prediction
+
+    def put(
+            self,
+            fingerprint: str,
+            text: str,
+            prediction: Any,
+            normalize: Callable[[str], str] = None
+    ) -> None:
+        """This method caches the prediction of `text` by the
+        model `fingerprint`.
+
+        :param fingerprint:
+        :type fingerprint: str
+        :param text:
+        :type text: str
+        :param prediction: A JSON serializable prediction.
+        :type prediction: Any
+        :param normalize: The normalization of the model, see \
+        `_key`.
+        :type normalize: Callable[[str], str]
+        :return: None
+        :rtype: NoneType
+        """
+        key = self._key(fingerprint, text, normalize)
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+
+        size = self._size(key, prediction)
+        self._entries[key] = (
+            prediction,
+            time.monotonic() + self.ttl if self.ttl is not None
+            else None,
+            size
+        )
+        self._bytes += size
+        self._evict()
+
+        return None
+
+    async def get_or_predict(
+            self,
+            fingerprint: str,
+            text: str,
+            predict: Callable[[], Awaitable[Any]],
+            normalize: Callable[[str], str] = None
+    ) -> Any:
+        """This method returns the cached prediction of `text`,
+        awaits the prediction already running for it, or runs
+        `predict` and caches its result. Failed predictions are
+        not cached.
+
+        :param fingerprint: The fingerprint of the model.
+        :type fingerprint: str
+        :param text:
+        :type text: str
+        :param predict: A coroutine function returning the \
+        prediction of `text`.
+        :type predict: Callable[[], Awaitable[Any]]
+        :param normalize: The normalization of the model, see \
+        `_key`.
+        :type normalize: Callable[[str], str]
+        :return:
+        :rtype: Any
+        """
+        prediction = self.get(fingerprint, text, normalize)
+        if prediction is not None:
+            self._counts["hits"] += 1
+            return prediction
+
+        key = self._key(fingerprint, text, normalize)
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._counts["coalesced"] += 1
+            # a cancelled waiter must not cancel the prediction
+            return await asyncio.shield(in_flight)
+
+        self._counts["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            prediction = await predict()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # the waiters receive the exception and the leader
+            # raises it, so it is marked as retrieved
+            future.exception()
+            raise
+        else:
+            self.put(fingerprint, text, prediction, normalize)
+            future.set_result(prediction)
+        finally:
+            del self._in_flight[key]
+
+        return prediction
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """This property returns the cache metrics: hit rate
+        (coalesced requests count as hits), number of entries and
+        their estimated memory.
+
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        lookups = self._counts["hits"] + self._counts["coalesced"] \
+            + self._counts["misses"]
+
+        return {
+            **self._counts,
+            "hit_rate": (self._counts["hits"] + self._counts["coalesced"])
+            / max(lookups, 1),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "in_flight": len(self._in_flight)
+        }
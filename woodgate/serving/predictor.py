@@ -0,0 +1,172 @@
+"""
+predictor.py - The predictor.py module contains the Predictor class
+definition.
+"""
+import os
+import hashlib
+from typing import Any, Dict, List
+import numpy as np
+from tensorflow import keras
+from woodgate.woodgate_settings import FileSystem
+from woodgate.tuning.external_datasets import ExternalDatasets
+from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.trainer.storage import Storage
+
+
+class Predictor:
+    """
+    Predictor - The Predictor class encapsulates logic related to
+    predicting the intents of raw utterances with a build. The
+    build is loaded via `Storage.load_model`, utterances are
+    tokenized with the BERT tokenizer the build was trained with
+    and the logits are mapped to the intents of the build, in the
+    order of its `intentsData.json`.
+    """
+
+    def __init__(
+            self,
+            file_system: FileSystem,
+            fast: bool = False
+    ):
+        """
+
+        :param file_system: The file system of the build.
+        :type file_system: FileSystem
+        :param fast: Whether or not to load the fast model, see \
+        `Storage.save_fast_model`.
+        :type fast: bool
+        """
+        #: The `file_system` attribute represents the file system
+        #: of the served build.
+        self.file_system: FileSystem = file_system
+
+        #: The `model` attribute represents the served model.
+        self.model: keras.Model = Storage.load_model(
+            file_system,
+            fast=fast
+        )
+
+        #: The `max_sequence_length` attribute represents the
+        #: input length of the model.
+        self.max_sequence_length: int = self.model.input_shape[1]
+
+        #: The `intents` attribute represents the intents of the
+        #: build, in the order of the logits.
+        self.intents: List[str] = ExternalDatasets.read_intents(
+            file_system
+        )
+
+        #: The `tokenizer` attribute represents the BERT tokenizer
+        #: the build was trained with.
+        self.tokenizer = Preprocessor.tokenizer_factory(
+            file_system.get_bert_vocab_path()
+        )
+
+        #: The `fingerprint` attribute represents the content of
+        #: the served weights, see `fingerprint_build`.
+        self.fingerprint: str = self.fingerprint_build(file_system)
+
+    @staticmethod
+    def fingerprint_build(file_system: FileSystem) -> str:
+        """This method returns a fingerprint of the weights of
+        the build of `file_system`: the digest of its variables
+        index, which holds a checksum of every variable.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return:
+        :rtype: str
+        """
+        with open(
+                os.path.join(
+                    file_system.build_dir,
+                    "variables",
+                    "variables.index"
+                ),
+                "rb"
+        ) as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    @property
+    def memory_bytes(self) -> int:
+        """This property returns the estimated memory of the
+        served model: the bytes of its weights.
+
+        :return:
+        :rtype: int
+        """
+        return sum(
+            int(np.prod(weight.shape)) * weight.dtype.size
+            for weight in self.model.weights
+        )
+
+    def normalize(self, text: str) -> str:
+        """This method returns the utterance `text` normalized
+        such that utterances with the same normalization have the
+        same token ids: whitespace is collapsed and, for uncased
+        models, the text is lower cased.
+
+        :param text:
+        :type text: str
+        :return:
+        :rtype: str
+        """
+        text = " ".join(text.split())
+        if self.tokenizer.basic_tokenizer.do_lower_case:
+            text = text.lower()
+
+        return text
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """This method returns the padded token ids of `texts`.
+
+        :param texts:
+        :type texts: List[str]
+        :return:
+        :rtype: np.ndarray
+        """
+        return Preprocessor.encode(
+            self.tokenizer,
+            texts,
+            self.max_sequence_length
+        )
+
+    def predict_token_ids(
+            self,
+            token_ids: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """This method returns the most likely intent and its
+        probability for each row of `token_ids`.
+
+        :param token_ids:
+        :type token_ids: np.ndarray
+        :return: A dictionary with keys `intent` and \
+        `confidence` per row.
+        :rtype: List[Dict[str, Any]]
+        """
+        probabilities = np.asarray(
+            self.model.predict_on_batch(token_ids)
+        )
+
+        return [
+            {
+                "intent": self.intents[index],
+                "confidence": float(row[index])
+            }
+            for row, index in zip(
+                probabilities,
+                probabilities.argmax(axis=-1)
+            )
+        ]
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """This method returns the most likely intent and its
+        probability for each utterance of `texts`.
+
+        :param texts:
+        :type texts: List[str]
+        :return: A dictionary with keys `intent` and \
+        `confidence` per utterance.
+        :rtype: List[Dict[str, Any]]
+        """
+        return self.predict_token_ids(self.encode(texts))
@@ -0,0 +1,659 @@
+"""
+server.py - The server.py module contains the MicroBatcher,
+InferenceServer and MultiModelServer class definitions.
+"""
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from woodgate.serving.prediction_cache import PredictionCache
+from woodgate.serving.model_registry import ModelRegistry
+
+
+class MicroBatcher:
+    """
+    MicroBatcher - The MicroBatcher class coalesces concurrent
+    predictions into micro-batches. A batch is run as soon as it
+    holds `max_batch_size` utterances or its first utterance has
+    waited `max_delay_ms`. Batches run on a single worker thread,
+    so requests keep queuing (and the next batch keeps filling)
+    while the model is busy.
+    """
+
+    def __init__(
+            self,
+            predict: Callable[[List[str]], List[Dict[str, Any]]],
+            max_batch_size: int = 32,
+            max_delay_ms: float = 5.0
+    ):
+        """
+
+        :param predict: A function returning one prediction per \
+        utterance of a batch, e.g. `Predictor.predict`.
+        :type predict: Callable[[List[str]], List[Dict[str, Any]]]
+        :param max_batch_size:
+        :type max_batch_size: int
+        :param max_delay_ms: The longest time the first \
+        utterance of a batch waits for more utterances.
+        :type max_delay_ms: float
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_delay_ms < 0:
+            raise ValueError("max_delay_ms must be at least 0")
+
+        #: The `predict` attribute represents the batch prediction
+        #: function.
+        self.predict: Callable[[List[str]], List[Dict[str, Any]]] = \
+            predict
+
+        #: The `max_batch_size` attribute represents the largest
+        #: number of utterances of a batch.
+        self.max_batch_size: int = max_batch_size
+
+        #: The `max_delay_ms` attribute represents the longest
+        #: time an utterance waits for its batch to fill.
+        self.max_delay_ms: float = max_delay_ms
+
+        #: The `stats` attribute represents the number of
+        #: utterances and batches and the inference time.
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "batches": 0,
+            "mean_batch_size": 0.0,
+            "inference_ms": 0.0
+        }
+
+        self._queue: asyncio.Queue = None
+        self._arrival: asyncio.Event = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._stopped: bool = False
+        self._drained: bool = False
+
+    def start(self) -> asyncio.Task:
+        """This method starts the batching loop on the running
+        event loop.
+
+        :return: The task of the batching loop.
+        :rtype: asyncio.Task
+        """
+        self._queue = asyncio.Queue()
+        self._arrival = asyncio.Event()
+
+        return asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        """This method stops the batcher once it drained: new
+        utterances are rejected, queued utterances are still
+        predicted and the batching loop ends after them.
+
+        :return: None
+        :rtype: NoneType
+        """
+        if not self._stopped:
+            self._stopped = True
+            # the marker is queued after every accepted utterance
+            self._queue.put_nowait((None, None))
+            self._arrival.set()
+
+        return None
+
+    async def submit(self, text: str) -> Dict[str, Any]:
+        """This method queues `text` and returns its prediction
+        once its batch ran.
+
+        :param text:
+        :type text: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        if self._stopped:
+            raise RuntimeError("batcher is stopped")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        self._arrival.set()
+
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """This method waits for the next batch.
+
+        :return: The utterances of the batch and their futures.
+        :rtype: List[Tuple[str, asyncio.Future]]
+        """
+        loop = asyncio.get_running_loop()
+
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay_ms / 1000
+        while len(batch) < self.max_batch_size \
+                and batch[-1][1] is not None:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._arrival.clear()
+                try:
+                    await asyncio.wait_for(self._arrival.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                continue
+            batch.append(self._queue.get_nowait())
+
+        if batch[-1][1] is None:
+            # the stop marker, no utterance follows it
+            batch.pop()
+            self._drained = True
+
+        return batch
+
+    async def _run(self) -> None:
+        """This method runs the batching loop.
+
+        :return: None
+        :rtype: NoneType
+        """
+        loop = asyncio.get_running_loop()
+        while not self._drained:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                predictions = await loop.run_in_executor(
+                    self._executor,
+                    self.predict,
+                    [text for text, _ in batch]
+                )
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            inference_ms = (time.perf_counter() - start) * 1000
+
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+            batches = self.stats["batches"] + 1
+            self.stats = {
+                "requests": self.stats["requests"] + len(batch),
+                "batches": batches,
+                "mean_batch_size": (self.stats["requests"] + len(batch))
+                / batches,
+                "inference_ms": self.stats["inference_ms"] + inference_ms
+            }
+
+
+class InferenceServer:
+    """
+    InferenceServer - The InferenceServer class implements a
+    minimal asyncio HTTP/1.1 server in front of a `MicroBatcher`.
+
+        * `POST /predict` with `{"text": "..."}` returns one
+          prediction, with `{"texts": [...]}` a list of them
+        * `GET /health` returns `{"status": "ok"}`
+        * `GET /stats` returns the batching (and cache) statistics
+
+    If a `PredictionCache` is set, predictions are looked up in
+    the cache before they are submitted to the batcher.
+    """
+
+    #: The `REASONS` attribute is a constant which represents the
+    #: reason phrases of the status codes used by the server.
+    REASONS: Dict[int, str] = {
+        200: "OK",
+        400: "Bad Request",
+        404: "Not Found",
+        405: "Method Not Allowed",
+        500: "Internal Server Error"
+    }
+
+    def __init__(
+            self,
+            batcher: MicroBatcher,
+            host: str = "0.0.0.0",
+            port: int = 8080,
+            cache: PredictionCache = None,
+            fingerprint: str = ""
+    ):
+        """
+
+        :param batcher:
+        :type batcher: MicroBatcher
+        :param host:
+        :type host: str
+        :param port:
+        :type port: int
+        :param cache:
+        :type cache: PredictionCache
+        :param fingerprint: The fingerprint of the served model, \
+        see `Predictor.fingerprint`.
+        :type fingerprint: str
+        """
+        #: The `batcher` attribute represents the micro-batcher
+        #: the predictions are submitted to.
+        self.batcher: MicroBatcher = batcher
+
+        #: The `host` attribute represents the address the server
+        #: listens on.
+        self.host: str = host
+
+        #: The `port` attribute represents the port the server
+        #: listens on.
+        self.port: int = port
+
+        #: The `cache` attribute represents the prediction cache.
+        self.cache: PredictionCache = cache
+
+        #: The `fingerprint` attribute represents the fingerprint
+        #: of the served model, part of the cache keys.
+        self.fingerprint: str = fingerprint
+
+    async def predict_text(self, text: str) -> Dict[str, Any]:
+        """This method returns the prediction of `text`.
+
+        :param text:
+        :type text: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        if self.cache is None:
+            return await self.batcher.submit(text)
+
+        return await self.cache.get_or_predict(
+            self.fingerprint,
+            text,
+            lambda: self.batcher.submit(text)
+        )
+
+    async def predict(
+            self,
+            payload: Dict[str, Any],
+            predict_text: Callable[[str], Awaitable[Any]] = None
+    ) -> Any:
+        """This method returns the prediction(s) of a
+        `/predict` request body.
+
+        :param payload:
+        :type payload: Dict[str, Any]
+        :param predict_text: The coroutine function predicting an \
+        utterance. If `None`, `predict_text` is used.
+        :type predict_text: Callable[[str], Awaitable[Any]]
+        :return:
+        :rtype: Any
+        """
+        predict_text = predict_text or self.predict_text
+        if isinstance(payload.get("text"), str):
+            return await predict_text(payload["text"])
+
+        texts = payload.get("texts")
+        if not isinstance(texts, list) \
+                or not all(isinstance(text, str) for text in texts):
+            raise ValueError('expected "text" or a list of "texts"')
+
+        return {
+            "predictions": await asyncio.gather(
+                *(predict_text(text) for text in texts)
+            )
+        }
+
+    async def route(
+            self,
+            method: str,
+            path: str,
+            body: bytes
+    ) -> Tuple[int, Any]:
+        """This method returns the status code and response body
+        of a request.
+
+        :param method:
+        :type method: str
+        :param path:
+        :type path: str
+        :param body:
+        :type body: bytes
+        :return:
+        :rtype: Tuple[int, Any]
+        """
+        routes = {
+            "/predict": "POST",
+            "/health": "GET",
+            "/stats": "GET"
+        }
+        if path not in routes:
+            return 404, {"error": f"{path} not found"}
+        if method != routes[path]:
+            return 405, {"error": f"{method} not allowed"}
+
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            if self.cache is None:
+                return 200, self.batcher.stats
+            return 200, {**self.batcher.stats, "cache": self.cache.stats}
+
+        try:
+            return 200, await self.predict(json.loads(body or b"{}"))
+        except (ValueError, AttributeError) as error:
+            return 400, {"error": str(error)}
+
+    async def handle(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter
+    ) -> None:
+        """This method serves the requests of a connection,
+        keeping it alive unless the client asks to close it.
+
+        :param reader:
+        :type reader: asyncio.StreamReader
+        :param writer:
+        :type writer: asyncio.StreamWriter
+        :return: None
+        :rtype: NoneType
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = \
+                    request_line.decode("latin-1").split()
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get("content-length", 0))
+                )
+
+                try:
+                    status, payload = await self.route(
+                        method,
+                        path.split("?", 1)[0],
+                        body
+                    )
+                except Exception as error:
+                    status, payload = 500, {"error": str(error)}
+
+                keep_alive = version == "HTTP/1.1" \
+                    and headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+                        + "Content-Type: application/json\r\n"
+                        + f"Content-Length: {len(data)}\r\n"
+                        + "Connection: "
+                        + ("keep-alive" if keep_alive else "close")
+                        + "\r\n\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (
+                ValueError,
+                asyncio.IncompleteReadError,
+                ConnectionResetError
+        ):
+            # malformed requests and dropped connections close
+            # the connection
+            pass
+        finally:
+            writer.close()
+
+        return None
+
+    async def start(self) -> asyncio.AbstractServer:
+        """This method starts the batching loop and the server on
+        the running event loop.
+
+        :return: The listening server.
+        :rtype: asyncio.AbstractServer
+        """
+        self.batcher.start()
+
+        return await asyncio.start_server(
+            self.handle,
+            self.host,
+            self.port
+        )
+
+    async def serve_forever(self) -> None:
+        """
+
+        :return: None
+        :rtype: NoneType
+        """
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+        return None
+
+    def run(self) -> None:
+        """This method runs the server until it is interrupted.
+
+        :return: None
+        :rtype: NoneType
+        """
+        asyncio.run(self.serve_forever())
+
+        return None
+
+
+class MultiModelServer(InferenceServer):
+    """
+    MultiModelServer - The MultiModelServer class serves the
+    models of a `ModelRegistry`, each behind its own
+    `MicroBatcher`.
+
+        * `POST /models/<model_uuid>/predict` predicts with the
+          model `model_uuid`, loading it if it is not resident
+        * `GET /health` returns `{"status": "ok"}`
+        * `GET /stats` returns the registry, batching (and cache)
+          statistics
+
+    The batcher of a model is stopped when the registry evicts
+    the model.
+    """
+
+    def __init__(
+            self,
+            registry: ModelRegistry,
+            host: str = "0.0.0.0",
+            port: int = 8080,
+            cache: PredictionCache = None,
+            max_batch_size: int = 32,
+            max_delay_ms: float = 5.0,
+            preload: List[str] = None
+    ):
+        """
+
+        :param registry: The registry of the served models. The \
+        loaded models must have a `predict` method and a \
+        `fingerprint`, see `Predictor`.
+        :type registry: ModelRegistry
+        :param host:
+        :type host: str
+        :param port:
+        :type port: int
+        :param cache:
+        :type cache: PredictionCache
+        :param max_batch_size: See `MicroBatcher`.
+        :type max_batch_size: int
+        :param max_delay_ms: See `MicroBatcher`.
+        :type max_delay_ms: float
+        :param preload: The uuids of the models (the hot set) \
+        loaded before the server starts listening.
+        :type preload: List[str]
+        """
+        super().__init__(
+            batcher=None,
+            host=host,
+            port=port,
+            cache=cache
+        )
+
+        #: The `registry` attribute represents the registry of the
+        #: served models.
+        self.registry: ModelRegistry = registry
+        self.registry.on_evict = self.stop_batcher
+
+        #: The `max_batch_size` attribute represents the largest
+        #: number of utterances of a batch of a model.
+        self.max_batch_size: int = max_batch_size
+
+        #: The `max_delay_ms` attribute represents the longest
+        #: time an utterance waits for its batch to fill.
+        self.max_delay_ms: float = max_delay_ms
+
+        #: The `preload` attribute represents the uuids of the
+        #: models loaded at startup.
+        self.preload: List[str] = preload or list()
+
+        # model uuid -> (model, batcher, batching loop task)
+        self._batchers: Dict[str, Tuple[Any, MicroBatcher, Any]] = dict()
+
+    def stop_batcher(self, model_uuid: str, model: Any) -> None:
+        """This method stops the batcher of the evicted model
+        `model_uuid`, see `MicroBatcher.stop`.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :param model:
+        :type model: Any
+        :return: None
+        :rtype: NoneType
+        """
+        if model_uuid in self._batchers:
+            # queued and running predictions of the model finish
+            # before its batching loop ends
+            _, batcher, _ = self._batchers.pop(model_uuid)
+            batcher.stop()
+
+        return None
+
+    async def predict_model_text(
+            self,
+            model_uuid: str,
+            text: str
+    ) -> Dict[str, Any]:
+        """This method returns the prediction of `text` by the
+        model `model_uuid`.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :param text:
+        :type text: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        model = await self.registry.get(model_uuid)
+        if model_uuid not in self.registry.resident:
+            # evicted while the request waited for its load
+            predictions = await asyncio.get_running_loop().run_in_executor(
+                None,
+                model.predict,
+                [text]
+            )
+            return predictions[0]
+
+        if model_uuid not in self._batchers \
+                or self._batchers[model_uuid][0] is not model:
+            self.stop_batcher(model_uuid, model)
+            batcher = MicroBatcher(
+                model.predict,
+                max_batch_size=self.max_batch_size,
+                max_delay_ms=self.max_delay_ms
+            )
+            self._batchers[model_uuid] = (model, batcher, batcher.start())
+        batcher = self._batchers[model_uuid][1]
+
+        if self.cache is None:
+            return await batcher.submit(text)
+
+        # the models may differ in their normalization (e.g.
+        # cased and uncased models)
+        return await self.cache.get_or_predict(
+            model.fingerprint,
+            text,
+            lambda: batcher.submit(text),
+            normalize=model.normalize
+        )
+
+    async def route(
+            self,
+            method: str,
+            path: str,
+            body: bytes
+    ) -> Tuple[int, Any]:
+        """This method returns the status code and response body
+        of a request.
+
+        :param method:
+        :type method: str
+        :param path:
+        :type path: str
+        :param body:
+        :type body: bytes
+        :return:
+        :rtype: Tuple[int, Any]
+        """
+        parts = path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "models" \
+                and parts[2] == "predict":
+            if method != "POST":
+                return 405, {"error": f"{method} not allowed"}
+            model_uuid = parts[1]
+            try:
+                return 200, await self.predict(
+                    json.loads(body or b"{}"),
+                    lambda text: self.predict_model_text(model_uuid, text)
+                )
+            except FileNotFoundError as error:
+                return 404, {"error": str(error)}
+            except (ValueError, AttributeError) as error:
+                return 400, {"error": str(error)}
+
+        if path == "/predict":
+            return 404, {"error": f"{path} not found"}
+        if path == "/stats" and method == "GET":
+            stats = {
+                "registry": self.registry.stats,
+                "models": {
+                    model_uuid: batcher.stats
+                    for model_uuid, (_, batcher, _)
+                    in self._batchers.items()
+                }
+            }
+            if self.cache is not None:
+                stats["cache"] = self.cache.stats
+            return 200, stats
+
+        return await super().route(method, path, body)
+
+    async def start(self) -> asyncio.AbstractServer:
+        """This method loads the hot set and starts the server on
+        the running event loop.
+
+        :return: The listening server.
+        :rtype: asyncio.AbstractServer
+        """
+        await self.registry.preload(self.preload)
+
+        return await asyncio.start_server(
+            self.handle,
+            self.host,
+            self.port
+        )
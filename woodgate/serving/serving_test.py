@@ -0,0 +1,469 @@
+"""
+serving_test.py - The serving_test.py module contains all unit tests
+related to the woodgate.serving package.
+"""
+import json
+import time
+import asyncio
+import unittest
+from typing import Any, Dict, List
+from .server import MicroBatcher, InferenceServer, MultiModelServer
+from .prediction_cache import PredictionCache
+from .model_registry import ModelRegistry
+
+
+class TestServer(unittest.TestCase):
+    """
+    TestServer contains the unit tests related to the MicroBatcher
+    and InferenceServer classes.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        self.batches: List[List[str]] = list()
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """A batch prediction function which records its batches.
+
+        :param texts:
+        :type texts: List[str]
+        :return:
+        :rtype: List[Dict[str, Any]]
+        """
+        self.batches.append(texts)
+
+        return [
+            {"intent": text.upper(), "confidence": 1.0}
+            for text in texts
+        ]
+
+    def test_micro_batcher(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        batcher = MicroBatcher(
+            self.predict,
+            max_batch_size=4,
+            max_delay_ms=50
+        )
+
+        async def submit_all():
+            batcher.start()
+            return await asyncio.gather(
+                *(batcher.submit(f"text {index}") for index in range(10))
+            )
+
+        predictions = asyncio.run(submit_all())
+
+        self.assertEqual(
+            [prediction["intent"] for prediction in predictions],
+            [f"TEXT {index}" for index in range(10)]
+        )
+        self.assertEqual(
+            [len(batch) for batch in self.batches],
+            [4, 4, 2]
+        )
+        self.assertEqual(batcher.stats["requests"], 10)
+        self.assertEqual(batcher.stats["batches"], 3)
+
+        with self.assertRaises(ValueError):
+            MicroBatcher(self.predict, max_batch_size=0)
+
+    def test_inference_server(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        server = InferenceServer(
+            MicroBatcher(self.predict, max_delay_ms=1),
+            host="127.0.0.1",
+            port=0
+        )
+
+        async def request(port: int, method: str, path: str, body):
+            reader, writer = await asyncio.open_connection(
+                "127.0.0.1",
+                port
+            )
+            data = json.dumps(body).encode("utf-8")
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\n".encode("latin-1")
+                + f"Content-Length: {len(data)}\r\n".encode("latin-1")
+                + b"Connection: close\r\n\r\n"
+                + data
+            )
+            response = await reader.read()
+            writer.close()
+            head, _, payload = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(payload)
+
+        async def run():
+            listening_server = await server.start()
+            port = listening_server.sockets[0].getsockname()[1]
+            responses = [
+                await request(port, "POST", "/predict", {"text": "a"}),
+                await request(
+                    port,
+                    "POST",
+                    "/predict",
+                    {"texts": ["b", "c"]}
+                ),
+                await request(port, "POST", "/predict", {"texts": 1}),
+                await request(port, "GET", "/predict", {}),
+                await request(port, "GET", "/missing", {}),
+                await request(port, "GET", "/stats", {})
+            ]
+            listening_server.close()
+            await listening_server.wait_closed()
+            return responses
+
+        responses = asyncio.run(run())
+
+        self.assertEqual(
+            responses[0],
+            (200, {"intent": "A", "confidence": 1.0})
+        )
+        self.assertEqual(
+            [
+                prediction["intent"]
+                for prediction in responses[1][1]["predictions"]
+            ],
+            ["B", "C"]
+        )
+        self.assertEqual(
+            [status for status, _ in responses[2:]],
+            [400, 405, 404, 200]
+        )
+        self.assertEqual(responses[5][1]["requests"], 3)
+
+
+class TestPredictionCache(unittest.TestCase):
+    """
+    TestPredictionCache contains the unit tests related to the
+    PredictionCache class.
+    """
+
+    def test_lru_and_ttl(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        cache = PredictionCache(max_entries=2)
+        cache.put("model", "a", {"intent": "A"})
+        cache.put("model", "b", {"intent": "B"})
+
+        # whitespace is normalized and `a` becomes most recent
+        self.assertEqual(cache.get("model", " a  "), {"intent": "A"})
+        self.assertIsNone(cache.get("other model", "a"))
+
+        cache.put("model", "c", {"intent": "C"})
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertEqual(cache.stats["entries"], 2)
+        self.assertGreater(cache.stats["bytes"], 0)
+
+        cache = PredictionCache(ttl=0.01)
+        cache.put("model", "a", {"intent": "A"})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("model", "a"))
+        self.assertEqual(cache.stats["expirations"], 1)
+        self.assertEqual(cache.stats["bytes"], 0)
+
+        with self.assertRaises(ValueError):
+            PredictionCache(max_entries=0)
+
+    def test_get_or_predict(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        cache = PredictionCache()
+        calls = list()
+
+        async def predict():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"intent": "A"}
+
+        async def run():
+            predictions = await asyncio.gather(*(
+                cache.get_or_predict("model", "a", predict)
+                for _ in range(5)
+            ))
+            predictions.append(
+                await cache.get_or_predict("model", "a", predict)
+            )
+            return predictions
+
+        predictions = asyncio.run(run())
+
+        # concurrent duplicates run the prediction once
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(predictions, [{"intent": "A"}] * 6)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["coalesced"], 4)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertAlmostEqual(cache.stats["hit_rate"], 5 / 6)
+
+        async def fail():
+            raise RuntimeError("inference failed")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(cache.get_or_predict("model", "b", fail))
+        self.assertIsNone(cache.get("model", "b"))
+
+
+class FakeModel:
+    """
+    FakeModel - A model whose intent is its uuid.
+    """
+
+    def __init__(self, model_uuid: str, delay: float = 0.0):
+        """
+
+        :param model_uuid:
+        :type model_uuid: str
+        :param delay: The seconds a batch prediction takes.
+        :type delay: float
+        """
+        self.model_uuid = model_uuid
+        self.fingerprint = model_uuid
+        self.delay = delay
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+
+        :param texts:
+        :type texts: List[str]
+        :return:
+        :rtype: List[Dict[str, Any]]
+        """
+        time.sleep(self.delay)
+
+        return [
+            {"intent": self.model_uuid, "confidence": 1.0}
+            for _ in texts
+        ]
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+
+        :param text:
+        :type text: str
+        :return:
+        :rtype: str
+        """
+        return " ".join(text.lower().split())
+
+
+class TestModelRegistry(unittest.TestCase):
+    """
+    TestModelRegistry contains the unit tests related to the
+    ModelRegistry and MultiModelServer classes.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        self.loads: List[str] = list()
+
+    def load(self, model_uuid: str) -> FakeModel:
+        """A load function which records its loads.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return:
+        :rtype: FakeModel
+        """
+        if model_uuid == "missing":
+            raise FileNotFoundError("no previous build found")
+        time.sleep(0.01)
+        self.loads.append(model_uuid)
+
+        return FakeModel(model_uuid, delay=0.05 if model_uuid == "a" else 0)
+
+    def test_lazy_load_and_eviction(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        evicted = list()
+        registry = ModelRegistry(
+            self.load,
+            size=lambda model: 40 if model.model_uuid == "big" else 10,
+            memory_budget=30,
+            on_evict=lambda model_uuid, model: evicted.append(model_uuid)
+        )
+
+        async def run():
+            await registry.preload(["a", "b"])
+            # concurrent requests for a model share its load
+            models = await asyncio.gather(
+                *(registry.get("c") for _ in range(3))
+            )
+            self.assertTrue(all(model is models[0] for model in models))
+            # `a` becomes most recent, `b` is evicted by `d`
+            await registry.get("a")
+            await registry.get("d")
+            self.assertEqual(registry.resident, ["c", "a", "d"])
+            # a model larger than the budget evicts all others
+            await registry.get("big")
+            with self.assertRaises(FileNotFoundError):
+                await registry.get("missing")
+
+        asyncio.run(run())
+
+        self.assertEqual(self.loads, ["a", "b", "c", "d", "big"])
+        self.assertEqual(evicted, ["b", "c", "a", "d"])
+        self.assertEqual(registry.resident, ["big"])
+
+        stats = registry.stats
+        self.assertEqual(stats["resident_bytes"], 40)
+        self.assertEqual(stats["loads"], 5)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(stats["evictions"], 4)
+        self.assertEqual(stats["load_ms"]["count"], 5)
+        self.assertGreater(stats["load_ms"]["mean"], 0)
+        self.assertEqual(stats["evict_ms"]["count"], 4)
+        # failed loads of unknown models leave no counters
+        self.assertEqual(stats["failures"], 1)
+        self.assertNotIn("missing", stats["models"])
+        self.assertFalse(stats["models"]["a"]["resident"])
+
+        with self.assertRaises(ValueError):
+            ModelRegistry(self.load, size=len, memory_budget=0)
+
+    def test_multi_model_server(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        server = MultiModelServer(
+            ModelRegistry(
+                self.load,
+                size=lambda model: 10,
+                memory_budget=10
+            ),
+            cache=PredictionCache(),
+            max_delay_ms=1,
+            preload=["a"]
+        )
+
+        async def run():
+            await server.registry.preload(server.preload)
+            responses = [
+                await server.route(
+                    "POST",
+                    "/models/a/predict",
+                    b'{"text": "x"}'
+                ),
+                await server.route(
+                    "POST",
+                    "/models/b/predict",
+                    b'{"texts": ["x", "y"]}'
+                ),
+                # a hit by the normalization of the model
+                await server.route(
+                    "POST",
+                    "/models/b/predict",
+                    b'{"text": "Y"}'
+                ),
+                await server.route(
+                    "POST",
+                    "/models/missing/predict",
+                    b'{"text": "x"}'
+                ),
+                await server.route("GET", "/models/a/predict", b""),
+                await server.route("POST", "/predict", b""),
+                await server.route("GET", "/health", b""),
+                await server.route("GET", "/stats", b"")
+            ]
+            return responses
+
+        responses = asyncio.run(run())
+
+        self.assertEqual(
+            responses[0],
+            (200, {"intent": "a", "confidence": 1.0})
+        )
+        self.assertEqual(
+            responses[1][1]["predictions"],
+            [{"intent": "b", "confidence": 1.0}] * 2
+        )
+        self.assertEqual(
+            [status for status, _ in responses[2:]],
+            [200, 404, 405, 404, 200, 200]
+        )
+        stats = responses[7][1]
+        # `a` was evicted with its batcher
+        self.assertEqual(list(stats["models"]), ["b"])
+        self.assertEqual(stats["registry"]["resident_models"], 1)
+        self.assertEqual(stats["cache"]["misses"], 3)
+        self.assertEqual(stats["cache"]["hits"], 1)
+
+    def test_eviction_drains_batcher(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        server = MultiModelServer(
+            ModelRegistry(
+                self.load,
+                size=lambda model: 10,
+                memory_budget=10
+            ),
+            max_batch_size=1,
+            max_delay_ms=1
+        )
+
+        async def run():
+            await server.registry.preload(["a"])
+            # the requests to `a` are queued behind its slow
+            # batches while loading `b` evicts `a`
+            return await asyncio.wait_for(
+                asyncio.gather(
+                    *(server.predict_model_text("a", "x") for _ in range(5)),
+                    server.predict_model_text("b", "x")
+                ),
+                timeout=5
+            )
+
+        predictions = asyncio.run(run())
+
+        self.assertEqual(
+            [prediction["intent"] for prediction in predictions],
+            ["a"] * 5 + ["b"]
+        )
+        self.assertEqual(server.registry.resident, ["b"])
+        self.assertEqual(list(server._batchers), ["b"])
+
+        batcher = MicroBatcher(self.load("b").predict)
+
+        async def submit_stopped():
+            batcher.start()
+            batcher.stop()
+            await batcher.submit("x")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(submit_stopped())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,342 @@
+"""
+artifact_store.py - The artifact_store.py module contains the
+ArtifactStore class definition.
+"""
+import os
+import json
+import shutil
+import hashlib
+from typing import Any, Dict, List
+from woodgate.woodgate_settings import FileSystem
+
+
+class ArtifactStore:
+    """
+    ArtifactStore - The ArtifactStore class encapsulates logic
+    related to storing build artifacts by content. Artifact files
+    are split into fixed size chunks, each unique chunk (blob) is
+    stored once under its SHA-256 digest and a build only keeps a
+    manifest of its blobs. Builds of the same architecture write
+    their variables at the same offsets, so chunks of unchanged
+    weights (e.g. embeddings and frozen encoder layers) are shared
+    across builds.
+    """
+
+    #: The `MANIFEST_FILE` attribute is a constant which represents
+    #: the name of the manifest written to the build directory.
+    MANIFEST_FILE: str = "artifactManifest.json"
+
+    #: The `ARTIFACTS` attribute is a constant which represents the
+    #: files and directories of a build directory which are build
+    #: artifacts, all other files (logs, summaries) are left as is.
+    ARTIFACTS: List[str] = [
+        "saved_model.pb",
+        "variables",
+        "assets",
+        "assets.extra",
+        "serving_model",
+        "fast_model",
+        "model.tflite"
+    ]
+
+    def __init__(
+            self,
+            store_dir: str,
+            chunk_size: int = 4 * 1024 * 1024,
+            prune: bool = False
+    ):
+        """
+
+        :param store_dir: The directory of the blobs.
+        :type store_dir: str
+        :param chunk_size: The size in bytes of the blobs.
+        :type chunk_size: int
+        :param prune: Whether or not the artifact files are \
+        removed from the build directory once they are stored, \
+        see `restore`.
+        :type prune: bool
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        #: The `store_dir` attribute represents the directory of
+        #: the blobs.
+        self.store_dir: str = store_dir
+
+        #: The `chunk_size` attribute represents the size in bytes
+        #: of the blobs.
+        self.chunk_size: int = chunk_size
+
+        #: The `prune` attribute represents whether or not stored
+        #: artifact files are removed from the build directory.
+        self.prune: bool = prune
+
+        #: The `summary` attribute represents the result of the
+        #: last call to `put`.
+        self.summary: Dict[str, Any] = dict()
+
+    def get_blob_path(self, digest: str) -> str:
+        """The `get_blob_path` method returns the full path on
+        the host file system of the blob `digest`.
+
+        :param digest: The SHA-256 digest of the blob.
+        :type digest: str
+        :return: Path to the blob.
+        :rtype: str
+        """
+        return os.path.join(
+            self.store_dir,
+            "blobs",
+            digest[:2],
+            digest
+        )
+
+    def _write(self, path: str, chunks) -> None:
+        """This method writes `chunks` to `path`. The file is
+        written next to `path` and renamed, so readers never see
+        a partial file.
+
+        :param path:
+        :type path: str
+        :param chunks: An iterable of bytes.
+        :type chunks:
+        :return: None
+        :rtype: NoneType
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(temp_path, path)
+
+        return None
+
+    def _artifact_files(self, build_dir: str) -> List[str]:
+        """This method returns the paths, relative to
+        `build_dir`, of the artifact files of `build_dir`.
+
+        :param build_dir:
+        :type build_dir: str
+        :return:
+        :rtype: List[str]
+        """
+        files = list()
+        for artifact in self.ARTIFACTS:
+            path = os.path.join(build_dir, artifact)
+            if os.path.isfile(path):
+                files.append(artifact)
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.relpath(os.path.join(root, name), build_dir)
+                    for name in names
+                )
+
+        return sorted(files)
+
+    def put(self, build_dir: str) -> Dict[str, Any]:
+        """This method stores the artifact files of `build_dir`
+        and writes its manifest (`MANIFEST_FILE`) to `build_dir`.
+        Only blobs which are not stored yet are written.
+
+        :param build_dir:
+        :type build_dir: str
+        :return: A summary of the stored and shared bytes.
+        :rtype: Dict[str, Any]
+        """
+        names = self._artifact_files(build_dir)
+        if not names:
+            raise FileNotFoundError(f"no artifacts found in {build_dir}")
+
+        files = dict()
+        stored_bytes = 0
+        new_bytes = 0
+        new_blobs = 0
+        for name in names:
+            digests = list()
+            with open(os.path.join(build_dir, name), "rb") as file:
+                for chunk in iter(
+                        lambda: file.read(self.chunk_size),
+                        b""
+                ):
+                    digest = hashlib.sha256(chunk).hexdigest()
+                    digests.append(digest)
+                    stored_bytes += len(chunk)
+                    if not os.path.isfile(self.get_blob_path(digest)):
+                        self._write(self.get_blob_path(digest), [chunk])
+                        new_bytes += len(chunk)
+                        new_blobs += 1
+            files[name] = {
+                "size": os.path.getsize(os.path.join(build_dir, name)),
+                "blobs": digests
+            }
+
+        manifest = {
+            "store_dir": os.path.abspath(self.store_dir),
+            "chunk_size": self.chunk_size,
+            "files": files
+        }
+        self._write(
+            os.path.join(build_dir, self.MANIFEST_FILE),
+            [json.dumps(manifest).encode("utf-8")]
+        )
+
+        if self.prune:
+            for artifact in self.ARTIFACTS:
+                path = os.path.join(build_dir, artifact)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.isfile(path):
+                    os.remove(path)
+
+        self.summary = {
+            "files": len(files),
+            "bytes": stored_bytes,
+            "new_bytes": new_bytes,
+            "new_blobs": new_blobs,
+            "shared_bytes": stored_bytes - new_bytes,
+            "shared_ratio": (stored_bytes - new_bytes)
+            / max(stored_bytes, 1),
+            "pruned": self.prune
+        }
+
+        return self.summary
+
+    @classmethod
+    def read_manifest(cls, build_dir: str) -> Dict[str, Any]:
+        """This method returns the manifest of `build_dir`.
+
+        :param build_dir:
+        :type build_dir: str
+        :return:
+        :rtype: Dict[str, Any]
+        """
+        with open(os.path.join(build_dir, cls.MANIFEST_FILE)) as file:
+            return json.load(file)
+
+    def checkout(self, build_dir: str) -> int:
+        """This method writes the artifact files of the manifest
+        of `build_dir` from their blobs. Files which are present
+        with the right size are skipped.
+
+        :param build_dir:
+        :type build_dir: str
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        manifest = self.read_manifest(build_dir)
+
+        written_bytes = 0
+        for name, entry in manifest["files"].items():
+            path = os.path.join(build_dir, name)
+            if os.path.isfile(path) \
+                    and os.path.getsize(path) == entry["size"]:
+                continue
+
+            def chunks(digests=entry["blobs"]):
+                for digest in digests:
+                    with open(self.get_blob_path(digest), "rb") as blob:
+                        yield blob.read()
+
+            self._write(path, chunks())
+            written_bytes += entry["size"]
+
+        return written_bytes
+
+    @classmethod
+    def restore(cls, build_dir: str) -> bool:
+        """This method checks out the artifact files of a pruned
+        build from the store recorded in its manifest. Builds
+        which are not stored are left as is.
+
+        :param build_dir:
+        :type build_dir: str
+        :return: Whether or not files were checked out.
+        :rtype: bool
+        """
+        if os.path.isfile(os.path.join(build_dir, "saved_model.pb")) \
+                or not os.path.isfile(
+                    os.path.join(build_dir, cls.MANIFEST_FILE)
+                ):
+            return False
+
+        manifest = cls.read_manifest(build_dir)
+        artifact_store = cls(
+            store_dir=manifest["store_dir"],
+            chunk_size=manifest["chunk_size"]
+        )
+
+        return artifact_store.checkout(build_dir) > 0
+
+    def copy(
+            self,
+            build_dir: str,
+            artifact_store: "ArtifactStore"
+    ) -> int:
+        """This method copies the blobs of the manifest of
+        `build_dir` to `artifact_store`, e.g. a store on another
+        volume. Blobs already in `artifact_store` are skipped.
+
+        :param build_dir:
+        :type build_dir: str
+        :param artifact_store: The target store.
+        :type artifact_store: ArtifactStore
+        :return: The number of bytes copied.
+        :rtype: int
+        """
+        copied_bytes = 0
+        for entry in self.read_manifest(build_dir)["files"].values():
+            for digest in entry["blobs"]:
+                target_path = artifact_store.get_blob_path(digest)
+                if os.path.isfile(target_path):
+                    continue
+                with open(self.get_blob_path(digest), "rb") as blob:
+                    chunk = blob.read()
+                artifact_store._write(target_path, [chunk])
+                copied_bytes += len(chunk)
+
+        return copied_bytes
+
+    def disk_usage(self) -> Dict[str, int]:
+        """This method returns the number and total size of the
+        stored blobs.
+
+        :return:
+        :rtype: Dict[str, int]
+        """
+        blobs = 0
+        blob_bytes = 0
+        for root, _, names in os.walk(
+                os.path.join(self.store_dir, "blobs")
+        ):
+            for name in names:
+                blobs += 1
+                blob_bytes += os.path.getsize(os.path.join(root, name))
+
+        return {"blobs": blobs, "bytes": blob_bytes}
+
+    def create_artifact_store_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the summary of the last `put` and
+        the disk usage of the store to `artifactStore.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        artifact_store_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "artifactStore.json"
+        )
+
+        with open(artifact_store_json_path, "w+") as file:
+            file.write(json.dumps({
+                **self.summary,
+                "disk_usage": self.disk_usage()
+            }))
+
+        return None
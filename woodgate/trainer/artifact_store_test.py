@@ -0,0 +1,121 @@
+"""
+artifact_store_test.py - The artifact_store_test.py module contains
+the unit tests related to the artifact_store.py module.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from .artifact_store import ArtifactStore
+
+
+class TestArtifactStore(unittest.TestCase):
+    """
+    TestArtifactStore contains the unit tests related to the
+    ArtifactStore class.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def _build(self, name: str, data: bytes) -> str:
+        """
+
+        :param name:
+        :type name: str
+        :param data: The content of the variables shard.
+        :type data: bytes
+        :return: The build directory.
+        :rtype: str
+        """
+        build_dir = os.path.join(self.temp_dir, name)
+        os.makedirs(os.path.join(build_dir, "variables"))
+        os.makedirs(os.path.join(build_dir, "log"))
+        with open(os.path.join(build_dir, "saved_model.pb"), "wb") as file:
+            file.write(b"graph")
+        with open(
+                os.path.join(
+                    build_dir,
+                    "variables",
+                    "variables.data-00000-of-00001"
+                ),
+                "wb"
+        ) as file:
+            file.write(data)
+        with open(os.path.join(build_dir, "log", "build.log"), "w") as file:
+            file.write("log")
+
+        return build_dir
+
+    def test_put_and_restore(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        artifact_store = ArtifactStore(
+            store_dir=os.path.join(self.temp_dir, "artifacts"),
+            chunk_size=4,
+            prune=True
+        )
+
+        # the builds only differ in their last chunk
+        first_build_dir = self._build("first", b"aaaabbbbcccc")
+        second_build_dir = self._build("second", b"aaaabbbbdddd")
+
+        summary = artifact_store.put(first_build_dir)
+        self.assertEqual(summary["bytes"], 17)
+        self.assertEqual(summary["new_blobs"], 5)
+
+        summary = artifact_store.put(second_build_dir)
+        self.assertEqual(summary["new_bytes"], 4)
+        self.assertEqual(summary["shared_bytes"], 13)
+        self.assertEqual(
+            artifact_store.disk_usage(),
+            {"blobs": 6, "bytes": 21}
+        )
+
+        # only the artifacts are pruned
+        self.assertFalse(
+            os.path.exists(os.path.join(second_build_dir, "variables"))
+        )
+        self.assertTrue(
+            os.path.isfile(os.path.join(second_build_dir, "log", "build.log"))
+        )
+
+        self.assertTrue(ArtifactStore.restore(second_build_dir))
+        self.assertFalse(ArtifactStore.restore(second_build_dir))
+        with open(
+                os.path.join(
+                    second_build_dir,
+                    "variables",
+                    "variables.data-00000-of-00001"
+                ),
+                "rb"
+        ) as file:
+            self.assertEqual(file.read(), b"aaaabbbbdddd")
+
+        target_store = ArtifactStore(
+            os.path.join(self.temp_dir, "target")
+        )
+        self.assertEqual(
+            artifact_store.copy(second_build_dir, target_store),
+            17
+        )
+        self.assertEqual(
+            artifact_store.copy(first_build_dir, target_store),
+            4
+        )
+
+        with self.assertRaises(FileNotFoundError):
+            artifact_store.put(os.path.join(first_build_dir, "log"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+autotuner.py - The autotuner.py module contains the Autotuner
+class definition.
+"""
+import os
+import json
+import time
+from typing import Any, Dict, List
+import tensorflow as tf
+from tensorflow import keras
+from woodgate.woodgate_settings import FileSystem
+from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.trainer.callbacks import ThroughputMonitor
+
+
+class Autotuner:
+    """
+    Autotuner - The Autotuner class encapsulates logic related to
+    a short calibration phase run before training which selects
+    the batch size with the highest throughput on the current
+    host.
+    """
+
+    #: The `DEFAULT_BATCH_SIZES` attribute is a constant which
+    #: represents the batch sizes tried when none are supplied.
+    DEFAULT_BATCH_SIZES: List[int] = [8, 16, 32, 64]
+
+    def __init__(
+            self,
+            batch_sizes: List[int] = None,
+            steps: int = 3,
+            memory_limit: int = None
+    ):
+        """
+
+        :param batch_sizes:
+        :type batch_sizes:
+        :param steps:
+        :type steps:
+        :param memory_limit:
+        :type memory_limit:
+        """
+        #: The `batch_sizes` attribute represents the candidate
+        #: batch sizes, which are tried in ascending order.
+        self.batch_sizes: List[int] = sorted(
+            set(batch_sizes or self.DEFAULT_BATCH_SIZES)
+        )
+        if self.batch_sizes[0] < 1:
+            raise ValueError("batch sizes must be at least 1")
+
+        #: The `steps` attribute represents the number of timed
+        #: training steps per candidate. Each candidate is also
+        #: given one untimed warm up step so graph tracing is
+        #: not included in the measurement.
+        if steps < 1:
+            raise ValueError("steps must be at least 1")
+        self.steps: int = steps
+
+        #: The `memory_limit` attribute represents the maximum
+        #: peak resident set size (in MB) a candidate may reach.
+        #: If the `memory_limit` attribute is `None`, candidates
+        #: are not limited by memory.
+        self.memory_limit: int = memory_limit
+
+        #: The `summary` attribute represents the result of the
+        #: last calibration.
+        self.summary: Dict[str, Any] = dict()
+
+    def calibrate(
+            self,
+            bert_model: keras.Model,
+            data: Preprocessor,
+            validation_split: float = 0.0
+    ) -> int:
+        """This method times a few training steps of the
+        compiled `bert_model` at each candidate batch size and
+        returns the batch size with the highest examples per
+        second which stays within `memory_limit`. If none does,
+        the smallest batch size is returned and the summary
+        reports `memory_limit_exceeded`. The model
+        weights and optimizer state are restored afterwards so
+        calibration does not affect training.
+
+        :param bert_model: A compiled model.
+        :type bert_model: keras.Model
+        :param data: Processed textual data.
+        :type data: Preprocessor
+        :param validation_split: The validation split used by \
+        the trainer, the validation examples are not used for \
+        calibration.
+        :type validation_split: float
+        :return: The selected batch size.
+        :rtype: int
+        """
+        # keras reserves the last examples for validation
+        train_size = int(len(data.train_x) * (1 - validation_split))
+        train_x = data.train_x[:train_size]
+        train_y = data.train_y[:train_size]
+
+        weights = bert_model.get_weights()
+
+        candidates = list()
+        for batch_size in self.batch_sizes:
+            if batch_size > train_size and candidates:
+                break
+
+            batch_x = train_x[:batch_size]
+            batch_y = train_y[:batch_size]
+
+            # warm up step (graph tracing)
+            bert_model.train_on_batch(batch_x, batch_y)
+
+            start = time.perf_counter()
+            for _ in range(self.steps):
+                bert_model.train_on_batch(batch_x, batch_y)
+            duration = time.perf_counter() - start
+
+            peak_rss = ThroughputMonitor.peak_rss()
+            fits = self.memory_limit is None \
+                or peak_rss <= self.memory_limit
+            candidates.append({
+                "batch_size": batch_size,
+                "examples_per_second":
+                    len(batch_x) * self.steps / duration,
+                "peak_rss_mb": peak_rss,
+                "fits": fits
+            })
+
+            # the peak resident set size never decreases, so
+            # larger batch sizes cannot fit either
+            if not fits:
+                break
+
+        bert_model.set_weights(weights)
+        for variable in bert_model.optimizer.variables():
+            variable.assign(tf.zeros_like(variable))
+
+        # if no candidate fits the memory limit (e.g. the model
+        # alone exceeds it), the smallest batch size is selected
+        # and reported as exceeding the limit
+        fitting = [c for c in candidates if c["fits"]]
+        best = max(
+            fitting or candidates[:1],
+            key=lambda c: c["examples_per_second"]
+        )
+
+        self.summary = {
+            "batch_size": best["batch_size"],
+            "examples_per_second": best["examples_per_second"],
+            "memory_limit_mb": self.memory_limit,
+            "memory_limit_exceeded": not fitting,
+            "inter_op_threads":
+                tf.config.threading.get_inter_op_parallelism_threads(),
+            "intra_op_threads":
+                tf.config.threading.get_intra_op_parallelism_threads(),
+            "candidates": candidates
+        }
+
+        return best["batch_size"]
+
+    def create_autotune_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the summary of the last
+        calibration to `autotuneSummary.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param file_system:
+        :type file_system:
+        :return: None
+        :rtype: NoneType
+        """
+        autotune_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "autotuneSummary.json"
+        )
+
+        with open(autotune_json_path, "w+") as file:
+            file.write(json.dumps(self.summary))
+
+        return None
@@ -0,0 +1,325 @@
+"""
+callbacks.py - The callbacks.py module contains the Keras
+callbacks used by the Trainer class during fine tuning.
+"""
+import csv
+import time
+import resource
+from typing import Any, Dict, List
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+
+class TimeBudget(keras.callbacks.Callback):
+    """
+    TimeBudget - The TimeBudget class encapsulates logic related
+    to stopping the training loop once a wall clock budget has
+    been spent. Keras calls the batch callbacks once per
+    execution (`steps_per_execution` steps), so training stops
+    when the next execution would exceed the budget.
+    """
+
+    def __init__(self, budget: float):
+        """
+
+        :param budget: The wall clock budget in seconds.
+        :type budget: float
+        """
+        super().__init__()
+
+        #: The `budget` attribute represents the number of
+        #: seconds the training loop may run before it is
+        #: stopped.
+        self.budget: float = budget
+
+        #: The `stopped` attribute indicates whether or not the
+        #: budget was exhausted before training completed.
+        self.stopped: bool = False
+
+        #: The `start_time` attribute represents the time (in
+        #: seconds) at which training started.
+        self.start_time: float = 0.0
+
+        self._batch_start: float = 0.0
+
+    def on_train_begin(self, logs=None) -> None:
+        """
+
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        self.stopped = False
+        self.start_time = time.monotonic()
+
+        return None
+
+    def on_train_batch_begin(self, batch, logs=None) -> None:
+        """
+
+        :param batch:
+        :type batch:
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        self._batch_start = time.monotonic()
+
+        return None
+
+    def on_train_batch_end(self, batch, logs=None) -> None:
+        """This method stops training as soon as the elapsed time
+        and the time of another execution like this one exceed
+        the budget. The current epoch is still closed (including
+        validation) so the stopping epoch is reported in the
+        build history.
+
+        :param batch:
+        :type batch:
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        batch_end = time.monotonic()
+        if (batch_end - self.start_time) \
+                + (batch_end - self._batch_start) >= self.budget:
+            self.stopped = True
+            self.model.stop_training = True
+
+        return None
+
+
+class ThroughputMonitor(keras.callbacks.Callback):
+    """
+    ThroughputMonitor - The ThroughputMonitor class encapsulates
+    logic related to recording per step training throughput so
+    it can be determined whether training is compute bound or
+    input bound. Training is fed by `dataset`, which records the
+    time spent fetching each batch. With `steps_per_execution`
+    above 1 Keras calls the batch callbacks once per execution,
+    so a row covers `steps` steps.
+    """
+
+    #: The `CSV_COLUMNS` attribute is a constant which represents
+    #: the columns of the time series written by `create_csv`.
+    CSV_COLUMNS: List[str] = [
+        "epoch",
+        "step",
+        "steps",
+        "step_time",
+        "data_wait_time",
+        "examples",
+        "tokens",
+        "peak_rss_mb"
+    ]
+
+    def __init__(
+            self,
+            train_size: int,
+            batch_size: int,
+            tokens_per_example: float
+    ):
+        """
+
+        :param train_size: The number of training examples \
+        (excluding the validation split).
+        :type train_size: int
+        :param batch_size:
+        :type batch_size: int
+        :param tokens_per_example: The mean number of non pad \
+        tokens per training example.
+        :type tokens_per_example: float
+        """
+        super().__init__()
+        self.train_size: int = train_size
+        self.batch_size: int = batch_size
+        self.tokens_per_example: float = tokens_per_example
+
+        #: The `records` attribute represents the time series,
+        #: one row (see `CSV_COLUMNS`) per execution of the
+        #: train function.
+        self.records: List[List[Any]] = list()
+
+        self._epoch: int = 0
+        self._batch_start: float = 0.0
+        self._first_step: int = 0
+        # the total time spent fetching batches, see `dataset`
+        self._data_wait_time: float = 0.0
+        self._batch_data_wait_time: float = 0.0
+
+    def dataset(
+            self,
+            x: np.ndarray,
+            y: np.ndarray
+    ) -> tf.data.Dataset:
+        """This method returns the shuffled training batches of
+        `x` and `y` as a dataset fed by a Python generator which
+        records the time spent fetching each batch. Batches are
+        not prefetched, so the train function waits for each
+        fetch and the fetch time is the data wait time of the
+        step.
+
+        :param x: The training examples.
+        :type x: np.ndarray
+        :param y: The training labels.
+        :type y: np.ndarray
+        :return: A dataset of `(x, y)` batches.
+        :rtype: tf.data.Dataset
+        """
+
+        def batches():
+            indices = np.random.permutation(len(x))
+            for start in range(0, len(x), self.batch_size):
+                fetch_start = time.perf_counter()
+                batch = indices[start:start + self.batch_size]
+                batch_x, batch_y = x[batch], y[batch]
+                self._data_wait_time += time.perf_counter() - fetch_start
+                yield batch_x, batch_y
+
+        return tf.data.Dataset.from_generator(
+            batches,
+            output_types=(
+                tf.as_dtype(x.dtype),
+                tf.as_dtype(y.dtype)
+            ),
+            output_shapes=(
+                tf.TensorShape((None,) + x.shape[1:]),
+                tf.TensorShape((None,) + y.shape[1:])
+            )
+        )
+
+    @staticmethod
+    def peak_rss() -> float:
+        """This method returns the peak resident set size of
+        the current process in MB.
+
+        :return: Peak resident set size in MB.
+        :rtype: float
+        """
+        # ru_maxrss is reported in kilobytes on Linux
+        return resource.getrusage(
+            resource.RUSAGE_SELF
+        ).ru_maxrss / 1024
+
+    def on_epoch_begin(self, epoch, logs=None) -> None:
+        """
+
+        :param epoch:
+        :type epoch:
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        self._epoch = epoch
+
+        return None
+
+    def on_train_batch_begin(self, batch, logs=None) -> None:
+        """
+
+        :param batch:
+        :type batch:
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        self._first_step = batch
+        self._batch_data_wait_time = self._data_wait_time
+        self._batch_start = time.perf_counter()
+
+        return None
+
+    def on_train_batch_end(self, batch, logs=None) -> None:
+        """This method records one row of the time series.
+        `batch` is the last step of the execution, the step time
+        and the data wait time are the means of its steps.
+        Batches are shuffled,
+        so tokens are estimated from the mean number of non pad
+        tokens per example.
+
+        :param batch:
+        :type batch:
+        :param logs:
+        :type logs:
+        :return: None
+        :rtype: NoneType
+        """
+        batch_end = time.perf_counter()
+        steps = batch - self._first_step + 1
+        examples = min(
+            steps * self.batch_size,
+            self.train_size - self._first_step * self.batch_size
+        )
+        self.records.append([
+            self._epoch,
+            self._first_step,
+            steps,
+            (batch_end - self._batch_start) / steps,
+            (self._data_wait_time - self._batch_data_wait_time) / steps,
+            examples,
+            examples * self.tokens_per_example,
+            self.peak_rss()
+        ])
+
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """This method summarizes the recorded time series.
+
+        :return: A dictionary of throughput statistics.
+        :rtype: Dict[str, Any]
+        """
+        if not self.records:
+            return dict()
+
+        steps = sum(record[2] for record in self.records)
+        step_times = sorted(record[3] for record in self.records)
+        step_time = sum(record[2] * record[3] for record in self.records)
+        data_wait_time = sum(
+            record[2] * record[4] for record in self.records
+        )
+        examples = sum(record[5] for record in self.records)
+        tokens = sum(record[6] for record in self.records)
+
+        return {
+            "steps": steps,
+            "mean_step_time": step_time / steps,
+            "p50_step_time": step_times[len(step_times) // 2],
+            "p95_step_time":
+                step_times[int(len(step_times) * 0.95)],
+            "mean_data_wait_time": data_wait_time / steps,
+            # the share of the step time spent waiting for input
+            "data_wait_fraction": data_wait_time / step_time,
+            "examples_per_second": examples / step_time,
+            "tokens_per_second": tokens / step_time,
+            "peak_rss_mb": self.records[-1][7]
+        }
+
+    def create_csv(self, path: str) -> None:
+        """This method writes the recorded time series to a CSV
+        file at `path`.
+
+        :param path:
+        :type path:
+        :return: None
+        :rtype: NoneType
+        """
+        with open(path, "w+", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.CSV_COLUMNS)
+            for record in self.records:
+                writer.writerow(
+                    [
+                        f"{value:.6f}"
+                        if isinstance(value, float) else value
+                        for value in record
+                    ]
+                )
+
+        return None
@@ -0,0 +1,320 @@
+"""
+distiller.py - The distiller.py module contains the Distiller
+class definition which encapsulates knowledge distillation from a
+(large) teacher build into a (small) student model.
+"""
+import os
+import copy
+import hashlib
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from woodgate.woodgate_settings import Architecture, FileSystem
+from woodgate.tuning.external_datasets import ExternalDatasets
+from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.trainer.storage import Storage
+from woodgate.compiler.compiler import Compiler
+
+
+class DistillationLoss(keras.losses.Loss):
+    """
+    DistillationLoss - The DistillationLoss class blends the
+    sparse categorical crossentropy of the hard labels with the
+    KL divergence between the temperature scaled teacher and
+    student distributions. `y_true` holds the hard label in its
+    first column followed by the teacher logits.
+    """
+
+    def __init__(
+            self,
+            alpha: float = 0.5,
+            temperature: float = 2.0,
+            name: str = "distillation_loss"
+    ):
+        """
+
+        :param alpha: The weight of the hard label loss, the \
+        teacher loss is weighted by `1 - alpha`.
+        :type alpha: float
+        :param temperature:
+        :type temperature: float
+        :param name:
+        :type name: str
+        """
+        super().__init__(name=name)
+        self.alpha: float = alpha
+        self.temperature: float = temperature
+
+    def call(self, y_true, y_pred):
+        """
+
+        :param y_true:
+        :type y_true:
+        :param y_pred:
+        :type y_pred:
+        :return:
+        :rtype:
+        """
+        hard_labels = tf.cast(y_true[:, 0], tf.int32)
+        teacher_logits = y_true[:, 1:]
+
+        hard_loss = keras.losses.sparse_categorical_crossentropy(
+            hard_labels,
+            y_pred
+        )
+
+        # the student outputs softmax probabilities, their log
+        # is a valid set of logits
+        student_logits = tf.math.log(
+            tf.clip_by_value(y_pred, 1e-7, 1.0)
+        )
+        soft_loss = keras.losses.kl_divergence(
+            tf.nn.softmax(teacher_logits / self.temperature),
+            tf.nn.softmax(student_logits / self.temperature)
+        ) * self.temperature ** 2
+
+        return self.alpha * hard_loss \
+            + (1 - self.alpha) * soft_loss
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        config = super().get_config()
+        config.update({
+            "alpha": self.alpha,
+            "temperature": self.temperature
+        })
+        return config
+
+
+class DistillationAccuracy(keras.metrics.SparseCategoricalAccuracy):
+    """
+    DistillationAccuracy - The DistillationAccuracy class is the
+    sparse categorical accuracy of the hard label stored in the
+    first column of the distillation targets.
+    """
+
+    def __init__(self, name: str = "sparse_categorical_accuracy"):
+        """
+
+        :param name:
+        :type name: str
+        """
+        super().__init__(name=name)
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        """
+
+        :param y_true:
+        :type y_true:
+        :param y_pred:
+        :type y_pred:
+        :param sample_weight:
+        :type sample_weight:
+        :return:
+        :rtype:
+        """
+        return super().update_state(
+            y_true[:, :1],
+            y_pred,
+            sample_weight
+        )
+
+
+class Distiller:
+    """
+    Distiller - The Distiller class encapsulates logic related to
+    training a student model (built by `Trainer.model_factory`) on
+    a blend of hard labels and the temperature scaled outputs of a
+    previously trained teacher build.
+    """
+
+    def __init__(
+            self,
+            teacher_file_system: FileSystem,
+            alpha: float = 0.5,
+            temperature: float = 2.0
+    ):
+        """
+
+        :param teacher_file_system: The file system of the \
+        teacher build.
+        :type teacher_file_system: FileSystem
+        :param alpha:
+        :type alpha: float
+        :param temperature:
+        :type temperature: float
+        """
+        #: The `teacher_file_system` attribute represents the file
+        #: system of the teacher build, the teacher is loaded from
+        #: its `build_dir` via `Storage.load_model`.
+        self.teacher_file_system: FileSystem = teacher_file_system
+
+        #: The `alpha` attribute represents the weight of the hard
+        #: label loss, the teacher loss is weighted by
+        #: `1 - alpha`.
+        if alpha < 0 or alpha > 1:
+            raise ValueError("alpha must be a value [0, 1]")
+        self.alpha: float = alpha
+
+        #: The `temperature` attribute represents the softmax
+        #: temperature applied to teacher and student logits.
+        if temperature <= 0:
+            raise ValueError("temperature must be positive")
+        self.temperature: float = temperature
+
+    def get_teacher_logits_path(self, data: Preprocessor) -> str:
+        """This method returns the path of the cached teacher
+        logits for the training set of `data`. The cache lives in
+        the teacher build and is keyed by a digest of the
+        training tokens so it can be shared by several students.
+
+        :param data:
+        :type data: Preprocessor
+        :return: Path to the cached teacher logits.
+        :rtype: str
+        """
+        digest = hashlib.sha1(
+            np.ascontiguousarray(data.train_x).tobytes()
+        ).hexdigest()
+
+        return os.path.join(
+            self.teacher_file_system.build_dir,
+            "teacher_logits",
+            f"{digest}.npy"
+        )
+
+    def teacher_logits(self, data: Preprocessor) -> np.ndarray:
+        """This method returns the teacher logits for the
+        training set of `data`, in the order of `data.intents`.
+        The logits are computed once with the teacher build and
+        cached on disk in the order of the teacher intents.
+
+        :param data:
+        :type data: Preprocessor
+        :return: An array of shape (examples, intents).
+        :rtype: np.ndarray
+        """
+        teacher_logits_path = self.get_teacher_logits_path(data)
+        if os.path.isfile(teacher_logits_path):
+            predictions = np.load(teacher_logits_path)
+        else:
+            predictions = self.predict_teacher_logits(data)
+            os.makedirs(
+                os.path.dirname(teacher_logits_path),
+                exist_ok=True
+            )
+            np.save(teacher_logits_path, predictions)
+
+        teacher_intents = ExternalDatasets.read_intents(
+            self.teacher_file_system
+        )
+        if predictions.shape[1] != len(teacher_intents) \
+                or sorted(teacher_intents) != sorted(data.intents):
+            raise ValueError(
+                "teacher and student intents do not match"
+            )
+
+        # the columns are reordered to the student intents
+        return predictions[
+            :,
+            [teacher_intents.index(intent) for intent in data.intents]
+        ]
+
+    def predict_teacher_logits(self, data: Preprocessor) -> np.ndarray:
+        """This method predicts the teacher logits for the
+        training set of `data` with the teacher build.
+
+        :param data:
+        :type data: Preprocessor
+        :return: An array of shape (examples, teacher intents).
+        :rtype: np.ndarray
+        """
+        teacher = Storage.load_model(self.teacher_file_system)
+
+        # the teacher may have been built with a different
+        # maximum sequence length
+        train_x = data.train_x
+        teacher_length = teacher.input_shape[1]
+        if train_x.shape[1] > teacher_length:
+            train_x = train_x[:, :teacher_length]
+        elif train_x.shape[1] < teacher_length:
+            train_x = np.pad(
+                train_x,
+                ((0, 0), (0, teacher_length - train_x.shape[1]))
+            )
+
+        predictions = teacher.predict(train_x)
+
+        # softmax outputs are converted to logits, other outputs
+        # are assumed to be logits already
+        if np.all(predictions >= 0) \
+                and np.allclose(predictions.sum(axis=1), 1.0):
+            predictions = np.log(np.clip(predictions, 1e-7, 1.0))
+
+        return predictions.astype(np.float32)
+
+    def distillation_data(self, data: Preprocessor) -> Preprocessor:
+        """This method returns a shallow copy of `data` whose
+        `train_y` holds the hard label in its first column
+        followed by the teacher logits.
+
+        :param data:
+        :type data: Preprocessor
+        :return: Data with distillation targets.
+        :rtype: Preprocessor
+        """
+        distillation_data = copy.copy(data)
+        distillation_data.train_y = np.concatenate(
+            [
+                data.train_y.reshape(-1, 1).astype(np.float32),
+                self.teacher_logits(data)
+            ],
+            axis=1
+        )
+
+        return distillation_data
+
+    def compile(
+            self,
+            model: keras.Model,
+            optimizer: keras.optimizers.Optimizer,
+            architecture: Architecture,
+            profile: str = "default"
+    ) -> None:
+        """This method compiles the student `model` with the
+        distillation loss. The student should be compiled with
+        its regular loss again after training, before it is
+        evaluated or saved.
+
+        :param model:
+        :type model: keras.Model
+        :param optimizer:
+        :type optimizer: keras.optimizers.Optimizer
+        :param architecture:
+        :type architecture: Architecture
+        :param profile: The name of the compile profile.
+        :type profile: str
+        :return: None
+        :rtype: NoneType
+        """
+        if architecture.logits_activation != "softmax":
+            raise ValueError(
+                "distillation requires a softmax logits activation"
+            )
+
+        Compiler.compile(
+            model=model,
+            optimizer=optimizer,
+            loss=DistillationLoss(
+                alpha=self.alpha,
+                temperature=self.temperature
+            ),
+            metrics=[DistillationAccuracy()],
+            profile=profile
+        )
+
+        return None
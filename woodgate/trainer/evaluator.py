@@ -5,8 +5,10 @@ build_history.
 """
 import os
 import json
+import time
 from typing import Tuple, Any, Dict, List
 import numpy as np
+import tensorflow as tf
 from tensorflow import keras
 from woodgate.woodgate_settings import FileSystem
 from woodgate.tuning.external_datasets import \
@@ -24,6 +26,11 @@ class Evaluator:
     #:
     regression_test_records: List[Dict[str, Any]] = list()
 
+    #: The `quantization_report` attribute represents the
+    #: comparison of the last quantized model with its SavedModel
+    #: on the regression data.
+    quantization_report: Dict[str, Any] = dict()
+
     @staticmethod
     def evaluate_model_accuracy(
             model: keras.Model,
@@ -52,32 +59,21 @@ class Evaluator:
 
         return train, test
 
-    @classmethod
-    def perform_regression_testing(
-            cls,
-            model: keras.Model,
+    @staticmethod
+    def get_regression_token_ids(
             data: Preprocessor,
             file_system: FileSystem
-    ) -> None:
-        """This method will perform regression testing on the
-        evaluator (it is assumed this method is called after
-        training). Where regression testing differs from the
-        other tests in that the result is recorded and a report
-        is generated which considers successive evaluator builds
-        for a time series representation of the evaluator's
-        accuracy over the complete build_history history.
+    ) -> np.ndarray:
+        """This method returns the padded token ids of the
+        regression data.
 
-        :param model:
-        :type model:
         :param data:
-        :type data:
+        :type data: Preprocessor
         :param file_system:
-        :type file_system:
-        :return:
-        :rtype:
+        :type file_system: FileSystem
+        :return: The padded token ids.
+        :rtype: np.ndarray
         """
-
-        # TODO - Deliver on the doc string.
         vocab_file = file_system.get_bert_vocab_path()
         pred_tokens = map(
             Preprocessor.tokenizer_factory(vocab_file).tokenize,
@@ -101,6 +97,39 @@ class Evaluator:
         )
         pred_token_ids = np.array(list(pred_token_ids))
 
+        return pred_token_ids
+
+    @classmethod
+    def perform_regression_testing(
+            cls,
+            model: keras.Model,
+            data: Preprocessor,
+            file_system: FileSystem
+    ) -> None:
+        """This method will perform regression testing on the
+        evaluator (it is assumed this method is called after
+        training). Where regression testing differs from the
+        other tests in that the result is recorded and a report
+        is generated which considers successive evaluator builds
+        for a time series representation of the evaluator's
+        accuracy over the complete build_history history.
+
+        :param model:
+        :type model:
+        :param data:
+        :type data:
+        :param file_system:
+        :type file_system:
+        :return:
+        :rtype:
+        """
+
+        # TODO - Deliver on the doc string.
+        pred_token_ids = cls.get_regression_token_ids(
+            data,
+            file_system
+        )
+
         predictions = model.predict(pred_token_ids).argmax(
             axis=-1)
 
@@ -131,6 +160,158 @@ class Evaluator:
 
         return None
 
+    @staticmethod
+    def predict_tflite(
+            tflite_model_path: str,
+            x: np.ndarray
+    ) -> np.ndarray:
+        """This method returns the predictions of the TFLite
+        model at `tflite_model_path` for the padded token ids
+        `x`, one example at a time.
+
+        :param tflite_model_path:
+        :type tflite_model_path: str
+        :param x:
+        :type x: np.ndarray
+        :return: The predictions.
+        :rtype: np.ndarray
+        """
+        interpreter = tf.lite.Interpreter(
+            model_path=tflite_model_path
+        )
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]["index"]
+        output_index = interpreter.get_output_details()[0]["index"]
+
+        predictions = list()
+        for input_ids in x:
+            interpreter.set_tensor(
+                input_index,
+                input_ids[np.newaxis].astype(np.int32)
+            )
+            interpreter.invoke()
+            predictions.append(
+                interpreter.get_tensor(output_index)[0].copy()
+            )
+
+        return np.array(predictions)
+
+    @classmethod
+    def compare_quantized_model(
+            cls,
+            model: keras.Model,
+            tflite_model_path: str,
+            data: Preprocessor,
+            file_system: FileSystem,
+            latency_examples: int = 20
+    ) -> Dict[str, Any]:
+        """This method runs the regression data through both
+        `model` and the quantized TFLite model at
+        `tflite_model_path` and reports the accuracy of each, the
+        accuracy delta, the share of matching predictions and
+        the single utterance latency speedup.
+
+        :param model:
+        :type model: keras.Model
+        :param tflite_model_path:
+        :type tflite_model_path: str
+        :param data:
+        :type data: Preprocessor
+        :param file_system:
+        :type file_system: FileSystem
+        :param latency_examples: The number of single utterance \
+        predictions timed per model.
+        :type latency_examples: int
+        :return: The quantization report.
+        :rtype: Dict[str, Any]
+        """
+        pred_token_ids = cls.get_regression_token_ids(
+            data,
+            file_system
+        )
+        intents = ExternalDatasets.all_intents()
+        expected = np.array([
+            intents.index(label)
+            for label in ExternalDatasets.regression_data[
+                Preprocessor.label_column_title
+            ]
+        ])
+
+        predictions = model.predict(pred_token_ids).argmax(axis=-1)
+        tflite_predictions = cls.predict_tflite(
+            tflite_model_path,
+            pred_token_ids
+        ).argmax(axis=-1)
+
+        examples = pred_token_ids[:latency_examples]
+        latencies = list()
+        for input_ids in examples:
+            start = time.perf_counter()
+            model.predict_on_batch(input_ids[np.newaxis])
+            latencies.append(time.perf_counter() - start)
+        latency_ms = float(np.median(latencies)) * 1000
+
+        # the interpreter is set up once, each prediction is
+        # timed from its input to its output like the Keras one
+        interpreter = tf.lite.Interpreter(model_path=tflite_model_path)
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]["index"]
+        output_index = interpreter.get_output_details()[0]["index"]
+        tflite_latencies = list()
+        for input_ids in examples:
+            start = time.perf_counter()
+            interpreter.set_tensor(
+                input_index,
+                input_ids[np.newaxis].astype(np.int32)
+            )
+            interpreter.invoke()
+            interpreter.get_tensor(output_index)
+            tflite_latencies.append(time.perf_counter() - start)
+        tflite_latency_ms = float(np.median(tflite_latencies)) * 1000
+
+        accuracy = float(np.mean(predictions == expected))
+        tflite_accuracy = float(np.mean(tflite_predictions == expected))
+
+        cls.quantization_report = {
+            "accuracy": accuracy,
+            "tflite_accuracy": tflite_accuracy,
+            "accuracy_delta": tflite_accuracy - accuracy,
+            "agreement": float(
+                np.mean(predictions == tflite_predictions)
+            ),
+            "latency_ms": latency_ms,
+            "tflite_latency_ms": tflite_latency_ms,
+            "latency_speedup": latency_ms / tflite_latency_ms,
+            "tflite_size_mb":
+                os.path.getsize(tflite_model_path) / 1024 ** 2
+        }
+
+        return cls.quantization_report
+
+    @classmethod
+    def create_quantization_report_json(
+            cls,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the last quantization report to
+        `quantizationReport.json` in the
+        `file_system.evaluation_summary_dir` directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        quantization_report_json_path = os.path.join(
+            file_system.evaluation_summary_dir,
+            "quantizationReport.json"
+        )
+
+        with open(quantization_report_json_path, "w+") as file:
+            file.write(json.dumps(cls.quantization_report))
+
+        return None
+
     @classmethod
     def create_regression_test_results_json(
             cls,
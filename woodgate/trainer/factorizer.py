@@ -0,0 +1,395 @@
+"""
+factorizer.py - The factorizer.py module contains the LowRankDense
+and Factorizer class definitions.
+"""
+import os
+import re
+import json
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from bert import BertModelLayer
+from params_flow.activations import gelu
+from woodgate.woodgate_settings import FileSystem
+from woodgate.trainer.preprocessor import Preprocessor
+
+
+class LowRankDense(keras.layers.Layer):
+    """
+    LowRankDense - The LowRankDense class implements a dense
+    layer whose kernel is the product of two rank `rank`
+    matrices, `kernel_u` (inputs, rank) and `kernel_v` (rank,
+    units). Below `inputs * units / (inputs + units)` it needs
+    fewer multiplications than the full kernel.
+    """
+
+    #: The `CUSTOM_OBJECTS` attribute is a constant which
+    #: represents the activations of BERT layers which Keras
+    #: cannot deserialize by name, they must be passed to
+    #: `keras.models.load_model`.
+    CUSTOM_OBJECTS: Dict[str, Any] = {"gelu": gelu}
+
+    def __init__(
+            self,
+            units: int,
+            rank: int,
+            activation=None,
+            **kwargs
+    ):
+        """
+
+        :param units:
+        :type units: int
+        :param rank:
+        :type rank: int
+        :param activation: The name of an activation (see \
+        `CUSTOM_OBJECTS`) or the activation function.
+        :type activation: Union[str, Callable]
+        :param kwargs: Keyword arguments of `keras.layers.Layer`.
+        :type kwargs:
+        """
+        super().__init__(**kwargs)
+        if rank < 1:
+            raise ValueError("rank must be at least 1")
+
+        self.units: int = units
+        self.rank: int = rank
+        self.activation = keras.activations.get(
+            self.CUSTOM_OBJECTS.get(activation, activation)
+            if isinstance(activation, str) else activation
+        )
+
+    def build(self, input_shape):
+        """
+
+        :param input_shape:
+        :type input_shape:
+        :return:
+        :rtype:
+        """
+        self.kernel_u = self.add_weight(
+            "kernel_u",
+            shape=[int(input_shape[-1]), self.rank]
+        )
+        self.kernel_v = self.add_weight(
+            "kernel_v",
+            shape=[self.rank, self.units]
+        )
+        self.bias = self.add_weight(
+            "bias",
+            shape=[self.units],
+            initializer="zeros"
+        )
+        super().build(input_shape)
+
+    def call(self, inputs):
+        """
+
+        :param inputs:
+        :type inputs:
+        :return:
+        :rtype:
+        """
+        outputs = tf.tensordot(
+            tf.tensordot(inputs, self.kernel_u, axes=1),
+            self.kernel_v,
+            axes=1
+        )
+
+        return self.activation(outputs + self.bias)
+
+    def get_config(self):
+        """
+
+        :return:
+        :rtype:
+        """
+        config = super().get_config()
+        config.update({
+            "units": self.units,
+            "rank": self.rank,
+            "activation": keras.activations.serialize(self.activation)
+        })
+
+        return config
+
+
+class Factorizer:
+    """
+    Factorizer - The Factorizer class encapsulates logic related
+    to the low rank compression of a trained model. The selected
+    dense layers of the encoder are replaced by `LowRankDense`
+    layers initialized from the truncated SVD of their kernel.
+    The rank of each layer is the smallest which keeps `energy`
+    of the squared singular values, layers which would not get
+    cheaper keep their full kernel. Since the replaced layers are
+    part of the model, the compressed model is saved, loaded and
+    served like any other build.
+    """
+
+    #: The `TARGETS` attribute is a constant which represents the
+    #: dense layers (within an encoder layer) which can be
+    #: factorized.
+    TARGETS: List[str] = [
+        "attention/self/query",
+        "attention/self/key",
+        "attention/self/value",
+        "attention/output/dense",
+        "intermediate",
+        "output/dense"
+    ]
+
+    def __init__(
+            self,
+            energy: float = 0.9,
+            max_rank_ratio: float = 0.5,
+            max_accuracy_drop: float = None,
+            targets: List[str] = None,
+            recovery_epochs: int = 0
+    ):
+        """
+
+        :param energy: The share of the squared singular values \
+        each factorized kernel keeps.
+        :type energy: float
+        :param max_rank_ratio: The largest cost of a factorized \
+        layer relative to its full kernel, layers above it are \
+        not factorized.
+        :type max_rank_ratio: float
+        :param max_accuracy_drop: If set, the factorization is \
+        reverted when the test accuracy drops by more.
+        :type max_accuracy_drop: float
+        :param targets: The dense layers to factorize, see \
+        `TARGETS`. If `None`, all of `TARGETS` are factorized.
+        :type targets: List[str]
+        :param recovery_epochs: The number of epochs of the \
+        recovery fine tuning of the factorized model.
+        :type recovery_epochs: int
+        """
+        if energy <= 0 or energy > 1:
+            raise ValueError("energy must be a value (0, 1]")
+        if max_rank_ratio <= 0 or max_rank_ratio > 1:
+            raise ValueError("max_rank_ratio must be a value (0, 1]")
+        if targets is not None \
+                and not set(targets).issubset(self.TARGETS):
+            raise ValueError(
+                "targets must be a subset of: "
+                + ", ".join(f'"{target}"' for target in self.TARGETS)
+            )
+        if recovery_epochs < 0:
+            raise ValueError("recovery_epochs must be at least 0")
+
+        #: The `energy` attribute represents the share of the
+        #: squared singular values each factorized kernel keeps.
+        self.energy: float = energy
+
+        #: The `max_rank_ratio` attribute represents the largest
+        #: cost of a factorized layer relative to its full kernel.
+        self.max_rank_ratio: float = max_rank_ratio
+
+        #: The `max_accuracy_drop` attribute represents the
+        #: accuracy budget of the factorization.
+        self.max_accuracy_drop: float = max_accuracy_drop
+
+        #: The `targets` attribute represents the dense layers
+        #: which are factorized.
+        self.targets: List[str] = targets or list(self.TARGETS)
+
+        #: The `recovery_epochs` attribute represents the number
+        #: of epochs the factorized model is fine tuned for.
+        self.recovery_epochs: int = recovery_epochs
+
+        #: The `summary` attribute represents the result of the
+        #: last call to `factorize`.
+        self.summary: Dict[str, Any] = dict()
+
+    def rank(self, singular_values: np.ndarray) -> int:
+        """This method returns the smallest rank which keeps
+        `energy` of the squared `singular_values`.
+
+        :param singular_values: Singular values, largest first.
+        :type singular_values: np.ndarray
+        :return:
+        :rtype: int
+        """
+        energy = np.cumsum(singular_values ** 2)
+
+        return min(
+            int(np.searchsorted(energy, self.energy * energy[-1])) + 1,
+            len(singular_values)
+        )
+
+    def _dense_layers(
+            self,
+            layer: keras.layers.Layer,
+            visited: set = None
+    ) -> List[Tuple[keras.layers.Layer, str, keras.layers.Dense]]:
+        """This method returns the targeted dense layers nested
+        in `layer` with their parent layer and attribute name.
+
+        :param layer:
+        :type layer: keras.layers.Layer
+        :param visited:
+        :type visited: set
+        :return:
+        :rtype: List[Tuple[keras.layers.Layer, str, \
+        keras.layers.Dense]]
+        """
+        if visited is None:
+            visited = set()
+        visited.add(id(layer))
+
+        dense_layers = list()
+        for attribute, value in list(vars(layer).items()):
+            if attribute.startswith("_"):
+                continue
+            for child in value if isinstance(value, list) else [value]:
+                if not isinstance(child, keras.layers.Layer) \
+                        or id(child) in visited:
+                    continue
+                if type(child) is keras.layers.Dense:
+                    # e.g. `name/encoder/layer_0/intermediate/kernel:0`
+                    match = re.fullmatch(
+                        r"[^/]+/encoder/layer_\d+/(.+)/kernel:\d+",
+                        child.kernel.name
+                    )
+                    if match is not None \
+                            and match.group(1) in self.targets:
+                        dense_layers.append((layer, attribute, child))
+                else:
+                    dense_layers.extend(
+                        self._dense_layers(child, visited)
+                    )
+
+        return dense_layers
+
+    @staticmethod
+    def _accuracy(model: keras.Model, data: Preprocessor) -> float:
+        """This method returns the accuracy of `model` on the
+        test data.
+
+        :param model:
+        :type model: keras.Model
+        :param data:
+        :type data: Preprocessor
+        :return:
+        :rtype: float
+        """
+        predictions = model.predict(data.test_x).argmax(axis=-1)
+
+        return float(np.mean(predictions == data.test_y))
+
+    def factorize(
+            self,
+            bert_model: keras.Model,
+            data: Preprocessor
+    ) -> Dict[str, Any]:
+        """This method replaces the targeted dense layers of
+        `bert_model` by their low rank factorization, in place.
+        The model must be compiled again before it is fine tuned.
+
+        :param bert_model: The trained model.
+        :type bert_model: keras.Model
+        :param data:
+        :type data: Preprocessor
+        :return: A summary of the factorized layers.
+        :rtype: Dict[str, Any]
+        """
+        bert = None
+        for layer in bert_model.layers:
+            if isinstance(layer, BertModelLayer):
+                bert = layer
+        if bert is None:
+            raise ValueError("model has no BERT layer")
+
+        accuracy = self._accuracy(bert_model, data)
+        parameters = bert_model.count_params()
+
+        replaced = list()
+        layers = list()
+        for parent, attribute, dense in self._dense_layers(bert):
+            kernel, bias = dense.get_weights()
+            u, s, vt = np.linalg.svd(kernel, full_matrices=False)
+            rank = self.rank(s)
+            inputs, units = kernel.shape
+            rank_ratio = rank * (inputs + units) / (inputs * units)
+            layers.append({
+                "layer": dense.kernel.name.rsplit("/", 1)[0],
+                "shape": [inputs, units],
+                "rank": rank,
+                "rank_ratio": rank_ratio,
+                "factorized": rank_ratio <= self.max_rank_ratio
+            })
+            if rank_ratio > self.max_rank_ratio:
+                continue
+
+            # the activation is passed as is, e.g. the `gelu` of
+            # the feed forward layers is not a Keras activation
+            low_rank_dense = LowRankDense(
+                units=units,
+                rank=rank,
+                activation=dense.activation,
+                name=dense.name
+            )
+            low_rank_dense.build((None, inputs))
+            # the singular values are split evenly between the
+            # factors to keep both in a similar range
+            scale = np.sqrt(s[:rank])
+            low_rank_dense.set_weights([
+                u[:, :rank] * scale,
+                scale[:, np.newaxis] * vt[:rank],
+                bias
+            ])
+            setattr(parent, attribute, low_rank_dense)
+            replaced.append((parent, attribute, dense))
+
+        # the functions traced with the full kernels are stale
+        bert_model.train_function = None
+        bert_model.test_function = None
+        bert_model.predict_function = None
+
+        factorized_accuracy = self._accuracy(bert_model, data)
+        reverted = self.max_accuracy_drop is not None \
+            and accuracy - factorized_accuracy > self.max_accuracy_drop
+        if reverted:
+            for parent, attribute, dense in replaced:
+                setattr(parent, attribute, dense)
+            bert_model.predict_function = None
+
+        self.summary = {
+            "energy": self.energy,
+            "max_rank_ratio": self.max_rank_ratio,
+            "layers": layers,
+            "parameters": parameters,
+            "factorized_parameters": bert_model.count_params(),
+            "accuracy": accuracy,
+            "factorized_accuracy": factorized_accuracy,
+            "reverted": reverted,
+            "recovery_epochs": self.recovery_epochs
+        }
+
+        return self.summary
+
+    def create_factorize_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the summary of the last
+        factorization to `factorizeSummary.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        factorize_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "factorizeSummary.json"
+        )
+
+        with open(factorize_json_path, "w+") as file:
+            file.write(json.dumps(self.summary))
+
+        return None
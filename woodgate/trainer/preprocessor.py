@@ -3,6 +3,9 @@ preprocessor.py - This preprocessor.py module contains the
 TextPreprocessor class definition.
 """
 import os
+import csv
+import json
+from typing import List
 import numpy as np
 from bert.tokenization.bert_tokenization import FullTokenizer
 
@@ -80,6 +83,115 @@ class Preprocessor:
             x.append(np.array(input_ids))
         return np.array(x)
 
+    def save(self, path: str) -> None:
+        """This method saves the processed (tokenized and padded)
+        data to `path` (`.npz` file extension) so it can be shared
+        with other processes via `Preprocessor.load` instead of
+        tokenizing the corpus again.
+
+        :param path: Path of the `.npz` file.
+        :type path: str
+        :return: None
+        :rtype: NoneType
+        """
+        np.savez(
+            path,
+            train_x=self.train_x,
+            train_y=self.train_y,
+            test_x=self.test_x,
+            test_y=self.test_y,
+            intents=np.array(self.intents),
+            max_sequence_length=self.max_sequence_length
+        )
+
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> "Preprocessor":
+        """This method loads processed data saved by
+        `Preprocessor.save`. The returned object has no
+        tokenizer.
+
+        :param path: Path of the `.npz` file.
+        :type path: str
+        :return: The processed data.
+        :rtype: Preprocessor
+        """
+        with np.load(path) as data:
+            preprocessor = cls.__new__(cls)
+            preprocessor.tokenizer = None
+            preprocessor.train_x = data["train_x"]
+            preprocessor.train_y = data["train_y"]
+            preprocessor.test_x = data["test_x"]
+            preprocessor.test_y = data["test_y"]
+            preprocessor.intents = data["intents"].tolist()
+            preprocessor.max_sequence_length = int(
+                data["max_sequence_length"]
+            )
+
+        return preprocessor
+
+    @staticmethod
+    def encode(
+            tokenizer: FullTokenizer,
+            texts,
+            max_sequence_length: int
+    ) -> np.ndarray:
+        """This method returns the padded token ids of `texts`,
+        tokenized, truncated and padded like the training data,
+        so models can be served with the tokenizer they were
+        trained with.
+
+        :param tokenizer:
+        :type tokenizer: FullTokenizer
+        :param texts: An iterable of utterances.
+        :type texts:
+        :param max_sequence_length: The input length of the model.
+        :type max_sequence_length: int
+        :return: An int32 array of shape (len(texts), \
+        max_sequence_length).
+        :rtype: np.ndarray
+        """
+        x = list()
+        for text in texts:
+            token_ids = tokenizer.convert_tokens_to_ids(
+                ["[CLS]"] + tokenizer.tokenize(text) + ["[SEP]"]
+            )[:max_sequence_length - 2]
+            x.append(
+                token_ids + [0] * (max_sequence_length - len(token_ids))
+            )
+
+        return np.array(x, dtype=np.int32).reshape(
+            (-1, max_sequence_length)
+        )
+
+    @classmethod
+    def read_texts(cls, path: str, limit: int = None) -> List[str]:
+        """This method returns the utterances (the
+        `data_column_title` field) of the CSV or JSON lines
+        (`.jsonl`) file `path`, e.g. a sample of requests.
+
+        :param path:
+        :type path: str
+        :param limit: If set, only the first `limit` utterances \
+        are read.
+        :type limit: int
+        :return:
+        :rtype: List[str]
+        """
+        texts = list()
+        with open(path, newline="") as file:
+            if path.endswith(".csv"):
+                records = csv.DictReader(file)
+            else:
+                records = (json.loads(line) for line in file if line.strip())
+            for record in records:
+                if limit is not None and len(texts) >= limit:
+                    break
+                texts.append(record[cls.data_column_title])
+
+        return texts
+
     @staticmethod
     def tokenizer_factory(vocab_file: str) -> FullTokenizer:
         """This method will return a BERT tokenizer initialized
@@ -0,0 +1,497 @@
+"""
+pruner.py - The pruner.py module contains the Pruner class
+definition.
+"""
+import os
+import re
+import copy
+import json
+import math
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from bert import BertModelLayer
+from woodgate.woodgate_settings import FileSystem, Architecture
+from woodgate.tuning.external_datasets import ExternalDatasets
+from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.trainer.trainer import Trainer
+
+
+class Pruner:
+    """
+    Pruner - The Pruner class encapsulates logic related to the
+    structured pruning of a fine tuned model. Feed forward
+    channels and whole encoder layers are scored by their first
+    order (Taylor) importance on the validation data and the
+    lowest scoring ones are removed until the encoder FLOPs fit
+    the budget. The pruned model is a regular, smaller BERT
+    model, so the speedup holds on dense CPU kernels.
+    """
+
+    #: The `FFN_WEIGHTS` attribute is a constant which represents
+    #: the paths (within an encoder layer) of the feed forward
+    #: weights and the axis of their channels.
+    FFN_WEIGHTS: Dict[str, int] = {
+        "intermediate/kernel": 1,
+        "intermediate/bias": 0,
+        "output/dense/kernel": 0
+    }
+
+    def __init__(
+            self,
+            flops_ratio: float = 0.5,
+            min_ffn_ratio: float = 0.25,
+            recovery_epochs: int = 1,
+            batch_size: int = 16
+    ):
+        """
+
+        :param flops_ratio: The encoder FLOPs of the pruned \
+        model relative to the fine tuned model.
+        :type flops_ratio: float
+        :param min_ffn_ratio: The smallest feed forward width \
+        relative to the fine tuned model. Once the width reaches \
+        this floor, whole layers are removed instead.
+        :type min_ffn_ratio: float
+        :param recovery_epochs: The number of epochs of the \
+        recovery fine tuning of the pruned model.
+        :type recovery_epochs: int
+        :param batch_size: The batch size used to score the \
+        validation data.
+        :type batch_size: int
+        """
+        if flops_ratio <= 0 or flops_ratio > 1:
+            raise ValueError("flops_ratio must be a value (0, 1]")
+        if min_ffn_ratio <= 0 or min_ffn_ratio > 1:
+            raise ValueError("min_ffn_ratio must be a value (0, 1]")
+        if recovery_epochs < 0:
+            raise ValueError("recovery_epochs must be at least 0")
+
+        #: The `flops_ratio` attribute represents the budget of
+        #: the encoder FLOPs relative to the fine tuned model.
+        self.flops_ratio: float = flops_ratio
+
+        #: The `min_ffn_ratio` attribute represents the floor of
+        #: the feed forward width relative to the fine tuned model.
+        self.min_ffn_ratio: float = min_ffn_ratio
+
+        #: The `recovery_epochs` attribute represents the number
+        #: of epochs the pruned model is fine tuned for.
+        self.recovery_epochs: int = recovery_epochs
+
+        #: The `batch_size` attribute represents the batch size
+        #: used for scoring and latency measurements.
+        self.batch_size: int = batch_size
+
+        #: The `summary` attribute represents the result of the
+        #: last call to `prune`.
+        self.summary: Dict[str, Any] = dict()
+
+    @staticmethod
+    def encoder_flops(
+            num_layers: int,
+            hidden_size: int,
+            intermediate_size: int,
+            sequence_length: int
+    ) -> int:
+        """This method returns the FLOPs of one sequence through
+        the encoder: the attention projections (8HH), the
+        attention scores and context (4SH) and the feed forward
+        layers (4HI) per token and layer.
+
+        :param num_layers:
+        :type num_layers: int
+        :param hidden_size:
+        :type hidden_size: int
+        :param intermediate_size:
+        :type intermediate_size: int
+        :param sequence_length:
+        :type sequence_length: int
+        :return: The encoder FLOPs per sequence.
+        :rtype: int
+        """
+        return num_layers * sequence_length * (
+            8 * hidden_size * hidden_size
+            + 4 * sequence_length * hidden_size
+            + 4 * hidden_size * intermediate_size
+        )
+
+    def plan(
+            self,
+            num_layers: int,
+            hidden_size: int,
+            intermediate_size: int,
+            sequence_length: int
+    ) -> Tuple[int, int]:
+        """This method returns the number of layers and the feed
+        forward width of the pruned model. The feed forward width
+        is reduced first, down to `min_ffn_ratio`, then layers are
+        removed until the FLOPs fit `flops_ratio` and the width
+        is widened again within the budget the removed layers
+        freed. At least one layer is kept.
+
+        :param num_layers:
+        :type num_layers: int
+        :param hidden_size:
+        :type hidden_size: int
+        :param intermediate_size:
+        :type intermediate_size: int
+        :param sequence_length:
+        :type sequence_length: int
+        :return: The pruned `num_layers` and `intermediate_size`.
+        :rtype: Tuple[int, int]
+        """
+        budget = self.flops_ratio * self.encoder_flops(
+            num_layers,
+            hidden_size,
+            intermediate_size,
+            sequence_length
+        )
+
+        def budget_intermediate_size(layers: int) -> int:
+            # the widest feed forward layers which fit the budget
+            return math.floor(
+                (
+                    budget / layers / sequence_length
+                    - 8 * hidden_size * hidden_size
+                    - 4 * sequence_length * hidden_size
+                ) / (4 * hidden_size)
+            )
+
+        pruned_intermediate_size = min(
+            intermediate_size,
+            max(
+                math.ceil(self.min_ffn_ratio * intermediate_size),
+                budget_intermediate_size(num_layers)
+            )
+        )
+
+        pruned_num_layers = min(
+            num_layers,
+            max(
+                1,
+                math.floor(
+                    budget / self.encoder_flops(
+                        1,
+                        hidden_size,
+                        pruned_intermediate_size,
+                        sequence_length
+                    )
+                )
+            )
+        )
+
+        pruned_intermediate_size = min(
+            intermediate_size,
+            max(
+                pruned_intermediate_size,
+                budget_intermediate_size(pruned_num_layers)
+            )
+        )
+
+        return pruned_num_layers, pruned_intermediate_size
+
+    @staticmethod
+    def _bert_layer(model: keras.Model) -> BertModelLayer:
+        """This method returns the BERT layer of `model`.
+
+        :param model:
+        :type model: keras.Model
+        :return:
+        :rtype: BertModelLayer
+        """
+        for layer in model.layers:
+            if isinstance(layer, BertModelLayer):
+                return layer
+
+        raise ValueError("model has no BERT layer")
+
+    @staticmethod
+    def _weight_path(weight: tf.Variable) -> str:
+        """This method returns the name of `weight` without the
+        BERT layer name and the variable suffix, e.g.
+        `encoder/layer_0/intermediate/kernel`.
+
+        :param weight:
+        :type weight: tf.Variable
+        :return:
+        :rtype: str
+        """
+        return weight.name.split("/", 1)[-1].split(":")[0]
+
+    def score(
+            self,
+            bert_model: keras.Model,
+            data: Preprocessor,
+            validation_split: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """This method scores the encoder layers and their feed
+        forward channels with the first order Taylor estimate of
+        the change of the validation loss when they are removed,
+        `|sum(weight * gradient)|` over their weights.
+
+        :param bert_model: The fine tuned (compiled) model.
+        :type bert_model: keras.Model
+        :param data:
+        :type data: Preprocessor
+        :param validation_split: The validation split of the \
+        trainer, the last examples of `data.train_x` are scored.
+        :type validation_split: float
+        :return: The layer scores, of shape (num_layers,), and \
+        the channel scores, of shape (num_layers, \
+        intermediate_size).
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        bert = self._bert_layer(bert_model)
+
+        # keras reserves the last examples for validation
+        validation_size = max(
+            int(len(data.train_x) * validation_split),
+            min(self.batch_size, len(data.train_x))
+        )
+        x = data.train_x[-validation_size:]
+        y = data.train_y[-validation_size:]
+
+        weights = bert.trainable_weights
+        taylor = [tf.zeros_like(weight) for weight in weights]
+        for start in range(0, len(x), self.batch_size):
+            with tf.GradientTape() as tape:
+                loss = bert_model.loss(
+                    y[start:start + self.batch_size],
+                    bert_model(
+                        x[start:start + self.batch_size],
+                        training=False
+                    )
+                )
+            gradients = tape.gradient(loss, weights)
+            taylor = [
+                total if gradient is None
+                else total + tf.cast(weight * gradient, total.dtype)
+                for total, weight, gradient
+                in zip(taylor, weights, gradients)
+            ]
+
+        layer_scores = np.zeros(bert.params.num_layers)
+        channel_scores = np.zeros(
+            (bert.params.num_layers, bert.params.intermediate_size)
+        )
+        for weight, total in zip(weights, taylor):
+            match = re.search(
+                r"layer_(\d+)/(.+)$",
+                self._weight_path(weight)
+            )
+            if match is None:
+                continue
+            index = int(match.group(1))
+            total = total.numpy()
+            layer_scores[index] += total.sum()
+            axis = self.FFN_WEIGHTS.get(match.group(2))
+            if axis is not None:
+                channel_scores[index] += total.sum(
+                    axis=tuple(
+                        other for other in range(total.ndim)
+                        if other != axis
+                    )
+                )
+
+        return np.abs(layer_scores), np.abs(channel_scores)
+
+    def _latency(
+            self,
+            model: keras.Model,
+            x: np.ndarray,
+            steps: int = 10
+    ) -> float:
+        """This method returns the mean milliseconds of a batch
+        prediction of `model`.
+
+        :param model:
+        :type model: keras.Model
+        :param x:
+        :type x: np.ndarray
+        :param steps:
+        :type steps: int
+        :return:
+        :rtype: float
+        """
+        batch = x[:self.batch_size]
+        # warm up (tracing and kernel selection)
+        model.predict_on_batch(batch)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            model.predict_on_batch(batch)
+
+        return (time.perf_counter() - start) / steps * 1000
+
+    def prune(
+            self,
+            bert_model: keras.Model,
+            name: str,
+            external_datasets: ExternalDatasets,
+            data: Preprocessor,
+            architecture: Architecture,
+            file_system: FileSystem,
+            validation_split: float
+    ) -> keras.Model:
+        """This method returns a pruned copy of `bert_model`. The
+        copy is built by `Trainer.model_factory` with a smaller
+        `Architecture.num_layers` and
+        `Architecture.intermediate_size`; it is not compiled and
+        should be fine tuned for `recovery_epochs` epochs.
+
+        :param bert_model: The fine tuned (compiled) model.
+        :type bert_model: keras.Model
+        :param name: The name of the model.
+        :type name: str
+        :param external_datasets:
+        :type external_datasets: ExternalDatasets
+        :param data:
+        :type data: Preprocessor
+        :param architecture: The architecture of `bert_model`.
+        :type architecture: Architecture
+        :param file_system:
+        :type file_system: FileSystem
+        :param validation_split:
+        :type validation_split: float
+        :return: The pruned model.
+        :rtype: keras.Model
+        """
+        if architecture.adapter_size is not None:
+            raise ValueError("adapter models cannot be pruned")
+
+        bert = self._bert_layer(bert_model)
+        num_layers = bert.params.num_layers
+        hidden_size = bert.params.hidden_size
+        intermediate_size = bert.params.intermediate_size
+
+        layer_scores, channel_scores = self.score(
+            bert_model,
+            data,
+            validation_split
+        )
+        pruned_num_layers, pruned_intermediate_size = self.plan(
+            num_layers,
+            hidden_size,
+            intermediate_size,
+            data.max_sequence_length
+        )
+
+        kept_layers: List[int] = sorted(
+            np.argsort(-layer_scores)[:pruned_num_layers].tolist()
+        )
+        kept_channels = {
+            index: np.sort(
+                np.argsort(-channel_scores[index])
+                [:pruned_intermediate_size]
+            )
+            for index in kept_layers
+        }
+
+        pruned_architecture = copy.copy(architecture)
+        pruned_architecture.num_layers = pruned_num_layers
+        pruned_architecture.intermediate_size = \
+            pruned_intermediate_size
+        pruned_model = Trainer.model_factory(
+            name,
+            external_datasets,
+            data,
+            pruned_architecture,
+            file_system
+        )
+
+        # the kept layers are renumbered, the weights of layer `i`
+        # of the pruned model come from layer `kept_layers[i]`
+        base_weights = {
+            self._weight_path(weight): weight
+            for weight in bert.weights
+        }
+        weights = list()
+        values = list()
+        for weight in self._bert_layer(pruned_model).weights:
+            path = self._weight_path(weight)
+            match = re.search(r"layer_(\d+)/(.+)$", path)
+            if match is None:
+                weights.append(weight)
+                values.append(
+                    keras.backend.get_value(base_weights[path])
+                )
+                continue
+
+            index = kept_layers[int(match.group(1))]
+            value = keras.backend.get_value(
+                base_weights[
+                    re.sub(r"layer_\d+/", f"layer_{index}/", path, 1)
+                ]
+            )
+            axis = self.FFN_WEIGHTS.get(match.group(2))
+            if axis is not None:
+                value = np.take(value, kept_channels[index], axis=axis)
+            weights.append(weight)
+            values.append(value)
+        keras.backend.batch_set_value(list(zip(weights, values)))
+
+        # the classifier head is copied as is
+        for base_layer, layer in zip(
+                bert_model.layers,
+                pruned_model.layers
+        ):
+            if not isinstance(layer, BertModelLayer):
+                layer.set_weights(base_layer.get_weights())
+
+        flops = self.encoder_flops(
+            num_layers,
+            hidden_size,
+            intermediate_size,
+            data.max_sequence_length
+        )
+        pruned_flops = self.encoder_flops(
+            pruned_num_layers,
+            hidden_size,
+            pruned_intermediate_size,
+            data.max_sequence_length
+        )
+        latency_ms = self._latency(bert_model, data.test_x)
+        pruned_latency_ms = self._latency(pruned_model, data.test_x)
+
+        self.summary = {
+            "num_layers": num_layers,
+            "intermediate_size": intermediate_size,
+            "flops": flops,
+            "latency_ms": latency_ms,
+            "pruned_num_layers": pruned_num_layers,
+            "pruned_intermediate_size": pruned_intermediate_size,
+            "pruned_flops": pruned_flops,
+            "pruned_latency_ms": pruned_latency_ms,
+            "kept_layers": kept_layers,
+            "flops_ratio": pruned_flops / flops,
+            "latency_speedup": latency_ms / pruned_latency_ms,
+            "recovery_epochs": self.recovery_epochs
+        }
+
+        return pruned_model
+
+    def create_prune_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the summary of the last pruning to
+        `pruneSummary.json` in the `file_system.build_summary_dir`
+        directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        prune_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "pruneSummary.json"
+        )
+
+        with open(prune_json_path, "w+") as file:
+            file.write(json.dumps(self.summary))
+
+        return None
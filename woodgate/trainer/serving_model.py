@@ -0,0 +1,223 @@
+"""
+serving_model.py - The serving_model.py module contains the
+ServingModel class definition.
+"""
+from typing import Dict, List
+import tensorflow as tf
+from tensorflow import keras
+from woodgate.trainer.preprocessor import Preprocessor
+
+
+class ServingModel(tf.Module):
+    """
+    ServingModel - The ServingModel class wraps a trained model
+    with the BERT tokenization of the `Preprocessor` implemented
+    in TensorFlow ops, so the exported serving signature accepts
+    raw utterances. Text is cleaned, lower cased and split on
+    whitespace and punctuation, words are split into WordPiece
+    tokens with a vocabulary lookup table and the token ids are
+    truncated and padded like `Preprocessor._pad`.
+    """
+
+    #: The `MAX_CHARS_PER_WORD` attribute is a constant which
+    #: represents the length above which a word is mapped to
+    #: `[UNK]`, as in the BERT tokenizer.
+    MAX_CHARS_PER_WORD: int = 100
+
+    #: The `PUNCTUATION_PATTERN` attribute is a constant which
+    #: represents the characters the BERT tokenizer splits on:
+    #: ASCII symbols and the unicode punctuation categories.
+    PUNCTUATION_PATTERN: str = r"([!-/:-@\[-`{-~]|\p{P})"
+
+    def __init__(
+            self,
+            bert_model: keras.Model,
+            vocab_file: str,
+            intents: List[str],
+            do_lower_case: bool = True
+    ):
+        """
+
+        :param bert_model: The trained model.
+        :type bert_model: keras.Model
+        :param vocab_file: Path to the BERT vocabulary.
+        :type vocab_file: str
+        :param intents: The intents, in the order of the logits.
+        :type intents: List[str]
+        :param do_lower_case:
+        :type do_lower_case: bool
+        """
+        super().__init__(name="serving_model")
+
+        self.bert_model: keras.Model = bert_model
+        self.max_sequence_length: int = bert_model.input_shape[1]
+        self.do_lower_case: bool = do_lower_case
+        self.intents: tf.Tensor = tf.constant(intents)
+
+        # the vocabulary is exported as an asset of the saved
+        # model, it is read into the lookup table when the saved
+        # model is loaded
+        self.vocab_file = tf.saved_model.Asset(vocab_file)
+        self.vocab_table = tf.lookup.StaticHashTable(
+            tf.lookup.TextFileInitializer(
+                self.vocab_file,
+                key_dtype=tf.string,
+                key_index=tf.lookup.TextFileIndex.WHOLE_LINE,
+                value_dtype=tf.int64,
+                value_index=tf.lookup.TextFileIndex.LINE_NUMBER
+            ),
+            default_value=-1
+        )
+
+        tokenizer = Preprocessor.tokenizer_factory(vocab_file)
+        self.cls_id, self.sep_id, self.unk_id = \
+            tokenizer.convert_tokens_to_ids(["[CLS]", "[SEP]", "[UNK]"])
+
+    def _normalize(self, text: tf.Tensor) -> tf.Tensor:
+        """This method cleans `text` like the BERT basic
+        tokenizer: whitespace is unified, control characters are
+        dropped, CJK characters and punctuation are surrounded by
+        spaces and the text is lower cased. Accents are only
+        stripped from text which is already decomposed (NFD).
+
+        :param text: A batch of utterances.
+        :type text: tf.Tensor
+        :return: The normalized utterances.
+        :rtype: tf.Tensor
+        """
+        text = tf.strings.regex_replace(text, r"\s", " ")
+        text = tf.strings.regex_replace(text, r"[\p{Cc}\p{Cf}]", "")
+        if self.do_lower_case:
+            text = tf.strings.lower(text, encoding="utf-8")
+            text = tf.strings.regex_replace(text, r"\p{Mn}", "")
+        text = tf.strings.regex_replace(text, r"(\p{Han})", r" \1 ")
+        text = tf.strings.regex_replace(
+            text,
+            self.PUNCTUATION_PATTERN,
+            r" \1 "
+        )
+
+        return text
+
+    def _wordpiece(self, word: tf.Tensor) -> tf.Tensor:
+        """This method splits `word` into the ids of its
+        WordPiece tokens, longest match first. Words which cannot
+        be split are mapped to `[UNK]`.
+
+        :param word: A single word.
+        :type word: tf.Tensor
+        :return: The token ids of `word`.
+        :rtype: tf.Tensor
+        """
+        word_id = self.vocab_table.lookup(word)
+
+        def split_word():
+            chars = tf.strings.unicode_split(word, "UTF-8")
+            length = tf.size(chars)
+            ids = tf.TensorArray(tf.int64, size=0, dynamic_size=True)
+            start = tf.constant(0)
+            unknown = length > self.MAX_CHARS_PER_WORD
+
+            while start < length and not unknown:
+                end = length
+                piece_id = tf.constant(-1, dtype=tf.int64)
+                while end > start and piece_id < 0:
+                    piece = tf.strings.reduce_join(chars[start:end])
+                    piece = tf.where(
+                        start > 0,
+                        tf.strings.join(["##", piece]),
+                        piece
+                    )
+                    piece_id = self.vocab_table.lookup(piece)
+                    if piece_id < 0:
+                        end -= 1
+                unknown = piece_id < 0
+                if not unknown:
+                    ids = ids.write(ids.size(), piece_id)
+                    start = end
+
+            return tf.cond(
+                unknown,
+                lambda: tf.constant([self.unk_id], dtype=tf.int64),
+                ids.stack
+            )
+
+        # most words are in the vocabulary as a whole
+        return tf.cond(
+            word_id >= 0,
+            lambda: tf.reshape(word_id, [1]),
+            split_word
+        )
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+    def tokenize(self, text: tf.Tensor) -> tf.Tensor:
+        """This method returns the padded token ids of a batch of
+        utterances, equal to the `Preprocessor` output for the
+        same utterances.
+
+        :param text: A batch of utterances.
+        :type text: tf.Tensor
+        :return: An int32 tensor of shape (batch, \
+        max_sequence_length).
+        :rtype: tf.Tensor
+        """
+        words = tf.strings.split(self._normalize(text))
+        word_ids = tf.map_fn(
+            self._wordpiece,
+            words.flat_values,
+            fn_output_signature=tf.RaggedTensorSpec(
+                shape=[None],
+                dtype=tf.int64
+            )
+        )
+        token_ids = tf.RaggedTensor.from_row_splits(
+            word_ids,
+            words.row_splits
+        ).merge_dims(1, 2)
+
+        batch_size = token_ids.nrows()
+        token_ids = tf.concat(
+            [
+                tf.fill([batch_size, 1], tf.constant(self.cls_id, tf.int64)),
+                token_ids,
+                tf.fill([batch_size, 1], tf.constant(self.sep_id, tf.int64))
+            ],
+            axis=1
+        )
+
+        # same truncation as `Preprocessor._pad`
+        token_ids = token_ids[:, :self.max_sequence_length - 2]
+
+        return tf.cast(
+            token_ids.to_tensor(
+                default_value=0,
+                shape=[None, self.max_sequence_length]
+            ),
+            tf.int32
+        )
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+    def serve(self, text: tf.Tensor) -> Dict[str, tf.Tensor]:
+        """This method is the serving signature: it returns the
+        intent probabilities, the most likely intent and its
+        probability for a batch of raw utterances.
+
+        :param text: A batch of utterances.
+        :type text: tf.Tensor
+        :return: A dictionary with keys `probabilities`, \
+        `intent` and `confidence`.
+        :rtype: Dict[str, tf.Tensor]
+        """
+        probabilities = self.bert_model(
+            self.tokenize(text),
+            training=False
+        )
+
+        return {
+            "probabilities": probabilities,
+            "intent": tf.gather(
+                self.intents,
+                tf.argmax(probabilities, axis=-1)
+            ),
+            "confidence": tf.reduce_max(probabilities, axis=-1)
+        }
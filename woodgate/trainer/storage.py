@@ -3,8 +3,21 @@ storage.py - The storage.py module
 contains the StorageStrategy class which encapsulates logic
 related to persisting the evaluator after fine tuning.
 """
+import os
+import json
+import time
+import multiprocessing
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import tensorflow as tf
 from tensorflow import keras
+from bert import BertModelLayer
 from woodgate.woodgate_settings import FileSystem
+from woodgate.trainer.serving_model import ServingModel
+from woodgate.compiler.optimizers import AdamW, LAMB, Adafactor
+from woodgate.compiler.schedules import WarmupDecay
+from woodgate.trainer.factorizer import LowRankDense
+from woodgate.trainer.artifact_store import ArtifactStore
 
 
 class Storage:
@@ -13,10 +26,23 @@ class Storage:
     logig related to persisting the evaluator after fine tuning.
     """
 
-    @staticmethod
+    #: The `FAST_MODEL_ALIGNMENT` attribute is a constant which
+    #: represents the byte alignment of each weight in the
+    #: weights file of the fast model.
+    FAST_MODEL_ALIGNMENT: int = 64
+
+    #: The `WARMUP_BATCH_SIZES` attribute is a constant which
+    #: represents the default batch sizes of the TensorFlow
+    #: Serving warmup requests.
+    WARMUP_BATCH_SIZES: List[int] = [1, 8, 32]
+
+    @classmethod
     def save_model(
+            cls,
             bert_model: keras.Model,
-            file_system: FileSystem
+            file_system: FileSystem,
+            warmup_data: np.ndarray = None,
+            warmup_batch_sizes: List[int] = None
     ) -> None:
         """
 
@@ -24,6 +50,14 @@ class Storage:
         :type bert_model:
         :param file_system:
         :type file_system:
+        :param warmup_data: If set, padded token ids of \
+        representative requests (e.g. the regression data) the \
+        TensorFlow Serving warmup requests are sampled from, see \
+        `save_warmup_requests`.
+        :type warmup_data: np.ndarray
+        :param warmup_batch_sizes: The batch sizes of the warmup \
+        requests. If `None`, `WARMUP_BATCH_SIZES` are used.
+        :type warmup_batch_sizes: List[int]
         :return:
         :rtype:
         """
@@ -32,20 +66,595 @@ class Storage:
             file_system.build_dir
         )
 
+        if warmup_data is not None:
+            cls.save_warmup_requests(
+                bert_model=bert_model,
+                file_system=file_system,
+                token_ids=warmup_data,
+                batch_sizes=warmup_batch_sizes or cls.WARMUP_BATCH_SIZES
+            )
+
+        return None
+
+    @staticmethod
+    def get_warmup_requests_path(file_system: FileSystem) -> str:
+        """The `get_warmup_requests_path` method returns the full
+        path on the host file system of the TensorFlow Serving
+        warmup requests written by `save_warmup_requests`.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Path to the warmup requests.
+        :rtype: str
+        """
+        return os.path.join(
+            file_system.build_dir,
+            "assets.extra",
+            "tf_serving_warmup_requests"
+        )
+
+    @staticmethod
+    def _proto_field(number: int, payload: bytes) -> bytes:
+        """This method returns the protocol buffer encoding of
+        the length delimited field `number` (a string or a
+        message) holding `payload`.
+
+        :param number:
+        :type number: int
+        :param payload:
+        :type payload: bytes
+        :return:
+        :rtype: bytes
+        """
+        encoded = bytearray()
+        for value in (number << 3 | 2, len(payload)):
+            # base 128 varint, least significant group first
+            while value > 0x7f:
+                encoded.append(value & 0x7f | 0x80)
+                value >>= 7
+            encoded.append(value)
+
+        return bytes(encoded) + payload
+
+    @classmethod
+    def warmup_request(
+            cls,
+            inputs: Dict[str, np.ndarray],
+            signature_name: str = "serving_default"
+    ) -> bytes:
+        """This method returns a serialized TensorFlow Serving
+        `PredictionLog` holding the `PredictRequest` of `inputs`.
+        The messages are encoded here, since only their
+        `TensorProto` inputs are part of TensorFlow.
+
+        :param inputs: The input tensors by signature input name.
+        :type inputs: Dict[str, np.ndarray]
+        :param signature_name:
+        :type signature_name: str
+        :return:
+        :rtype: bytes
+        """
+        # ModelSpec.signature_name = 3
+        model_spec = cls._proto_field(3, signature_name.encode("utf-8"))
+        # PredictRequest.model_spec = 1, PredictRequest.inputs = 2
+        # (map entries: key = 1, value = 2)
+        predict_request = cls._proto_field(1, model_spec) + b"".join(
+            cls._proto_field(
+                2,
+                cls._proto_field(1, name.encode("utf-8"))
+                + cls._proto_field(
+                    2,
+                    tf.make_tensor_proto(value).SerializeToString()
+                )
+            )
+            for name, value in inputs.items()
+        )
+        # PredictionLog.predict_log = 6, PredictLog.request = 1
+        return cls._proto_field(6, cls._proto_field(1, predict_request))
+
+    @classmethod
+    def save_warmup_requests(
+            cls,
+            bert_model: keras.Model,
+            file_system: FileSystem,
+            token_ids: np.ndarray,
+            batch_sizes: List[int] = None,
+            requests_per_batch_size: int = 2,
+            seed: int = 0
+    ) -> int:
+        """This method writes TensorFlow Serving warmup requests
+        (`assets.extra/tf_serving_warmup_requests`) next to the
+        SavedModel. TensorFlow Serving replays them when it loads
+        the build, so graph initialization and the kernels of
+        every batch size happen before the version serves
+        traffic. The requests are sampled from `token_ids`.
+
+        :param bert_model:
+        :type bert_model: keras.Model
+        :param file_system:
+        :type file_system: FileSystem
+        :param token_ids: Padded token ids of representative \
+        requests.
+        :type token_ids: np.ndarray
+        :param batch_sizes: The batch sizes of the requests. If \
+        `None`, `WARMUP_BATCH_SIZES` are used.
+        :type batch_sizes: List[int]
+        :param requests_per_batch_size:
+        :type requests_per_batch_size: int
+        :param seed: The seed of the sampling.
+        :type seed: int
+        :return: The number of requests written.
+        :rtype: int
+        """
+        batch_sizes = batch_sizes or cls.WARMUP_BATCH_SIZES
+        if min(batch_sizes) < 1:
+            raise ValueError("batch_sizes must be at least 1")
+        if requests_per_batch_size < 1:
+            raise ValueError("requests_per_batch_size must be at least 1")
+        if len(token_ids) == 0:
+            raise ValueError("token_ids must not be empty")
+
+        random_state = np.random.RandomState(seed)
+        warmup_requests_path = cls.get_warmup_requests_path(file_system)
+        os.makedirs(os.path.dirname(warmup_requests_path), exist_ok=True)
+
+        requests = 0
+        with tf.io.TFRecordWriter(warmup_requests_path) as writer:
+            for batch_size in batch_sizes:
+                for _ in range(requests_per_batch_size):
+                    rows = random_state.choice(
+                        len(token_ids),
+                        size=batch_size,
+                        replace=batch_size > len(token_ids)
+                    )
+                    writer.write(cls.warmup_request({
+                        bert_model.input_names[0]:
+                            token_ids[rows].astype(np.int32)
+                    }))
+                    requests += 1
+
+        return requests
+
+    @staticmethod
+    def get_serving_model_path(file_system: FileSystem) -> str:
+        """The `get_serving_model_path` method returns the full
+        path on the host file system of the serving SavedModel
+        written by `save_serving_model`. The directory can be
+        mounted as a model version by TensorFlow Serving.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Path to the serving SavedModel.
+        :rtype: str
+        """
+        return os.path.join(
+            file_system.build_dir,
+            "serving_model"
+        )
+
+    @classmethod
+    def save_serving_model(
+            cls,
+            bert_model: keras.Model,
+            file_system: FileSystem,
+            intents: List[str]
+    ) -> None:
+        """This method exports `bert_model` with in-graph
+        tokenization (see `ServingModel`). The default serving
+        signature takes a batch of raw utterances (`text`) and
+        returns the intent `probabilities`, the most likely
+        `intent` and its `confidence`, so clients need neither
+        the vocabulary nor the `Preprocessor`.
+
+        :param bert_model:
+        :type bert_model: keras.Model
+        :param file_system:
+        :type file_system: FileSystem
+        :param intents: The intents, in the order of the logits.
+        :type intents: List[str]
+        :return: None
+        :rtype: NoneType
+        """
+        serving_model = ServingModel(
+            bert_model=bert_model,
+            vocab_file=file_system.get_bert_vocab_path(),
+            intents=intents
+        )
+
+        tf.saved_model.save(
+            serving_model,
+            cls.get_serving_model_path(file_system),
+            signatures={
+                "serving_default":
+                    serving_model.serve.get_concrete_function()
+            }
+        )
+
+        return None
+
+    @staticmethod
+    def get_tflite_model_path(file_system: FileSystem) -> str:
+        """The `get_tflite_model_path` method returns the full
+        path on the host file system of the quantized TFLite
+        model written by `save_tflite_model`.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Path to the TFLite model.
+        :rtype: str
+        """
+        return os.path.join(
+            file_system.build_dir,
+            "model.tflite"
+        )
+
+    @classmethod
+    def save_tflite_model(
+            cls,
+            bert_model: keras.Model,
+            file_system: FileSystem,
+            quantization: str = "dynamic",
+            representative_data: np.ndarray = None,
+            representative_examples: int = 100
+    ) -> None:
+        """This method exports `bert_model` as a post-training
+        quantized TFLite model alongside the SavedModel.
+        `"dynamic"` quantization stores the weights as int8 and
+        quantizes activations on the fly, `"int8"` also
+        quantizes activations with ranges calibrated on
+        `representative_data` (e.g. the training tokens). Ops
+        without an int8 kernel stay in float.
+
+        :param bert_model:
+        :type bert_model: keras.Model
+        :param file_system:
+        :type file_system: FileSystem
+        :param quantization: Either `"dynamic"` or `"int8"`.
+        :type quantization: str
+        :param representative_data: Padded token ids used to \
+        calibrate `"int8"` quantization.
+        :type representative_data: np.ndarray
+        :param representative_examples: The number of examples \
+        of `representative_data` used for calibration.
+        :type representative_examples: int
+        :return: None
+        :rtype: NoneType
+        """
+        converter = tf.lite.TFLiteConverter.from_keras_model(
+            bert_model
+        )
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if quantization == "int8":
+            if representative_data is None:
+                raise ValueError(
+                    "int8 quantization requires representative_data"
+                )
+
+            def representative_dataset():
+                for input_ids in representative_data[
+                        :representative_examples
+                ]:
+                    yield [input_ids[np.newaxis].astype(np.int32)]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [
+                tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                tf.lite.OpsSet.TFLITE_BUILTINS
+            ]
+        elif quantization != "dynamic":
+            raise ValueError(
+                'quantization must be either: "dynamic", or "int8"'
+            )
+
+        with open(cls.get_tflite_model_path(file_system), "wb") as file:
+            file.write(converter.convert())
+
         return None
 
     @staticmethod
-    def load_model(file_system: FileSystem) -> keras.Model:
+    def get_fast_model_path(file_system: FileSystem) -> str:
+        """The `get_fast_model_path` method returns the full path
+        on the host file system of the fast model written by
+        `save_fast_model`.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Path to the fast model directory.
+        :rtype: str
+        """
+        return os.path.join(
+            file_system.build_dir,
+            "fast_model"
+        )
+
+    @staticmethod
+    def fast_model_weights(
+            model: keras.Model
+    ) -> List[Tuple[str, tf.Variable]]:
+        """This method returns the weights of `model` keyed by
+        the layer name and the weight name within the layer. The
+        weight order of a model is not stable (e.g. adapter
+        builds list the trainable weights first), and the weight
+        names may carry a uniquified prefix, so the fast model
+        matches weights by these keys, like `WarmStarter`.
+
+        :param model:
+        :type model: keras.Model
+        :return: The keyed weights.
+        :rtype: List[Tuple[str, tf.Variable]]
+        """
+        return [
+            (f"{layer.name}/{weight.name.split('/', 1)[-1]}", weight)
+            for layer in model.layers
+            for weight in layer.weights
+        ]
+
+    @classmethod
+    def save_fast_model(
+            cls,
+            bert_model: keras.Model,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes `bert_model` as a fast model: the
+        model configuration and weight index (`model.json`) and
+        all weights in a single contiguous file (`weights.bin`),
+        so `load_fast_model` rebuilds the inference graph from
+        the configuration and memory maps the weights instead of
+        restoring the SavedModel object graph.
+
+        :param bert_model:
+        :type bert_model: keras.Model
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        # the low rank layers are swapped in after the model is
+        # built, they are not part of the model configuration
+        if any(
+                isinstance(layer, LowRankDense)
+                for layer in bert_model.submodules
+        ):
+            raise ValueError("factorized models have no fast model")
+
+        fast_model_path = cls.get_fast_model_path(file_system)
+        os.makedirs(fast_model_path, exist_ok=True)
+
+        names, variables = zip(*cls.fast_model_weights(bert_model))
+
+        weights = list()
+        offset = 0
+        with open(
+                os.path.join(fast_model_path, "weights.bin"),
+                "wb"
+        ) as file:
+            for name, value in zip(
+                    names,
+                    keras.backend.batch_get_value(variables)
+            ):
+                value = np.ascontiguousarray(value)
+                padding = -offset % cls.FAST_MODEL_ALIGNMENT
+                file.write(bytes(padding))
+                offset += padding
+                weights.append({
+                    "name": name,
+                    "shape": list(value.shape),
+                    "dtype": value.dtype.name,
+                    "offset": offset
+                })
+                file.write(value.tobytes())
+                offset += value.nbytes
+
+        with open(
+                os.path.join(fast_model_path, "model.json"),
+                "w+"
+        ) as file:
+            file.write(json.dumps({
+                "model": json.loads(bert_model.to_json()),
+                "weights": weights
+            }))
+
+        return None
+
+    @classmethod
+    def load_fast_model(cls, file_system: FileSystem) -> keras.Model:
+        """This method loads the fast model written by
+        `save_fast_model`. The returned model is not compiled, it
+        is meant for inference only.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: A `keras.Model` object loaded from file system.
+        :rtype: keras.Model
+        """
+        fast_model_path = cls.get_fast_model_path(file_system)
+        with open(os.path.join(fast_model_path, "model.json")) as file:
+            fast_model = json.load(file)
+
+        model = keras.models.model_from_json(
+            json.dumps(fast_model["model"]),
+            custom_objects={"BertModelLayer": BertModelLayer}
+        )
+
+        # the weights are views of the memory mapped file, pages
+        # are only read when the weights are assigned
+        weights_file = np.memmap(
+            os.path.join(fast_model_path, "weights.bin"),
+            dtype=np.uint8,
+            mode="r"
+        )
+        values = {
+            weight["name"]: np.ndarray(
+                shape=weight["shape"],
+                dtype=weight["dtype"],
+                buffer=weights_file,
+                offset=weight["offset"]
+            )
+            for weight in fast_model["weights"]
+        }
+        weights = cls.fast_model_weights(model)
+        if len(values) != len(weights) or any(
+                name not in values
+                or tuple(weight.shape) != values[name].shape
+                for name, weight in weights
+        ):
+            raise ValueError("fast model weights do not match")
+        keras.backend.batch_set_value(
+            [(weight, values[name]) for name, weight in weights]
+        )
+
+        return model
+
+    @staticmethod
+    def load_model(
+            file_system: FileSystem,
+            fast: bool = False
+    ) -> keras.Model:
         """The `load_model` method is a convenience method
         which wraps the `keras.models.load_model(...)` method,
         called with the `WoodgateSettings.model_build_dir`
         attribute as it's argument.
 
+        :param file_system:
+        :type file_system: FileSystem
+        :param fast: Whether or not to load the fast model (see \
+        `save_fast_model`) instead of the SavedModel.
+        :type fast: bool
         :return: A `keras.Model` object loaded from file system.
         :rtype: keras.Model
         """
+        # builds whose artifacts were moved to an artifact store
+        # are checked out first
+        ArtifactStore.restore(file_system.build_dir)
+
+        if fast:
+            return Storage.load_fast_model(file_system)
+
+        # builds compiled with the optimizers and schedules which
+        # are not shipped with Keras need them to restore their
+        # training configuration, factorized builds need the low
+        # rank layers
         loaded_model = keras.models.load_model(
-            file_system.build_dir
+            file_system.build_dir,
+            custom_objects={
+                "AdamW": AdamW,
+                "LAMB": LAMB,
+                "Adafactor": Adafactor,
+                "WarmupDecay": WarmupDecay,
+                "LowRankDense": LowRankDense,
+                **LowRankDense.CUSTOM_OBJECTS
+            }
         )
 
         return loaded_model
+
+    @staticmethod
+    def _cold_start(
+            file_system: FileSystem,
+            fast: bool,
+            results: multiprocessing.Queue
+    ) -> None:
+        """This method loads the model of `file_system` and runs
+        a first prediction, it is the target of the processes
+        started by `benchmark_cold_start`.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :param fast:
+        :type fast: bool
+        :param results: The queue the timings are put on.
+        :type results: multiprocessing.Queue
+        :return: None
+        :rtype: NoneType
+        """
+        start = time.perf_counter()
+        model = Storage.load_model(file_system, fast=fast)
+        loaded = time.perf_counter()
+        model.predict_on_batch(
+            np.zeros((1, model.input_shape[1]), dtype=np.int32)
+        )
+        results.put({
+            "load_s": loaded - start,
+            "first_prediction_s": time.perf_counter() - loaded
+        })
+
+        return None
+
+    @staticmethod
+    def benchmark_cold_start(
+            file_system: FileSystem,
+            repeats: int = 3,
+            timeout: float = 600
+    ) -> Dict[str, Any]:
+        """This method compares the cold start of the SavedModel
+        loader (`"keras"`) with the fast model loader (`"fast"`).
+        Each run starts a new process, so TensorFlow is imported
+        and the model loaded from scratch; the files may still be
+        in the page cache of the host. The median of `repeats`
+        runs is reported.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :param repeats:
+        :type repeats: int
+        :param timeout: The seconds a single run may take.
+        :type timeout: float
+        :return: The load, first prediction and process seconds \
+        of each loader and the speedups of the fast loader.
+        :rtype: Dict[str, Any]
+        """
+        context = multiprocessing.get_context("spawn")
+
+        summary = dict()
+        for loader, fast in (("keras", False), ("fast", True)):
+            runs = list()
+            for _ in range(repeats):
+                results = context.Queue()
+                start = time.perf_counter()
+                process = context.Process(
+                    target=Storage._cold_start,
+                    args=(file_system, fast, results)
+                )
+                process.start()
+                run = results.get(timeout=timeout)
+                process.join()
+                run["process_s"] = time.perf_counter() - start
+                runs.append(run)
+            summary[loader] = {
+                key: float(np.median([run[key] for run in runs]))
+                for key in runs[0]
+            }
+
+        summary["load_speedup"] = \
+            summary["keras"]["load_s"] / summary["fast"]["load_s"]
+        summary["cold_start_speedup"] = \
+            summary["keras"]["process_s"] / summary["fast"]["process_s"]
+
+        return summary
+
+    @staticmethod
+    def create_cold_start_json(
+            benchmark: Dict[str, Any],
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the result of `benchmark_cold_start`
+        to `coldStartBenchmark.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param benchmark:
+        :type benchmark: Dict[str, Any]
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        cold_start_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "coldStartBenchmark.json"
+        )
+
+        with open(cold_start_json_path, "w+") as file:
+            file.write(json.dumps(benchmark))
+
+        return None
@@ -4,22 +4,29 @@ Fitter class definition.
 """
 import os
 import json
+from typing import Any, Dict
 from bert.loader import (
     StockBertConfig,
     map_stock_config_to_params,
     load_stock_weights
 )
+import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 from bert import BertModelLayer
 from woodgate.transfer.bert_model_parameters import \
     BertModelParameters
+from woodgate.transfer.bert_weights_cache import BertWeightsCache
 from woodgate.woodgate_settings import (
     Architecture,
     FileSystem
 )
 from woodgate.tuning.external_datasets import ExternalDatasets
 from woodgate.trainer.preprocessor import Preprocessor
+from woodgate.trainer.callbacks import TimeBudget, ThroughputMonitor
+from woodgate.trainer.autotuner import Autotuner
+from woodgate.compiler.compiler import Compiler
+from woodgate.compiler.schedules import WarmupDecay
 
 
 class Trainer:
@@ -32,7 +39,13 @@ class Trainer:
             validation_split: float,
             batch_size: int,
             epochs: int,
-            file_system: FileSystem = None
+            file_system: FileSystem = None,
+            early_stopping_monitor: str = "val_loss",
+            early_stopping_patience: int = None,
+            time_budget: float = None,
+            autotuner: Autotuner = None,
+            learning_rate_schedule: str = "constant",
+            warmup_proportion: float = 0.1
     ):
         """
 
@@ -42,6 +55,20 @@ class Trainer:
         :type batch_size:
         :param epochs:
         :type epochs:
+        :param file_system:
+        :type file_system:
+        :param early_stopping_monitor:
+        :type early_stopping_monitor:
+        :param early_stopping_patience:
+        :type early_stopping_patience:
+        :param time_budget:
+        :type time_budget:
+        :param autotuner:
+        :type autotuner:
+        :param learning_rate_schedule:
+        :type learning_rate_schedule:
+        :param warmup_proportion:
+        :type warmup_proportion:
         """
         #: The `validation_split` attribute represents a decimal
         #: number between 0 and 1. This attribute is set via the
@@ -78,6 +105,67 @@ class Trainer:
 
         self.file_system = file_system
 
+        #: The `early_stopping_monitor` attribute represents the
+        #: name of the metric (as it appears in the build
+        #: history, e.g. `val_loss`) watched for early stopping.
+        #: The weights of the epoch with the best value of this
+        #: metric are restored when training stops early.
+        self.early_stopping_monitor: str = early_stopping_monitor
+
+        #: The `early_stopping_patience` attribute represents the
+        #: number of epochs without improvement of the
+        #: `early_stopping_monitor` metric after which training
+        #: is stopped. If the `early_stopping_patience` attribute
+        #: is `None`, early stopping is disabled.
+        if early_stopping_patience is not None \
+                and early_stopping_patience < 0:
+            raise ValueError(
+                "early_stopping_patience must be at least 0"
+            )
+        self.early_stopping_patience: int = early_stopping_patience
+
+        #: The `time_budget` attribute represents the wall clock
+        #: budget (in seconds) for training. If the `time_budget`
+        #: attribute is `None`, training is not time limited.
+        if time_budget is not None and time_budget <= 0:
+            raise ValueError("time_budget must be positive")
+        self.time_budget: float = time_budget
+
+        #: The `autotuner` attribute represents the calibration
+        #: run at the start of `fit` to select the batch size. If
+        #: the `autotuner` attribute is `None`, the `batch_size`
+        #: attribute is used as is.
+        self.autotuner: Autotuner = autotuner
+
+        #: The `learning_rate_schedule` attribute represents the
+        #: name of the learning rate schedule (see
+        #: `Compiler.learning_rate_schedule_factory`) applied to
+        #: the optimizer of the model at the start of `fit`. The
+        #: schedule peaks at the learning rate the optimizer was
+        #: created with and spans all training steps, which are
+        #: only known once the batch size is final.
+        self.learning_rate_schedule: str = learning_rate_schedule
+
+        #: The `warmup_proportion` attribute represents the
+        #: proportion of the training steps over which the
+        #: learning rate warms up.
+        if warmup_proportion < 0 or warmup_proportion > 1:
+            raise ValueError(
+                "warmup_proportion must be a value [0, 1]"
+            )
+        self.warmup_proportion: float = warmup_proportion
+
+        #: The `training_summary` attribute represents a
+        #: dictionary describing the last call to `fit`, e.g.
+        #: why training stopped. It is written alongside the
+        #: build history by `create_build_history_json`.
+        self.training_summary: Dict[str, Any] = dict()
+
+        #: The `throughput_monitor` attribute represents the
+        #: callback which recorded the per step throughput of
+        #: the last call to `fit`.
+        self.throughput_monitor: ThroughputMonitor = None
+
     @staticmethod
     def model_factory(
             name: str,
@@ -111,7 +199,12 @@ class Trainer:
                 reader.read()
             )
             bert_params = map_stock_config_to_params(bc)
-            bert_params.adapter_size = None
+            bert_params.adapter_size = architecture.adapter_size
+            if architecture.num_layers is not None:
+                bert_params.num_layers = architecture.num_layers
+            if architecture.intermediate_size is not None:
+                bert_params.intermediate_size = \
+                    architecture.intermediate_size
             bert = BertModelLayer.from_params(
                 bert_params,
                 name=name
@@ -137,9 +230,12 @@ class Trainer:
         logits = keras.layers.Dropout(
             architecture.logits_dropout_rate
         )(logits)
+        # the logits stay in float32 under a mixed precision
+        # policy so the loss is computed at full precision
         logits = keras.layers.Dense(
             units=len(external_datasets.all_intents()),
-            activation=architecture.logits_activation
+            activation=architecture.logits_activation,
+            dtype="float32"
         )(logits)
 
         model = keras.Model(
@@ -150,17 +246,35 @@ class Trainer:
             input_shape=(None, preprocessor.max_sequence_length)
         )
 
-        load_stock_weights(
-            bert,
-            file_system.get_bert_model_path()
-        )
+        # reading the stock checkpoint is slow, so the converted
+        # weights are cached per BERT variant on first use, the
+        # cache only holds the unpruned variant
+        if architecture.num_layers is not None \
+                or architecture.intermediate_size is not None:
+            load_stock_weights(
+                bert,
+                file_system.get_bert_model_path()
+            )
+        elif not BertWeightsCache.load_weights(bert, file_system):
+            load_stock_weights(
+                bert,
+                file_system.get_bert_model_path()
+            )
+            BertWeightsCache.create_cache(bert, file_system)
+
+        # adapter fine tuning trains only the adapter modules,
+        # the layer norms and the classifier head, the remaining
+        # BERT weights keep their pre-trained values
+        if architecture.adapter_size is not None:
+            bert.apply_adapter_freeze()
 
         return model
 
     def fit(
             self,
             bert_model: keras.Model,
-            data: Preprocessor
+            data: Preprocessor,
+            initial_epoch: int = 0
     ) -> keras.callbacks.History:
         """This method wraps the `fit` method of the `keras.Model`
         object argument which returns an object representing the
@@ -171,6 +285,9 @@ class Trainer:
         :type bert_model: keras.Model
         :param data: Processed textual data.
         :type data: Preprocessor
+        :param initial_epoch: The epoch at which to resume \
+        training, `epochs` is the epoch at which training ends.
+        :type initial_epoch: int
         :return: A `History` object. Its `History.history` \
         attribute is a record of training loss values and \
         metrics values at successive epochs, as well as \
@@ -179,6 +296,39 @@ class Trainer:
         :rtype: object
         """
 
+        if self.autotuner is not None:
+            self.batch_size = self.autotuner.calibrate(
+                bert_model,
+                data,
+                self.validation_split
+            )
+
+        # the last examples are reserved for validation
+        train_size = int(
+            len(data.train_x) * (1 - self.validation_split)
+        )
+
+        if self.learning_rate_schedule != "constant":
+            learning_rate = bert_model.optimizer.learning_rate
+            if isinstance(learning_rate, WarmupDecay):
+                learning_rate = learning_rate.learning_rate
+            bert_model.optimizer.learning_rate = \
+                Compiler.learning_rate_schedule_factory(
+                    name=self.learning_rate_schedule,
+                    learning_rate=float(
+                        keras.backend.get_value(learning_rate)
+                    ),
+                    total_steps=Compiler.get_total_steps(
+                        examples=train_size,
+                        batch_size=self.batch_size,
+                        epochs=self.epochs
+                    ),
+                    warmup_proportion=self.warmup_proportion
+                )
+            # the learning rate is captured when the train
+            # function is traced (e.g. by the autotuner)
+            bert_model.train_function = None
+
         callbacks = list()
         if self.file_system is not None:
             callbacks.append(
@@ -187,30 +337,103 @@ class Trainer:
                 )
             )
 
-        build_history = bert_model.fit(
-            x=data.train_x,
-            y=data.train_y,
-            validation_split=self.validation_split,
+        early_stopping = None
+        if self.early_stopping_patience is not None:
+            early_stopping = keras.callbacks.EarlyStopping(
+                monitor=self.early_stopping_monitor,
+                patience=self.early_stopping_patience,
+                restore_best_weights=True
+            )
+            callbacks.append(early_stopping)
+
+        self.throughput_monitor = ThroughputMonitor(
+            train_size=train_size,
             batch_size=self.batch_size,
+            tokens_per_example=float(
+                np.count_nonzero(data.train_x[:train_size])
+            ) / max(train_size, 1)
+        )
+        callbacks.append(self.throughput_monitor)
+
+        time_budget = None
+        if self.time_budget is not None:
+            time_budget = TimeBudget(self.time_budget)
+            callbacks.append(time_budget)
+
+        # the training batches are fetched by the throughput
+        # monitor to record the data wait time, so the validation
+        # examples are split off here
+        validation_data = None
+        if train_size < len(data.train_x):
+            validation_data = (
+                data.train_x[train_size:],
+                data.train_y[train_size:]
+            )
+
+        build_history = bert_model.fit(
+            x=self.throughput_monitor.dataset(
+                data.train_x[:train_size],
+                data.train_y[:train_size]
+            ),
+            validation_data=validation_data,
+            validation_batch_size=self.batch_size,
             epochs=self.epochs,
+            initial_epoch=initial_epoch,
             callbacks=callbacks
         )
 
+        self.training_summary = {
+            "stop_reason": "completed",
+            "epochs_run": len(build_history.epoch),
+            "batch_size": self.batch_size,
+            "throughput": self.throughput_monitor.summary()
+        }
+
+        if self.learning_rate_schedule != "constant":
+            self.training_summary["learning_rate_schedule"] = \
+                bert_model.optimizer.learning_rate.get_config()
+
+        if time_budget is not None and time_budget.stopped:
+            self.training_summary["stop_reason"] = "time_budget"
+        elif early_stopping is not None \
+                and early_stopping.stopped_epoch > 0:
+            self.training_summary["stop_reason"] = "early_stopping"
+
+        if early_stopping is not None:
+            # the early stopping callback only restores the best
+            # weights when its own patience runs out
+            if early_stopping.stopped_epoch == 0 \
+                    and early_stopping.best_weights is not None:
+                bert_model.set_weights(early_stopping.best_weights)
+
+            self.training_summary["monitor"] = \
+                self.early_stopping_monitor
+            # no epoch was monitored (e.g. a resumed build which
+            # ran no epoch), infinity is not valid JSON
+            self.training_summary["best"] = \
+                float(early_stopping.best) \
+                if np.isfinite(early_stopping.best) else None
+
         return build_history
 
     @staticmethod
     def create_build_history_json(
             build_history: keras.callbacks.History,
             file_system: FileSystem,
+            training_summary: Dict[str, Any] = None
     ) -> None:
         """The `create_loss_over_epochs_json` method creates a
         json document on the host file system in the
-        `WoodgateSettings.build_summary_dir` directory.
+        `WoodgateSettings.build_summary_dir` directory. If a
+        `training_summary` is supplied it is stored under the
+        `summary` key next to the per epoch metrics.
 
         :param build_history:
         :type build_history:
         :param file_system:
         :type file_system:
+        :param training_summary:
+        :type training_summary:
         :return:
         :rtype:
         """
@@ -220,9 +443,41 @@ class Trainer:
             "buildHistory.json"
         )
 
+        build_history_data = dict(build_history.history)
+        if training_summary:
+            build_history_data["summary"] = training_summary
+
         with open(build_history_path, "w+") as file:
             file.write(
-                json.dumps(build_history.history)
+                json.dumps(build_history_data)
             )
 
         return None
+
+    def create_throughput_csv(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """The `create_throughput_csv` method writes the per
+        step throughput time series recorded during the last
+        call to `fit` to `buildThroughput.csv` in the
+        `file_system.build_dir` directory.
+
+        :param file_system:
+        :type file_system:
+        :return: None
+        :rtype: NoneType
+        """
+        if self.throughput_monitor is None:
+            raise ValueError(
+                "fit must be called before create_throughput_csv"
+            )
+
+        self.throughput_monitor.create_csv(
+            os.path.join(
+                file_system.build_dir,
+                "buildThroughput.csv"
+            )
+        )
+
+        return None
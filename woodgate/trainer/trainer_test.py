@@ -3,16 +3,20 @@ trainer_test.py - The trainer_test.py module contains all
 unit tests related to the woodgate.evaluator.trainer module.
 """
 import os
+import json
 import glob
 import unittest
 import shutil
+import numpy as np
 import pandas as pd
+import tensorflow as tf
 from tensorflow import keras
 from woodgate.woodgate_settings import FileSystem, Model, Build
 from woodgate.transfer.bert_model_parameters import \
     BertModelParameters
 from woodgate.transfer.bert_retrieval_strategy import \
     BertRetrievalStrategy
+from woodgate.transfer.bert_weights_cache import BertWeightsCache
 from woodgate.tuning.external_datasets import ExternalDatasets
 from woodgate.trainer.preprocessor import Preprocessor
 from woodgate.compiler.compiler import Compiler
@@ -20,6 +24,14 @@ from ..woodgate_settings import Architecture
 from ..trainer.trainer import Trainer
 from .evaluator import Evaluator
 from .storage import Storage
+from .autotuner import Autotuner
+from .callbacks import ThroughputMonitor
+from .distiller import Distiller
+from .warm_starter import WarmStarter
+from .pruner import Pruner
+from params_flow.activations import gelu
+from .factorizer import Factorizer, LowRankDense
+from woodgate.serving.predictor import Predictor
 
 
 class TestTrainer(unittest.TestCase):
@@ -31,6 +43,7 @@ class TestTrainer(unittest.TestCase):
         :rtype:
         """
         model = Model("test")
+        self.model = model
         build = Build()
         file_system = FileSystem(model, build)
         file_system.configure()
@@ -266,6 +279,202 @@ class TestTrainer(unittest.TestCase):
             )
         )
 
+    def test_fit_w_early_stopping_and_time_budget(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        trainer = Trainer(
+            validation_split=0.2,
+            batch_size=2,
+            epochs=8,
+            early_stopping_monitor="val_loss",
+            early_stopping_patience=0,
+            time_budget=3600
+        )
+
+        build_history = trainer.fit(
+            self.test_model,
+            self.data
+        )
+
+        self.assertIn(
+            trainer.training_summary["stop_reason"],
+            ["completed", "early_stopping"]
+        )
+        self.assertEqual(
+            trainer.training_summary["epochs_run"],
+            len(build_history.epoch)
+        )
+        self.assertAlmostEqual(
+            trainer.training_summary["best"],
+            min(build_history.history["val_loss"])
+        )
+
+        Trainer.create_build_history_json(
+            build_history,
+            self.file_system,
+            trainer.training_summary
+        )
+
+        with open(
+                os.path.join(
+                    self.file_system.build_dir,
+                    "buildHistory.json"
+                )
+        ) as file:
+            build_history_data = json.load(file)
+
+        self.assertEqual(
+            build_history_data["summary"]["monitor"],
+            "val_loss"
+        )
+        self.assertIn(
+            "tokens_per_second",
+            build_history_data["summary"]["throughput"]
+        )
+        self.assertGreater(
+            build_history_data["summary"]["throughput"][
+                "mean_data_wait_time"
+            ],
+            0
+        )
+
+        trainer.create_throughput_csv(self.file_system)
+
+        with open(
+                os.path.join(
+                    self.file_system.build_dir,
+                    "buildThroughput.csv"
+                )
+        ) as file:
+            rows = file.read().splitlines()
+
+        self.assertEqual(
+            rows[0].split(","),
+            ThroughputMonitor.CSV_COLUMNS
+        )
+        self.assertEqual(
+            sum(int(row.split(",")[2]) for row in rows[1:]),
+            build_history_data["summary"]["throughput"]["steps"]
+        )
+
+    def test_throughput_monitor_steps_per_execution(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        monitor = ThroughputMonitor(
+            train_size=74,
+            batch_size=2,
+            tokens_per_example=3.0
+        )
+
+        # two executions of 32 steps and 5 steps
+        monitor.on_epoch_begin(0)
+        monitor.on_train_batch_begin(0)
+        monitor.on_train_batch_end(31)
+        monitor.on_train_batch_begin(32)
+        monitor.on_train_batch_end(36)
+
+        self.assertEqual(
+            [record[1:3] + record[5:7] for record in monitor.records],
+            [[0, 32, 64, 192.0], [32, 5, 10, 30.0]]
+        )
+        self.assertEqual(monitor.summary()["steps"], 37)
+
+    def test_callbacks_time_budget(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        trainer = Trainer(
+            validation_split=0.2,
+            batch_size=1,
+            epochs=1024,
+            time_budget=1e-6
+        )
+
+        build_history = trainer.fit(
+            self.test_model,
+            self.data
+        )
+
+        self.assertEqual(
+            trainer.training_summary["stop_reason"],
+            "time_budget"
+        )
+        self.assertEqual(len(build_history.epoch), 1)
+
+    def test_fit_w_autotuner(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        autotuner = Autotuner(
+            batch_sizes=[2, 4, 64],
+            steps=1
+        )
+        trainer = Trainer(
+            validation_split=0.1,
+            batch_size=16,
+            epochs=1,
+            autotuner=autotuner
+        )
+
+        _ = trainer.fit(
+            self.test_model,
+            self.data
+        )
+
+        self.assertIn(trainer.batch_size, [2, 4])
+        self.assertEqual(
+            autotuner.summary["batch_size"],
+            trainer.batch_size
+        )
+        self.assertFalse(autotuner.summary["memory_limit_exceeded"])
+
+        autotuner.create_autotune_json(self.file_system)
+
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(
+                    self.file_system.build_summary_dir,
+                    "autotuneSummary.json"
+                )
+            )
+        )
+
+    def test_fit_w_autotuner_over_memory_limit(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        autotuner = Autotuner(
+            batch_sizes=[2, 4],
+            steps=1,
+            memory_limit=1
+        )
+        trainer = Trainer(
+            validation_split=0.1,
+            batch_size=16,
+            epochs=1,
+            autotuner=autotuner
+        )
+
+        _ = trainer.fit(
+            self.test_model,
+            self.data
+        )
+
+        self.assertEqual(trainer.batch_size, 2)
+        self.assertTrue(autotuner.summary["memory_limit_exceeded"])
+
     def test_evaluator_creates_regression_json(self) -> None:
         """
 
@@ -305,6 +514,357 @@ class TestTrainer(unittest.TestCase):
             )
         )
 
+    def test_model_factory_w_adapter(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax",
+            adapter_size=8
+        )
+
+        adapter_model = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=architecture,
+            file_system=self.file_system
+        )
+
+        self.assertLess(
+            len(adapter_model.trainable_weights),
+            len(self.test_model.trainable_weights)
+        )
+
+        trainable_names = [
+            weight.name for weight in adapter_model.trainable_weights
+        ]
+        self.assertTrue(
+            any("adapter" in name for name in trainable_names)
+        )
+
+    def test_model_factory_w_weights_cache(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        bert = self.test_model.layers[1]
+
+        self.assertTrue(
+            BertWeightsCache.is_cached(bert, self.file_system)
+        )
+
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax"
+        )
+
+        cached_model = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=architecture,
+            file_system=self.file_system
+        )
+
+        for expected, actual in zip(
+                bert.get_weights(),
+                cached_model.layers[1].get_weights()
+        ):
+            self.assertTrue((expected == actual).all())
+
+        # adapter weights are not cached, but do not miss the cache
+        adapter_model = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=Architecture(
+                clf_out_dropout_rate=0.5,
+                clf_out_activation="tanh",
+                logits_dropout_rate=0.5,
+                logits_activation="softmax",
+                adapter_size=4
+            ),
+            file_system=self.file_system
+        )
+        self.assertTrue(
+            BertWeightsCache.load_weights(
+                adapter_model.layers[1],
+                self.file_system
+            )
+        )
+
+    def test_fit_w_distiller(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        teacher_file_system = FileSystem(
+            Model("teacher"),
+            Build(build_version="20200101000000")
+        )
+        teacher_file_system.configure()
+
+        Storage.save_model(self.test_model, teacher_file_system)
+        intents_data_json = os.path.join(
+            teacher_file_system.datasets_summary_dir,
+            "intentsData.json"
+        )
+        with open(intents_data_json, "w+") as file:
+            file.write(json.dumps({"intents": ["OtherIntent"]}))
+
+        distiller = Distiller(
+            teacher_file_system=teacher_file_system,
+            alpha=0.5,
+            temperature=2.0
+        )
+
+        with self.assertRaises(ValueError):
+            distiller.distillation_data(self.data)
+
+        with open(intents_data_json, "w+") as file:
+            file.write(json.dumps({"intents": self.intents}))
+
+        distillation_data = distiller.distillation_data(self.data)
+
+        self.assertEqual(
+            distillation_data.train_y.shape,
+            (len(self.data.train_y), 1 + len(self.intents))
+        )
+        self.assertTrue(
+            os.path.isfile(
+                distiller.get_teacher_logits_path(self.data)
+            )
+        )
+
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax"
+        )
+
+        student = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=architecture,
+            file_system=self.file_system
+        )
+
+        distiller.compile(
+            model=student,
+            optimizer=Compiler.optimizer_factory(
+                name="Adam",
+                learning_rate=1e-5
+            ),
+            architecture=architecture
+        )
+
+        build_history = Trainer(0.1, 16, 1).fit(
+            student,
+            distillation_data
+        )
+
+        self.assertIn(
+            "sparse_categorical_accuracy",
+            build_history.history
+        )
+
+    def test_warm_start(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        base_file_system = FileSystem(
+            self.model,
+            Build(build_version="20200101000000")
+        )
+        base_file_system.configure()
+
+        Storage.save_model(self.test_model, base_file_system)
+        with open(
+                os.path.join(
+                    base_file_system.datasets_summary_dir,
+                    "intentsData.json"
+                ),
+                "w+"
+        ) as file:
+            file.write(json.dumps({"intents": ["TestIntent0"]}))
+
+        self.assertEqual(
+            WarmStarter.latest_build_version(self.file_system),
+            "20200101000000"
+        )
+
+        warm_starter = WarmStarter(
+            base_file_system=base_file_system,
+            epochs=1
+        )
+
+        model = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=Architecture(
+                clf_out_dropout_rate=0.5,
+                clf_out_activation="tanh",
+                logits_dropout_rate=0.5,
+                logits_activation="softmax"
+            ),
+            file_system=self.file_system
+        )
+
+        warm_start_summary = warm_starter.warm_start(
+            model=model,
+            intents=self.intents
+        )
+
+        self.assertEqual(
+            warm_start_summary["kept_intents"],
+            ["TestIntent0"]
+        )
+        self.assertEqual(warm_start_summary["new_intents"], [])
+        for expected, actual in zip(
+                self.test_model.get_weights(),
+                model.get_weights()
+        ):
+            self.assertTrue((expected == actual).all())
+
+    def test_prune(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        pruner = Pruner(flops_ratio=0.5, batch_size=4)
+
+        # the feed forward width is reduced before any layer
+        self.assertEqual(
+            Pruner(flops_ratio=0.75).plan(2, 128, 512, 16),
+            (2, 316)
+        )
+        self.assertEqual(pruner.plan(2, 128, 512, 16), (1, 512))
+
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax"
+        )
+        Compiler.compile(
+            model=self.test_model,
+            optimizer=Compiler.optimizer_factory("adam", 1e-5),
+            loss=Compiler.loss_factory(
+                "Sparse_Categorical_Crossentropy",
+                *["true", "0.5"]
+            ),
+            metrics=Compiler.metrics_factory(
+                "sparse_categorical_accuracy"
+            )
+        )
+
+        pruned_model = pruner.prune(
+            bert_model=self.test_model,
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            data=self.data,
+            architecture=architecture,
+            file_system=self.file_system,
+            validation_split=0.1
+        )
+
+        self.assertLessEqual(pruner.summary["flops_ratio"], 0.5)
+        self.assertLess(
+            pruned_model.count_params(),
+            self.test_model.count_params()
+        )
+        self.assertEqual(
+            pruned_model.predict(self.data.test_x).shape,
+            (len(self.data.test_x), len(self.intents))
+        )
+
+        # the pruned model is a regular model
+        Storage.save_model(pruned_model, self.file_system)
+        self.assertTrue(
+            isinstance(
+                Storage.load_model(self.file_system),
+                keras.Model
+            )
+        )
+
+        pruner.create_prune_json(self.file_system)
+        self.assertTrue(
+            os.path.isfile(
+                os.path.join(
+                    self.file_system.build_summary_dir,
+                    "pruneSummary.json"
+                )
+            )
+        )
+
+        with self.assertRaises(ValueError):
+            Pruner(flops_ratio=0)
+
+    def test_factorize(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        factorizer = Factorizer(
+            energy=0.5,
+            max_rank_ratio=1.0,
+            targets=["intermediate"]
+        )
+
+        self.assertEqual(factorizer.rank(np.array([2.0, 1.0, 0.0])), 1)
+
+        factorize_summary = factorizer.factorize(
+            bert_model=self.test_model,
+            data=self.data
+        )
+
+        # one feed forward layer per encoder layer
+        self.assertEqual(len(factorize_summary["layers"]), 2)
+        self.assertFalse(factorize_summary["reverted"])
+        self.assertLess(
+            factorize_summary["factorized_parameters"],
+            factorize_summary["parameters"]
+        )
+
+        # the feed forward layers keep the `gelu` of BERT, which
+        # is not a Keras activation
+        low_rank_dense = LowRankDense(units=2, rank=1, activation=gelu)
+        self.assertIs(
+            LowRankDense.from_config(low_rank_dense.get_config())
+            .activation,
+            gelu
+        )
+
+        # the factorized model is saved and loaded like any build
+        predictions = self.test_model.predict(self.data.test_x)
+        Storage.save_model(self.test_model, self.file_system)
+        loaded_model = Storage.load_model(self.file_system)
+        np.testing.assert_allclose(
+            loaded_model.predict(self.data.test_x),
+            predictions,
+            rtol=1e-5
+        )
+
+        with self.assertRaises(ValueError):
+            Factorizer(targets=["pooler"])
+
     def test_save_and_load_model(self) -> None:
         """
 
@@ -343,6 +903,219 @@ class TestTrainer(unittest.TestCase):
             isinstance(loaded_model, keras.Model)
         )
 
+    def test_save_and_load_fast_model(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        Storage.save_model(self.test_model, self.file_system)
+        Storage.save_fast_model(self.test_model, self.file_system)
+
+        fast_model = Storage.load_model(self.file_system, fast=True)
+        np.testing.assert_allclose(
+            fast_model.predict(self.data.test_x),
+            self.test_model.predict(self.data.test_x),
+            rtol=1e-5
+        )
+
+        cold_start_summary = Storage.benchmark_cold_start(
+            self.file_system,
+            repeats=1
+        )
+        self.assertGreater(cold_start_summary["load_speedup"], 0)
+        self.assertGreater(cold_start_summary["fast"]["load_s"], 0)
+
+        # adapter builds list their trainable weights first
+        adapter_model = Trainer.model_factory(
+            name=self.model.model_name,
+            external_datasets=ExternalDatasets(),
+            preprocessor=self.data,
+            architecture=Architecture(
+                clf_out_dropout_rate=0.5,
+                clf_out_activation="tanh",
+                logits_dropout_rate=0.5,
+                logits_activation="softmax",
+                adapter_size=4
+            ),
+            file_system=self.file_system
+        )
+        Storage.save_fast_model(adapter_model, self.file_system)
+
+        fast_model = Storage.load_fast_model(self.file_system)
+        np.testing.assert_allclose(
+            fast_model.predict(self.data.test_x),
+            adapter_model.predict(self.data.test_x),
+            rtol=1e-5
+        )
+
+    def test_predictor(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        Storage.save_model(self.test_model, self.file_system)
+        with open(
+                os.path.join(
+                    self.file_system.datasets_summary_dir,
+                    "intentsData.json"
+                ),
+                "w+"
+        ) as file:
+            file.write(json.dumps({"intents": self.intents}))
+
+        predictor = Predictor(self.file_system)
+
+        self.assertEqual(predictor.intents, self.intents)
+        predictions = predictor.predict(["Hello  World", "hello world"])
+        self.assertEqual(
+            [prediction["intent"] for prediction in predictions],
+            self.intents * 2
+        )
+        self.assertAlmostEqual(
+            predictions[0]["confidence"],
+            predictions[1]["confidence"],
+            places=5
+        )
+        self.assertEqual(
+            predictor.normalize("Hello  World"),
+            predictor.normalize("hello world")
+        )
+        self.assertEqual(
+            predictor.fingerprint,
+            Predictor.fingerprint_build(self.file_system)
+        )
+
+    def test_save_warmup_requests(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        Storage.save_model(
+            self.test_model,
+            self.file_system,
+            warmup_data=self.data.test_x,
+            warmup_batch_sizes=[1, 3]
+        )
+
+        records = [
+            record.numpy()
+            for record in tf.data.TFRecordDataset(
+                Storage.get_warmup_requests_path(self.file_system)
+            )
+        ]
+        # two requests per batch size
+        self.assertEqual(len(records), 4)
+        for record in records:
+            # PredictionLog.predict_log (field 6, length delimited)
+            self.assertEqual(record[:1], b"\x32")
+            self.assertIn(b"serving_default", record)
+            self.assertIn(b"input_ids", record)
+
+        # lengths above 127 take two varint bytes
+        self.assertEqual(
+            Storage._proto_field(1, b"a" * 300)[:3],
+            b"\x0a\xac\x02"
+        )
+
+    def test_preprocessor_encode(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        # serving tokenizes like the training data
+        self.assertTrue(
+            (
+                Preprocessor.encode(
+                    self.data.tokenizer,
+                    ["test intent john and test intent"],
+                    self.data.max_sequence_length
+                )
+                == self.data.test_x[:1]
+            ).all()
+        )
+
+    def test_save_serving_model(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        Storage.save_serving_model(
+            bert_model=self.test_model,
+            file_system=self.file_system,
+            intents=self.intents
+        )
+
+        serving_model = tf.saved_model.load(
+            Storage.get_serving_model_path(self.file_system)
+        )
+        text = tf.constant(["test intent john and test intent"])
+
+        # in-graph tokenization matches the Preprocessor
+        self.assertTrue(
+            (
+                serving_model.tokenize(text).numpy()
+                == self.data.test_x[:1]
+            ).all()
+        )
+
+        outputs = serving_model.signatures["serving_default"](
+            text=text
+        )
+        np.testing.assert_allclose(
+            outputs["probabilities"].numpy(),
+            self.test_model.predict(self.data.test_x[:1]),
+            rtol=1e-5
+        )
+        self.assertEqual(
+            outputs["intent"].numpy()[0].decode("utf-8"),
+            "TestIntent0"
+        )
+
+    def test_save_tflite_model(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        Storage.save_tflite_model(
+            bert_model=self.test_model,
+            file_system=self.file_system,
+            quantization="int8",
+            representative_data=self.data.train_x
+        )
+
+        tflite_model_path = Storage.get_tflite_model_path(
+            self.file_system
+        )
+        self.assertTrue(os.path.isfile(tflite_model_path))
+
+        quantization_report = Evaluator.compare_quantized_model(
+            model=self.test_model,
+            tflite_model_path=tflite_model_path,
+            data=self.data,
+            file_system=self.file_system,
+            latency_examples=2
+        )
+
+        self.assertEqual(
+            quantization_report["accuracy_delta"],
+            quantization_report["tflite_accuracy"]
+            - quantization_report["accuracy"]
+        )
+        self.assertGreater(quantization_report["latency_speedup"], 0)
+
+        with self.assertRaises(ValueError):
+            Storage.save_tflite_model(
+                bert_model=self.test_model,
+                file_system=self.file_system,
+                quantization="int8"
+            )
+
 
 if __name__ == '__main__':
     unittest.main()
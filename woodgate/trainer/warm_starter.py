@@ -0,0 +1,218 @@
+"""
+warm_starter.py - The warm_starter.py module contains the
+WarmStarter class definition.
+"""
+import os
+import json
+from typing import Any, Dict, List
+import numpy as np
+from tensorflow import keras
+from woodgate.woodgate_settings import FileSystem
+from woodgate.tuning.external_datasets import ExternalDatasets
+from woodgate.trainer.storage import Storage
+from woodgate.trainer.artifact_store import ArtifactStore
+
+
+class WarmStarter:
+    """
+    WarmStarter - The WarmStarter class encapsulates logic related
+    to initializing a new build from a previous build of the same
+    model instead of the stock BERT checkpoint. Rows of the logits
+    layer are kept for intents the previous build already knew,
+    only rows of new intents keep their fresh initialization, so
+    small data updates need far fewer epochs than a full build.
+    """
+
+    def __init__(
+            self,
+            base_file_system: FileSystem,
+            epochs: int = None
+    ):
+        """
+
+        :param base_file_system: The file system of the previous \
+        build.
+        :type base_file_system: FileSystem
+        :param epochs: The number of epochs of the warm started \
+        build. If `None`, the epochs of the trainer are kept.
+        :type epochs: int
+        """
+        #: The `base_file_system` attribute represents the file
+        #: system of the previous build, which is loaded from its
+        #: `build_dir` via `Storage.load_model`.
+        self.base_file_system: FileSystem = base_file_system
+
+        #: The `epochs` attribute represents the number of epochs
+        #: of the warm started build.
+        if epochs is not None and epochs < 1:
+            raise ValueError("epochs must be at least 1")
+        self.epochs: int = epochs
+
+        #: The `summary` attribute represents the result of the
+        #: last call to `warm_start`.
+        self.summary: Dict[str, Any] = dict()
+
+    @staticmethod
+    def latest_build_version(file_system: FileSystem) -> str:
+        """This method returns the most recent build version of
+        the model of `file_system`, other than the current
+        build, which holds a saved model (or its artifact
+        manifest).
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: The build version (`%Y%m%d%H%M%S`).
+        :rtype: str
+        """
+        current_build_version = os.path.basename(
+            os.path.normpath(file_system.build_dir)
+        )
+        build_versions = [
+            build_version
+            for build_version in os.listdir(file_system.model_dir)
+            if build_version != current_build_version
+            and any(
+                os.path.isfile(
+                    os.path.join(
+                        file_system.model_dir,
+                        build_version,
+                        name
+                    )
+                )
+                for name in ("saved_model.pb", ArtifactStore.MANIFEST_FILE)
+            )
+        ] if os.path.isdir(file_system.model_dir) else list()
+
+        if not build_versions:
+            raise FileNotFoundError(
+                "no previous build found in "
+                + f"{file_system.model_dir}"
+            )
+
+        return max(build_versions)
+
+    def warm_start(
+            self,
+            model: keras.Model,
+            intents: List[str]
+    ) -> Dict[str, Any]:
+        """This method assigns the weights of the previous build
+        to `model`, a freshly built model (see
+        `Trainer.model_factory`) with one logits row per intent
+        of `intents`. Both models must share the same
+        architecture apart from the number of intents.
+
+        :param model:
+        :type model: keras.Model
+        :param intents: The intents of the new build, in the \
+        order of its logits.
+        :type intents: List[str]
+        :return: A summary of the kept, new and removed intents.
+        :rtype: Dict[str, Any]
+        """
+        base_model = Storage.load_model(self.base_file_system)
+        base_intents = ExternalDatasets.read_intents(
+            self.base_file_system
+        )
+
+        if len(base_model.layers) != len(model.layers):
+            raise ValueError(
+                "previous build architecture does not match"
+            )
+
+        weights = list()
+        base_weights = list()
+
+        # all layers but the logits layer are copied as is, the
+        # weights are matched by name within each layer since the
+        # order of trainable and frozen weights may differ
+        for base_layer, layer in zip(
+                base_model.layers[:-1],
+                model.layers[:-1]
+        ):
+            base_layer_weights = {
+                weight.name.split("/", 1)[-1]: weight
+                for weight in base_layer.weights
+            }
+            for weight in layer.weights:
+                base_weight = base_layer_weights.get(
+                    weight.name.split("/", 1)[-1]
+                )
+                if base_weight is None \
+                        or base_weight.shape != weight.shape:
+                    raise ValueError(
+                        "previous build has no weight matching "
+                        + f"{weight.name}"
+                    )
+                weights.append(weight)
+                base_weights.append(base_weight)
+
+        keras.backend.batch_set_value(
+            list(zip(
+                weights,
+                keras.backend.batch_get_value(base_weights)
+            ))
+        )
+
+        # logits rows of known intents are copied to their new
+        # position, new intents keep their fresh initialization
+        base_kernel, base_bias = base_model.layers[-1].get_weights()
+        kernel, bias = model.layers[-1].get_weights()
+        if base_kernel.shape[0] != kernel.shape[0]:
+            raise ValueError(
+                "previous build architecture does not match"
+            )
+
+        base_index = {
+            intent: index for index, intent in enumerate(base_intents)
+        }
+        kept_intents = [
+            intent for intent in intents if intent in base_index
+        ]
+        for intent in kept_intents:
+            kernel[:, intents.index(intent)] = \
+                base_kernel[:, base_index[intent]]
+            bias[intents.index(intent)] = base_bias[base_index[intent]]
+        model.layers[-1].set_weights([
+            kernel.astype(np.float32),
+            bias.astype(np.float32)
+        ])
+
+        self.summary = {
+            "base_build_dir": self.base_file_system.build_dir,
+            "epochs": self.epochs,
+            "kept_intents": kept_intents,
+            "new_intents": [
+                intent for intent in intents
+                if intent not in base_index
+            ],
+            "removed_intents": [
+                intent for intent in base_intents
+                if intent not in intents
+            ]
+        }
+
+        return self.summary
+
+    def create_warm_start_json(
+            self,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the summary of the last warm start
+        to `warmStartSummary.json` in the
+        `file_system.build_summary_dir` directory.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        warm_start_json_path = os.path.join(
+            file_system.build_summary_dir,
+            "warmStartSummary.json"
+        )
+
+        with open(warm_start_json_path, "w+") as file:
+            file.write(json.dumps(self.summary))
+
+        return None
@@ -0,0 +1,211 @@
+"""
+bert_weights_cache.py - This module contains the
+BertWeightsCache class definition.
+"""
+import os
+import json
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from bert import BertModelLayer
+from bert.loader import bert_prefix, map_to_stock_variable_name
+from ..woodgate_settings import FileSystem
+
+
+class BertWeightsCache:
+    """
+    BertWeightsCache - This class encapsulates logic related to
+    caching the converted BERT checkpoint weights in a single
+    contiguous file per BERT variant. Reading the original TF1
+    checkpoint and mapping variable names one by one is slow, the
+    cache is memory mapped and assigned directly instead.
+    """
+
+    @staticmethod
+    def get_cache_path(
+            bert: BertModelLayer,
+            file_system: FileSystem
+    ) -> str:
+        """The `get_cache_path` method returns the full path on
+        the host file system of the cached weights (`.npy` file
+        extension) of the L/H variant of `bert`. The index of the
+        cache has the same path with a `.json` file extension.
+
+        :param bert:
+        :type bert: BertModelLayer
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Path to the cached weights.
+        :rtype: str
+        """
+        return os.path.join(
+            file_system.bert_dir,
+            f"bert_weights_L-{bert.params.num_layers}_"
+            + f"H-{bert.params.hidden_size}.npy"
+        )
+
+    @staticmethod
+    def _stock_params(
+            bert: BertModelLayer
+    ) -> List[Tuple[tf.Variable, str]]:
+        """This method pairs the weights of `bert` with their
+        variable names in the stock checkpoint. Some mapped names
+        (e.g. of adapters) are not in the checkpoint.
+
+        :param bert:
+        :type bert: BertModelLayer
+        :return: (weight, stock variable name) pairs.
+        :rtype: List[Tuple[tf.Variable, str]]
+        """
+        prefix = bert_prefix(bert)
+        stock_params = list()
+        for param in bert.weights:
+            stock_name = map_to_stock_variable_name(
+                param.name,
+                prefix
+            )
+            if stock_name:
+                stock_params.append((param, stock_name))
+
+        return stock_params
+
+    @classmethod
+    def is_cached(
+            cls,
+            bert: BertModelLayer,
+            file_system: FileSystem
+    ) -> bool:
+        """This method returns `True` if a cache for the variant
+        of `bert` exists and is newer than the checkpoint.
+
+        :param bert:
+        :type bert: BertModelLayer
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Whether or not a valid cache exists.
+        :rtype: bool
+        """
+        cache_path = cls.get_cache_path(bert, file_system)
+        index_path = os.path.splitext(cache_path)[0] + ".json"
+        checkpoint_index_path = \
+            f"{file_system.get_bert_model_path()}.index"
+
+        if not os.path.isfile(cache_path) \
+                or not os.path.isfile(index_path):
+            return False
+
+        if os.path.isfile(checkpoint_index_path) \
+                and os.path.getmtime(checkpoint_index_path) \
+                > os.path.getmtime(index_path):
+            return False
+
+        return True
+
+    @classmethod
+    def load_weights(
+            cls,
+            bert: BertModelLayer,
+            file_system: FileSystem
+    ) -> bool:
+        """This method assigns the cached weights to `bert`. The
+        method returns `False` (and leaves `bert` untouched) on a
+        cache miss, i.e. if no valid cache exists or the cache
+        does not match the weights of `bert`. Like
+        `load_stock_weights`, weights which are not in the
+        checkpoint keep their initial values.
+
+        :param bert:
+        :type bert: BertModelLayer
+        :param file_system:
+        :type file_system: FileSystem
+        :return: Whether or not the weights were loaded.
+        :rtype: bool
+        """
+        if not cls.is_cached(bert, file_system):
+            return False
+
+        cache_path = cls.get_cache_path(bert, file_system)
+        with open(
+                os.path.splitext(cache_path)[0] + ".json"
+        ) as file:
+            index: Dict[str, Any] = json.load(file)
+
+        weights = np.load(cache_path, mmap_mode="r")
+
+        weight_value_tuples = list()
+        for param, stock_name in cls._stock_params(bert):
+            # weights which are not in the checkpoint (e.g.
+            # adapters) are not cached, see `create_cache`
+            if stock_name not in index:
+                continue
+            offset, shape = index[stock_name]
+            if tuple(shape) != tuple(param.shape):
+                return False
+            size = int(np.prod(shape))
+            weight_value_tuples.append(
+                (param, weights[offset:offset + size].reshape(shape))
+            )
+
+        if not weight_value_tuples:
+            return False
+
+        keras.backend.batch_set_value(weight_value_tuples)
+
+        return True
+
+    @classmethod
+    def create_cache(
+            cls,
+            bert: BertModelLayer,
+            file_system: FileSystem
+    ) -> None:
+        """This method writes the weights of `bert`, which are
+        assumed to have just been loaded from the stock
+        checkpoint, to the cache. Only weights found in the
+        checkpoint are cached. The files are written to a
+        temporary path first and moved into place so concurrent
+        builds never read a partially written cache.
+
+        :param bert:
+        :type bert: BertModelLayer
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        checkpoint_reader = tf.train.load_checkpoint(
+            file_system.get_bert_model_path()
+        )
+        stock_params = [
+            (param, stock_name)
+            for param, stock_name in cls._stock_params(bert)
+            if checkpoint_reader.has_tensor(stock_name)
+        ]
+        values = keras.backend.batch_get_value(
+            [param for param, _ in stock_params]
+        )
+
+        index = dict()
+        offset = 0
+        for (_, stock_name), value in zip(stock_params, values):
+            index[stock_name] = [offset, list(value.shape)]
+            offset += value.size
+
+        weights = np.concatenate(
+            [value.astype(np.float32).ravel() for value in values]
+        )
+
+        cache_path = cls.get_cache_path(bert, file_system)
+        index_path = os.path.splitext(cache_path)[0] + ".json"
+        suffix = f".{os.getpid()}.tmp"
+
+        with open(cache_path + suffix, "wb") as file:
+            np.save(file, weights)
+        with open(index_path + suffix, "w+") as file:
+            file.write(json.dumps(index))
+
+        os.replace(cache_path + suffix, cache_path)
+        os.replace(index_path + suffix, index_path)
+
+        return None
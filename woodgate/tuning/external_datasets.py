@@ -627,3 +627,21 @@ class ExternalDatasets:
             )
 
         return None
+
+    @staticmethod
+    def read_intents(file_system: FileSystem) -> List[str]:
+        """This method returns the intents of the build of
+        `file_system`, in the order of its logits, read from its
+        `intentsData.json` (see `create_intents_data_json`).
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: The intents, in the order of the logits.
+        :rtype: List[str]
+        """
+        intents_data_json = os.path.join(
+            file_system.datasets_summary_dir,
+            "intentsData.json"
+        )
+        with open(intents_data_json) as file:
+            return json.load(file)["intents"]
@@ -0,0 +1,277 @@
+"""
+successive_halving.py - The successive_halving.py module contains
+the SuccessiveHalving class definition.
+"""
+import os
+import csv
+import shutil
+import math
+import random
+from typing import Any, Dict, List
+from ..woodgate_logger import WoodgateLogger
+from .sweep import Sweep
+
+
+class SuccessiveHalving:
+    """
+    SuccessiveHalving - The SuccessiveHalving class encapsulates
+    logic related to early termination of hyperparameter search
+    trials. Many trials are trained for a small number of epochs
+    and evaluated on the validation split, only the top
+    `1 / reduction_factor` of them are promoted to train for
+    `reduction_factor` times as many epochs, until `max_epochs`
+    is reached. Promoted trials resume from their checkpoint. With
+    `hyperband` set, several such brackets are run, each starting
+    from a different number of trials and epochs
+    (see `https://arxiv.org/abs/1603.06560`).
+    """
+
+    #: The `RESULTS_COLUMNS` attribute is a constant which
+    #: represents the columns of `successiveHalvingResults.csv`.
+    RESULTS_COLUMNS: List[str] = [
+        "bracket",
+        "rung",
+        "trial",
+        "epochs",
+        "metric",
+        "promoted",
+        "training_time",
+        "error"
+    ] + list(Sweep.PARAMETERS)
+
+    def __init__(
+            self,
+            sweep: Sweep,
+            min_epochs: int = 1,
+            max_epochs: int = 9,
+            reduction_factor: int = 3,
+            metric: str = "val_loss",
+            hyperband: bool = False,
+            seed: int = 0
+    ):
+        """
+
+        :param sweep: The sweep which defines the trials and \
+        runs them.
+        :type sweep: Sweep
+        :param min_epochs: The smallest epoch budget.
+        :type min_epochs: int
+        :param max_epochs: The largest epoch budget.
+        :type max_epochs: int
+        :param reduction_factor: The factor by which the number \
+        of trials is reduced (and the budget increased) in each \
+        rung.
+        :type reduction_factor: int
+        :param metric: The validation metric, as it appears in \
+        the Keras `History`, used to rank trials. Metrics whose \
+        name contains `loss` are minimized, others are \
+        maximized.
+        :type metric: str
+        :param hyperband: Whether or not to run the Hyperband \
+        brackets instead of a single bracket.
+        :type hyperband: bool
+        :param seed: The seed used to sample Hyperband trials.
+        :type seed: int
+        """
+        if min_epochs < 1 or max_epochs < min_epochs:
+            raise ValueError(
+                "epochs must satisfy 1 <= min_epochs <= max_epochs"
+            )
+        if reduction_factor < 2:
+            raise ValueError("reduction_factor must be at least 2")
+
+        self.sweep: Sweep = sweep
+        self.min_epochs: int = min_epochs
+        self.max_epochs: int = max_epochs
+        self.reduction_factor: int = reduction_factor
+        self.metric: str = metric
+        self.hyperband: bool = hyperband
+        self.seed: int = seed
+
+    def score(self, result: Dict[str, Any]) -> float:
+        """This method returns the score of a trial result, lower
+        is better. Failed trials score infinity.
+
+        :param result:
+        :type result: Dict[str, Any]
+        :return: The score.
+        :rtype: float
+        """
+        value = result.get("history", dict()).get(self.metric)
+        if value is None or math.isnan(value):
+            return math.inf
+
+        return value if "loss" in self.metric else -value
+
+    def brackets(self) -> List[Dict[str, int]]:
+        """This method returns the number of trials and the
+        initial epoch budget of each bracket.
+
+        :return: A list of dictionaries with keys `trials` and \
+        `epochs`.
+        :rtype: List[Dict[str, int]]
+        """
+        s_max = int(
+            math.log(self.max_epochs / self.min_epochs)
+            / math.log(self.reduction_factor) + 1e-9
+        )
+
+        if not self.hyperband:
+            return [{
+                "trials": len(self.sweep.trials()),
+                "epochs": self.min_epochs
+            }]
+
+        return [
+            {
+                "trials": math.ceil(
+                    (s_max + 1) / (s + 1) * self.reduction_factor ** s
+                ),
+                "epochs": max(
+                    self.min_epochs,
+                    int(self.max_epochs * self.reduction_factor ** -s)
+                )
+            }
+            for s in reversed(range(s_max + 1))
+        ]
+
+    def run(self) -> List[Dict[str, Any]]:
+        """This method prepares the shared sweep data, runs all
+        brackets and writes every rung of every trial to
+        `successiveHalvingResults.csv`.
+
+        :return: One result per trial and rung.
+        :rtype: List[Dict[str, Any]]
+        """
+        logger = WoodgateLogger(
+            file_system=self.sweep.file_system
+        ).logger
+
+        logger.info("Preparing shared sweep data")
+        self.sweep.prepare()
+
+        all_trials = self.sweep.trials()
+        sampler = random.Random(self.seed)
+        # the checkpoints of this run, other sweeps share the
+        # temporary directory
+        checkpoint_dir = os.path.join(
+            self.sweep.file_system.temp_dir,
+            "successive_halving",
+            os.path.basename(
+                os.path.normpath(self.sweep.file_system.build_dir)
+            )
+        )
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        os.makedirs(checkpoint_dir)
+
+        rows = list()
+        for bracket, config in enumerate(self.brackets()):
+            trials = all_trials
+            if self.hyperband:
+                trials = sampler.sample(
+                    all_trials,
+                    min(config["trials"], len(all_trials))
+                )
+            trial_ids = list(range(len(trials)))
+            epochs = config["epochs"]
+            done_epochs = 0
+            rung = 0
+
+            while True:
+                logger.info(
+                    f"Bracket {bracket} rung {rung}: "
+                    + f"{len(trial_ids)} trials, {epochs} epochs"
+                )
+                results = self.sweep.run_trials(
+                    [
+                        dict(trials[trial_id], epochs=epochs)
+                        for trial_id in trial_ids
+                    ],
+                    logger,
+                    initial_epochs=[done_epochs] * len(trial_ids),
+                    checkpoint_paths=[
+                        os.path.join(
+                            checkpoint_dir,
+                            f"bracket_{bracket}_trial_{trial_id}"
+                        )
+                        for trial_id in trial_ids
+                    ]
+                )
+
+                ranked = sorted(
+                    zip(trial_ids, results),
+                    key=lambda item: self.score(item[1])
+                )
+                promoted = set()
+                if epochs < self.max_epochs:
+                    promoted = {
+                        trial_id
+                        for trial_id, result in ranked[
+                            :max(
+                                1,
+                                len(ranked) // self.reduction_factor
+                            )
+                        ]
+                        if self.score(result) < math.inf
+                    }
+
+                for trial_id, result in ranked:
+                    result.update({
+                        "bracket": bracket,
+                        "rung": rung,
+                        "trial": trial_id,
+                        "epochs": epochs,
+                        "metric": result.get(
+                            "history", dict()
+                        ).get(self.metric),
+                        "promoted": trial_id in promoted
+                    })
+                    rows.append(result)
+
+                if not promoted:
+                    break
+
+                trial_ids = [
+                    trial_id for trial_id, _ in ranked
+                    if trial_id in promoted
+                ]
+                done_epochs = epochs
+                epochs = min(
+                    epochs * self.reduction_factor,
+                    self.max_epochs
+                )
+                rung += 1
+
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        self.create_successive_halving_results_csv(rows)
+
+        return rows
+
+    def create_successive_halving_results_csv(
+            self,
+            rows: List[Dict[str, Any]]
+    ) -> None:
+        """This method writes `rows` to
+        `successiveHalvingResults.csv` in the
+        `file_system.build_summary_dir` directory.
+
+        :param rows:
+        :type rows: List[Dict[str, Any]]
+        :return: None
+        :rtype: NoneType
+        """
+        results_csv_path = os.path.join(
+            self.sweep.file_system.build_summary_dir,
+            "successiveHalvingResults.csv"
+        )
+
+        with open(results_csv_path, "w+", newline="") as file:
+            writer = csv.DictWriter(
+                file,
+                fieldnames=self.RESULTS_COLUMNS,
+                extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return None
@@ -0,0 +1,113 @@
+"""
+successive_halving_test.py - The successive_halving_test.py module
+contains unit tests for the successive_halving.py module.
+"""
+import math
+import unittest
+import shutil
+from .sweep import Sweep
+from .successive_halving import SuccessiveHalving
+from ..woodgate_settings import Model, Build, FileSystem
+
+
+class TestSuccessiveHalving(unittest.TestCase):
+    """
+    TestSuccessiveHalving class contains the unit tests related to
+    the SuccessiveHalving class.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        """
+        model = Model("test")
+        build = Build()
+        file_system = FileSystem(model, build)
+        file_system.configure()
+        self.file_system = file_system
+        self.sweep = Sweep(
+            search_space={
+                "learning_rate": [1e-5, 2e-5, 3e-5],
+                "batch_size": [8, 16, 32]
+            },
+            model=model,
+            file_system=file_system
+        )
+
+    def tearDown(self) -> None:
+        """
+
+        :return:
+        """
+        shutil.rmtree(self.file_system.woodgate_base_dir)
+
+    def test_brackets(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        successive_halving = SuccessiveHalving(
+            sweep=self.sweep,
+            min_epochs=1,
+            max_epochs=9,
+            reduction_factor=3
+        )
+
+        self.assertEqual(
+            successive_halving.brackets(),
+            [{"trials": 9, "epochs": 1}]
+        )
+
+        hyperband = SuccessiveHalving(
+            sweep=self.sweep,
+            min_epochs=1,
+            max_epochs=9,
+            reduction_factor=3,
+            hyperband=True
+        )
+
+        self.assertEqual(
+            hyperband.brackets(),
+            [
+                {"trials": 9, "epochs": 1},
+                {"trials": 5, "epochs": 3},
+                {"trials": 3, "epochs": 9}
+            ]
+        )
+
+        with self.assertRaises(ValueError):
+            SuccessiveHalving(
+                sweep=self.sweep,
+                min_epochs=4,
+                max_epochs=2
+            )
+
+    def test_score(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        successive_halving = SuccessiveHalving(
+            sweep=self.sweep,
+            metric="val_sparse_categorical_accuracy"
+        )
+
+        self.assertLess(
+            successive_halving.score(
+                {"history": {"val_sparse_categorical_accuracy": 0.9}}
+            ),
+            successive_halving.score(
+                {"history": {"val_sparse_categorical_accuracy": 0.5}}
+            )
+        )
+        self.assertEqual(
+            successive_halving.score({"error": "failed"}),
+            math.inf
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,488 @@
+"""
+sweep.py - The sweep.py module contains the Sweep class
+definition.
+"""
+import os
+import csv
+import time
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+from ..woodgate_settings import Architecture, FileSystem, Model
+from ..woodgate_logger import WoodgateLogger
+from ..trainer.preprocessor import Preprocessor
+from ..trainer.trainer import Trainer
+from ..trainer.evaluator import Evaluator
+from ..compiler.compiler import Compiler
+from ..transfer.bert_model_parameters import BertModelParameters
+from ..transfer.bert_retrieval_strategy import BertRetrievalStrategy
+from .external_datasets import ExternalDatasets
+from .dataset_retrieval_strategy import DatasetRetrievalStrategy
+
+
+class Sweep:
+    """
+    Sweep - The Sweep class encapsulates logic related to
+    expanding a hyperparameter search space into trials and
+    running them in a bounded process pool. The datasets and the
+    BERT files are retrieved and the corpus is tokenized once, all
+    trials share them.
+    """
+
+    #: The `PARAMETERS` attribute is a constant which maps the
+    #: hyperparameters that may be swept to their types.
+    PARAMETERS: Dict[str, type] = {
+        "clf_out_dropout_rate": float,
+        "clf_out_activation": str,
+        "logits_dropout_rate": float,
+        "logits_activation": str,
+        "optimizer": str,
+        "learning_rate": float,
+        "learning_rate_schedule": str,
+        "warmup_proportion": float,
+        "batch_size": int,
+        "epochs": int
+    }
+
+    #: The `DEFAULTS` attribute is a constant which represents the
+    #: value of each hyperparameter not in the search space.
+    DEFAULTS: Dict[str, Any] = {
+        "clf_out_dropout_rate": 0.5,
+        "clf_out_activation": "tanh",
+        "logits_dropout_rate": 0.5,
+        "logits_activation": "softmax",
+        "optimizer": "Adam",
+        "learning_rate": 1e-5,
+        "learning_rate_schedule": "constant",
+        "warmup_proportion": 0.1,
+        "batch_size": 16,
+        "epochs": 1
+    }
+
+    #: The `RESULTS_COLUMNS` attribute is a constant which
+    #: represents the columns of `sweepResults.csv`.
+    RESULTS_COLUMNS: List[str] = [
+        "rank",
+        "trial",
+        "accuracy",
+        "val_loss",
+        "training_time",
+        "inference_latency_ms",
+        "error"
+    ] + list(PARAMETERS)
+
+    def __init__(
+            self,
+            search_space: Dict[str, List[Any]],
+            model: Model,
+            file_system: FileSystem,
+            max_workers: int = 1,
+            validation_split: float = 0.1
+    ):
+        """
+
+        :param search_space: Maps hyperparameter names (see \
+        `PARAMETERS`) to the list of values to try.
+        :type search_space: Dict[str, List[Any]]
+        :param model:
+        :type model: Model
+        :param file_system:
+        :type file_system: FileSystem
+        :param max_workers: The maximum number of trials run at \
+        the same time.
+        :type max_workers: int
+        :param validation_split:
+        :type validation_split: float
+        """
+        for name, values in search_space.items():
+            if name not in self.PARAMETERS:
+                raise ValueError(
+                    f"unknown hyperparameter: {name}, must be "
+                    + "one of: "
+                    + ", ".join(f'"{p}"' for p in self.PARAMETERS)
+                )
+            if not values:
+                raise ValueError(
+                    f"no values given for hyperparameter: {name}"
+                )
+
+        #: The `search_space` attribute represents the values
+        #: tried for each swept hyperparameter.
+        self.search_space: Dict[str, List[Any]] = {
+            name: [self.PARAMETERS[name](value) for value in values]
+            for name, values in search_space.items()
+        }
+
+        self.model: Model = model
+        self.file_system: FileSystem = file_system
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers: int = max_workers
+
+        self.validation_split: float = validation_split
+
+    def trials(self) -> List[Dict[str, Any]]:
+        """This method expands the search space into the list of
+        trials, i.e. the cartesian product of all swept values
+        completed with `DEFAULTS`.
+
+        :return: A list of hyperparameter dictionaries.
+        :rtype: List[Dict[str, Any]]
+        """
+        names = list(self.search_space)
+        trials = list()
+        for values in itertools.product(
+                *[self.search_space[name] for name in names]
+        ):
+            trial = dict(self.DEFAULTS)
+            trial.update(zip(names, values))
+            trials.append(trial)
+
+        return trials
+
+    def get_corpus_path(self) -> str:
+        """The `get_corpus_path` method returns the full path on
+        the host file system of the tokenized corpus shared by
+        all trials.
+
+        :return: Path to the tokenized corpus.
+        :rtype: str
+        """
+        return os.path.join(self.file_system.temp_dir, "corpus.npz")
+
+    def prepare(self) -> None:
+        """This method retrieves the datasets and the BERT files
+        and saves the tokenized corpus to `get_corpus_path()`.
+
+        :return: None
+        :rtype: NoneType
+        """
+        external_datasets = ExternalDatasets()
+        for file_id, output in [
+            (
+                external_datasets.training_dataset_id,
+                self.file_system.get_training_path()
+            ),
+            (
+                external_datasets.testing_dataset_id,
+                self.file_system.get_testing_path()
+            ),
+            (
+                external_datasets.evaluation_dataset_id,
+                self.file_system.get_evaluation_path()
+            ),
+            (
+                external_datasets.regression_dataset_id,
+                self.file_system.get_regression_path()
+            )
+        ]:
+            if not os.path.isfile(output):
+                DatasetRetrievalStrategy.retrieve_dataset(
+                    file_system=self.file_system,
+                    file_id=file_id,
+                    output=output
+                )
+        self.set_datasets(self.file_system)
+
+        BertRetrievalStrategy(
+            bert_model_parameters=BertModelParameters()
+        ).download_bert(self.file_system)
+
+        Preprocessor(
+            external_datasets.training_data,
+            external_datasets.testing_data,
+            self.file_system.get_bert_vocab_path(),
+            external_datasets.all_intents()
+        ).save(self.get_corpus_path())
+
+        return None
+
+    @staticmethod
+    def set_datasets(file_system: FileSystem) -> None:
+        """This method sets all `ExternalDatasets` data from the
+        files already retrieved to `file_system`.
+
+        :param file_system:
+        :type file_system: FileSystem
+        :return: None
+        :rtype: NoneType
+        """
+        ExternalDatasets.set_training_data(file_system)
+        ExternalDatasets.set_testing_data(file_system)
+        ExternalDatasets.set_evaluation_data(file_system)
+        ExternalDatasets.set_regression_data(file_system)
+
+        return None
+
+    @classmethod
+    def run_trial(
+            cls,
+            trial: Dict[str, Any],
+            model_name: str,
+            file_system: FileSystem,
+            corpus_path: str,
+            validation_split: float,
+            initial_epoch: int = 0,
+            checkpoint_path: str = None
+    ) -> Dict[str, Any]:
+        """This method runs a single trial: it builds, compiles
+        and fits a model with the trial's hyperparameters and
+        measures its test accuracy and single utterance inference
+        latency. It is run in a worker process. If a
+        `checkpoint_path` is given, training resumes from the
+        weights saved there at `initial_epoch` (if it is not 0)
+        and the weights are saved there afterwards.
+
+        :param trial: The trial's hyperparameters.
+        :type trial: Dict[str, Any]
+        :param model_name:
+        :type model_name: str
+        :param file_system:
+        :type file_system: FileSystem
+        :param corpus_path: Path to the tokenized corpus.
+        :type corpus_path: str
+        :param validation_split:
+        :type validation_split: float
+        :param initial_epoch:
+        :type initial_epoch: int
+        :param checkpoint_path:
+        :type checkpoint_path: str
+        :return: The trial's hyperparameters and results.
+        :rtype: Dict[str, Any]
+        """
+        cls.set_datasets(file_system)
+        data = Preprocessor.load(corpus_path)
+
+        architecture = Architecture(
+            clf_out_dropout_rate=trial["clf_out_dropout_rate"],
+            clf_out_activation=trial["clf_out_activation"],
+            logits_dropout_rate=trial["logits_dropout_rate"],
+            logits_activation=trial["logits_activation"]
+        )
+
+        bert_model = Trainer.model_factory(
+            model_name,
+            ExternalDatasets(),
+            data,
+            architecture,
+            file_system
+        )
+
+        Compiler.compile(
+            model=bert_model,
+            optimizer=Compiler.optimizer_factory(
+                name=trial["optimizer"],
+                learning_rate=trial["learning_rate"]
+            ),
+            loss=Compiler.loss_factory(
+                "Sparse_Categorical_Crossentropy",
+                *["true", "0.5"]
+            ),
+            metrics=Compiler.metrics_factory(
+                "sparse_categorical_accuracy"
+            )
+        )
+
+        trainer = Trainer(
+            validation_split=validation_split,
+            batch_size=trial["batch_size"],
+            epochs=trial["epochs"],
+            learning_rate_schedule=trial["learning_rate_schedule"],
+            warmup_proportion=trial["warmup_proportion"]
+        )
+
+        # a trial only resumes the epochs it trained before
+        if initial_epoch > 0 and checkpoint_path is not None \
+                and os.path.isfile(f"{checkpoint_path}.index"):
+            bert_model.load_weights(checkpoint_path)
+
+        start = time.perf_counter()
+        build_history = trainer.fit(
+            bert_model,
+            data,
+            initial_epoch=initial_epoch
+        )
+        training_time = time.perf_counter() - start
+
+        if checkpoint_path is not None:
+            bert_model.save_weights(checkpoint_path)
+
+        _, test = Evaluator.evaluate_model_accuracy(
+            bert_model,
+            data
+        )
+
+        # warm up once, then time single utterance predictions
+        utterance = data.test_x[:1]
+        bert_model.predict_on_batch(utterance)
+        latencies = list()
+        for _ in range(20):
+            start = time.perf_counter()
+            bert_model.predict_on_batch(utterance)
+            latencies.append(time.perf_counter() - start)
+
+        result = dict(trial)
+        result.update({
+            "accuracy": float(test[1]),
+            "val_loss": float(
+                build_history.history.get("val_loss", [float("nan")])[-1]
+            ),
+            "training_time": training_time,
+            "inference_latency_ms":
+                sorted(latencies)[len(latencies) // 2] * 1000,
+            "history": {
+                name: float(values[-1])
+                for name, values in build_history.history.items()
+            },
+            "error": ""
+        })
+
+        return result
+
+    def run_trials(
+            self,
+            trials: List[Dict[str, Any]],
+            logger: logging.Logger,
+            initial_epochs: List[int] = None,
+            checkpoint_paths: List[str] = None
+    ) -> List[Dict[str, Any]]:
+        """This method runs `trials` in a process pool of at most
+        `max_workers` processes. A trial which fails is reported
+        with its `error` and without results.
+
+        :param trials:
+        :type trials: List[Dict[str, Any]]
+        :param logger:
+        :type logger: logging.Logger
+        :param initial_epochs: The `initial_epoch` of each trial.
+        :type initial_epochs: List[int]
+        :param checkpoint_paths: The `checkpoint_path` of each \
+        trial.
+        :type checkpoint_paths: List[str]
+        :return: The trial results in the order of `trials`.
+        :rtype: List[Dict[str, Any]]
+        """
+        initial_epochs = initial_epochs or [0] * len(trials)
+        checkpoint_paths = checkpoint_paths or [None] * len(trials)
+
+        results = list()
+        # tensorflow is not fork safe, so workers are spawned
+        with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self.run_trial,
+                    trial,
+                    self.model.model_name,
+                    self.file_system,
+                    self.get_corpus_path(),
+                    self.validation_split,
+                    initial_epoch,
+                    checkpoint_path
+                )
+                for trial, initial_epoch, checkpoint_path in zip(
+                    trials,
+                    initial_epochs,
+                    checkpoint_paths
+                )
+            ]
+            for index, (trial, future) in enumerate(
+                    zip(trials, futures)
+            ):
+                try:
+                    result = future.result()
+                except Exception as error:
+                    logger.error(f"Trial {index} failed: {error}")
+                    result = dict(trial)
+                    result["error"] = str(error)
+                results.append(result)
+
+        return results
+
+    def run(self) -> List[Dict[str, Any]]:
+        """This method prepares the shared data, runs all trials
+        and writes the ranked results to `sweepResults.csv`.
+
+        :return: The trial results ranked by accuracy.
+        :rtype: List[Dict[str, Any]]
+        """
+        logger = WoodgateLogger(file_system=self.file_system).logger
+
+        logger.info("Preparing shared sweep data")
+        self.prepare()
+
+        trials = self.trials()
+        logger.info(
+            f"Running {len(trials)} trials with "
+            + f"{self.max_workers} workers"
+        )
+
+        results = self.run_trials(trials, logger)
+        for index, result in enumerate(results):
+            result["trial"] = index
+            logger.info(
+                f"Trial {index} complete: "
+                + f"accuracy={result.get('accuracy')}"
+            )
+
+        results = self.rank(results)
+        self.create_sweep_results_csv(results)
+
+        return results
+
+    @staticmethod
+    def rank(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """This method sorts the results by accuracy (highest
+        first, failed trials last) and sets their `rank`.
+
+        :param results:
+        :type results: List[Dict[str, Any]]
+        :return: The ranked results.
+        :rtype: List[Dict[str, Any]]
+        """
+        results = sorted(
+            results,
+            key=lambda result: (
+                result.get("accuracy") is None,
+                -(result.get("accuracy") or 0.0),
+                result.get("training_time") or 0.0
+            )
+        )
+        for rank, result in enumerate(results, start=1):
+            result["rank"] = rank
+
+        return results
+
+    def create_sweep_results_csv(
+            self,
+            results: List[Dict[str, Any]]
+    ) -> None:
+        """This method writes the ranked `results` to
+        `sweepResults.csv` in the `file_system.build_summary_dir`
+        directory.
+
+        :param results:
+        :type results: List[Dict[str, Any]]
+        :return: None
+        :rtype: NoneType
+        """
+        sweep_results_csv_path = os.path.join(
+            self.file_system.build_summary_dir,
+            "sweepResults.csv"
+        )
+
+        with open(sweep_results_csv_path, "w+", newline="") as file:
+            writer = csv.DictWriter(
+                file,
+                fieldnames=self.RESULTS_COLUMNS,
+                extrasaction="ignore"
+            )
+            writer.writeheader()
+            writer.writerows(results)
+
+        return None
@@ -0,0 +1,108 @@
+"""
+sweep_test.py - The sweep_test.py module contains unit tests
+for the sweep.py module.
+"""
+import os
+import csv
+import unittest
+import shutil
+from .sweep import Sweep
+from ..woodgate_settings import Model, Build, FileSystem
+
+
+class TestSweep(unittest.TestCase):
+    """
+    TestSweep class contains the unit tests related to the Sweep
+    class.
+    """
+
+    def setUp(self) -> None:
+        """
+
+        :return:
+        """
+        model = Model("test")
+        build = Build()
+        file_system = FileSystem(model, build)
+        file_system.configure()
+        self.model = model
+        self.file_system = file_system
+
+    def tearDown(self) -> None:
+        """
+
+        :return:
+        """
+        shutil.rmtree(self.file_system.woodgate_base_dir)
+
+    def test_trials(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        sweep = Sweep(
+            search_space={
+                "learning_rate": ["1e-5", "3e-5"],
+                "batch_size": [16, 32, 64]
+            },
+            model=self.model,
+            file_system=self.file_system
+        )
+
+        trials = sweep.trials()
+
+        self.assertEqual(len(trials), 6)
+        self.assertEqual(trials[0]["learning_rate"], 1e-5)
+        self.assertEqual(trials[-1]["batch_size"], 64)
+        self.assertEqual(
+            trials[0]["optimizer"],
+            Sweep.DEFAULTS["optimizer"]
+        )
+
+        with self.assertRaises(ValueError):
+            Sweep(
+                search_space={"invalid": [1]},
+                model=self.model,
+                file_system=self.file_system
+            )
+
+    def test_rank_and_results_csv(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        sweep = Sweep(
+            search_space={"epochs": [1]},
+            model=self.model,
+            file_system=self.file_system
+        )
+
+        results = Sweep.rank([
+            {"trial": 0, "accuracy": 0.5, "training_time": 1.0},
+            {"trial": 1, "error": "failed"},
+            {"trial": 2, "accuracy": 0.9, "training_time": 2.0}
+        ])
+
+        self.assertEqual(
+            [result["trial"] for result in results],
+            [2, 0, 1]
+        )
+        self.assertEqual(results[0]["rank"], 1)
+
+        sweep.create_sweep_results_csv(results)
+
+        with open(
+                os.path.join(
+                    self.file_system.build_summary_dir,
+                    "sweepResults.csv"
+                )
+        ) as file:
+            rows = list(csv.DictReader(file))
+
+        self.assertEqual(rows[0]["trial"], "2")
+
+
+if __name__ == '__main__':
+    unittest.main()
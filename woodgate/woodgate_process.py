@@ -3,7 +3,9 @@ woodgate_process.py - The woodgate_process.py module contains the
 Woodgate class definition.
 """
 import datetime
+from typing import List, Optional
 
+from tensorflow import keras
 from woodgate.tuning.external_datasets import ExternalDatasets
 from woodgate.woodgate_logger import WoodgateLogger
 from woodgate.trainer.preprocessor import Preprocessor
@@ -11,7 +13,13 @@ from woodgate.tuning.dataset_retrieval_strategy import \
     DatasetRetrievalStrategy
 from woodgate.trainer.evaluator import Evaluator
 from woodgate.trainer.trainer import Trainer
+from woodgate.trainer.distiller import Distiller
+from woodgate.trainer.warm_starter import WarmStarter
+from woodgate.trainer.pruner import Pruner
+from woodgate.trainer.factorizer import Factorizer
+from woodgate.trainer.artifact_store import ArtifactStore
 from woodgate.compiler.compiler import Compiler
+from woodgate.compiler.schedules import WarmupDecay
 from woodgate.trainer.storage import Storage
 from woodgate.transfer.bert_model_parameters import \
     BertModelParameters
@@ -19,6 +27,7 @@ from woodgate.transfer.bert_retrieval_strategy import \
     BertRetrievalStrategy
 from .woodgate_settings import FileSystem, Model
 from .woodgate_settings import Architecture
+from .runtime_profile import RuntimeProfile
 
 
 class WoodgateProcess:
@@ -30,14 +39,105 @@ class WoodgateProcess:
     """
 
     @staticmethod
-    def run(model: Model, file_system: FileSystem) -> None:
+    def run(
+            model: Model,
+            file_system: FileSystem,
+            architecture: Architecture = None,
+            trainer: Trainer = None,
+            distiller: Distiller = None,
+            warm_starter: WarmStarter = None,
+            runtime_profile: RuntimeProfile = None,
+            runtime_benchmark: bool = False,
+            optimizer: keras.optimizers.Optimizer = None,
+            compile_profile: str = "default",
+            compile_benchmark: bool = False,
+            export_serving_model: bool = False,
+            tflite_quantization: str = None,
+            pruner: Pruner = None,
+            factorizer: Factorizer = None,
+            artifact_store: ArtifactStore = None,
+            fast_model: bool = False,
+            cold_start_benchmark: bool = False,
+            serving_warmup_batch_sizes: List[int] = None,
+            serving_warmup_file: str = None
+    ) -> None:
         """The `run` method starts the main build_history
         process. The `WoodgateProcess.run()` method is what one
         would likely call from a `main.py` module.
 
+        :param model: The model being built.
+        :type model: Model
+        :param file_system: The file system configuration.
+        :type file_system: FileSystem
+        :param architecture: The classifier architecture. If \
+        `None`, the default architecture is used.
+        :type architecture: Architecture
+        :param trainer: The trainer used to fit the model. If \
+        `None`, a trainer with the default settings is used.
+        :type trainer: Trainer
+        :param distiller: If set, the model is trained as a \
+        student of the distiller's teacher build.
+        :type distiller: Distiller
+        :param warm_starter: If set, the model is initialized \
+        from the warm starter's previous build.
+        :type warm_starter: WarmStarter
+        :param runtime_profile: The TensorFlow runtime settings \
+        of the build. If `None`, the TensorFlow defaults are used.
+        :type runtime_profile: RuntimeProfile
+        :param runtime_benchmark: Whether or not to benchmark the \
+        runtime settings before training.
+        :type runtime_benchmark: bool
+        :param optimizer: The optimizer used to fit the model. If \
+        `None`, Adam with a learning rate of `1e-5` is used.
+        :type optimizer: keras.optimizers.Optimizer
+        :param compile_profile: The name of the compile profile, \
+        see `Compiler.COMPILE_PROFILES`.
+        :type compile_profile: str
+        :param compile_benchmark: Whether or not to run a smoke \
+        benchmark of the compile profile before training.
+        :type compile_benchmark: bool
+        :param export_serving_model: Whether or not to also \
+        export a serving model which takes raw utterances.
+        :type export_serving_model: bool
+        :param tflite_quantization: If set (`"dynamic"` or \
+        `"int8"`), a quantized TFLite model is also exported and \
+        compared with the build on the regression data.
+        :type tflite_quantization: str
+        :param pruner: If set, the trained model is pruned and \
+        fine tuned again before it is evaluated and saved.
+        :type pruner: Pruner
+        :param factorizer: If set, dense layers of the trained \
+        model are replaced by low rank factorizations before it \
+        is evaluated and saved.
+        :type factorizer: Factorizer
+        :param artifact_store: If set, the build artifacts are \
+        stored by content in the artifact store.
+        :type artifact_store: ArtifactStore
+        :param fast_model: Whether or not to also export a fast \
+        model, see `Storage.save_fast_model`. Factorized models \
+        have no fast model.
+        :type fast_model: bool
+        :param cold_start_benchmark: Whether or not to compare \
+        the cold start of the fast model with the SavedModel.
+        :type cold_start_benchmark: bool
+        :param serving_warmup_batch_sizes: If set, TensorFlow \
+        Serving warmup requests of these batch sizes are saved \
+        with the build, see `Storage.save_warmup_requests`.
+        :type serving_warmup_batch_sizes: List[int]
+        :param serving_warmup_file: A CSV or JSON lines file of \
+        representative requests the warmup requests are sampled \
+        from. If `None`, they are sampled from the regression data.
+        :type serving_warmup_file: str
         :return: None
         :rtype: NoneType
         """
+        # the low rank layers of a factorized model are not part
+        # of its configuration, which the fast model is rebuilt
+        # from, so the build is rejected before it is trained
+        if fast_model and factorizer is not None:
+            raise ValueError(
+                "fast_model is not supported with a factorizer"
+            )
 
         """
         Step 1 - Startup
@@ -55,11 +155,29 @@ class WoodgateProcess:
 
         start_time = datetime.datetime.now()
 
+        # thread pools can only be sized before TensorFlow runs
+        # its first operation, so the profile is applied first
+        if runtime_profile is None:
+            runtime_profile = RuntimeProfile()
+        runtime_summary = runtime_profile.apply()
+        if runtime_benchmark:
+            runtime_profile.benchmark()
+        runtime_profile.create_runtime_profile_json(file_system)
+
         logger.info(
             "Woodgate process started: "
             + f"{start_time.strftime('%Y-%m-%d %H:%M:%s')}"
         )
 
+        logger.info(
+            "Runtime profile: inter_op_threads="
+            + f"{runtime_summary['inter_op_threads']}, "
+            + "intra_op_threads="
+            + f"{runtime_summary['intra_op_threads']}, "
+            + f"cpu_affinity={runtime_summary['cpu_affinity']}, "
+            + f"onednn={runtime_summary['onednn']}"
+        )
+
         logger.info(
             "Initializing file system configuration"
         )
@@ -182,12 +300,24 @@ class WoodgateProcess:
             + f"{data.max_sequence_length}"
         )
 
-        architecture = Architecture(
-            clf_out_dropout_rate=0.5,
-            clf_out_activation="tanh",
-            logits_dropout_rate=0.5,
-            logits_activation="softmax"
+        if architecture is None:
+            architecture = Architecture(
+                clf_out_dropout_rate=0.5,
+                clf_out_activation="tanh",
+                logits_dropout_rate=0.5,
+                logits_activation="softmax"
+            )
+
+        if architecture.adapter_size is not None:
+            logger.info(
+                "Adapter fine tuning enabled: adapter_size="
+                + f"{architecture.adapter_size}"
+            )
+
+        logger.info(
+            f"Configuring compile profile: {compile_profile}"
         )
+        Compiler.configure(compile_profile)
 
         logger.info("Creating BERT evaluator")
         bert_model = Trainer.model_factory(
@@ -198,6 +328,23 @@ class WoodgateProcess:
             file_system,
         )
 
+        if warm_starter is not None:
+            logger.info(
+                "Warm starting from previous build: "
+                + f"{warm_starter.base_file_system.build_dir}"
+            )
+            warm_start_summary = warm_starter.warm_start(
+                model=bert_model,
+                intents=data.intents
+            )
+            logger.info(
+                "Kept intents: "
+                + f"{len(warm_start_summary['kept_intents'])}, "
+                + "new intents: "
+                + f"{len(warm_start_summary['new_intents'])}"
+            )
+            warm_starter.create_warm_start_json(file_system)
+
         logger.info(
             "Printing summary of BERT evaluator"
         )
@@ -207,10 +354,11 @@ class WoodgateProcess:
             "Compiling BERT evaluator"
         )
 
-        optimizer = Compiler.optimizer_factory(
-            name="Adam",
-            learning_rate=1e-5
-        )
+        if optimizer is None:
+            optimizer = Compiler.optimizer_factory(
+                name="Adam",
+                learning_rate=1e-5
+            )
 
         loss = Compiler.loss_factory(
             "Sparse_Categorical_Crossentropy",
@@ -220,12 +368,27 @@ class WoodgateProcess:
         metrics = Compiler.metrics_factory(
             "sparse_categorical_accuracy")
 
-        Compiler.compile(
-            model=bert_model,
-            optimizer=optimizer,
-            loss=loss,
-            metrics=metrics
-        )
+        fit_data = data
+        if distiller is None:
+            Compiler.compile(
+                model=bert_model,
+                optimizer=optimizer,
+                loss=loss,
+                metrics=metrics,
+                profile=compile_profile
+            )
+        else:
+            logger.info(
+                "Distilling from teacher build: "
+                + f"{distiller.teacher_file_system.build_dir}"
+            )
+            distiller.compile(
+                model=bert_model,
+                optimizer=optimizer,
+                architecture=architecture,
+                profile=compile_profile
+            )
+            fit_data = distiller.distillation_data(data)
 
         logger.info(
             "BERT evaluator compilation complete"
@@ -235,10 +398,34 @@ class WoodgateProcess:
             "Initializing evaluator fitter"
         )
 
-        trainer = Trainer(
-            validation_split=0.1,
-            batch_size=16,
-            epochs=1,
+        if trainer is None:
+            trainer = Trainer(
+                validation_split=0.1,
+                batch_size=16,
+                epochs=1,
+            )
+
+        if warm_starter is not None \
+                and warm_starter.epochs is not None:
+            trainer.epochs = warm_starter.epochs
+
+        compile_benchmark_summary = None
+        if compile_benchmark:
+            logger.info("Benchmarking compile profile")
+            compile_benchmark_summary = Compiler.benchmark(
+                model=bert_model,
+                train_x=fit_data.train_x,
+                train_y=fit_data.train_y,
+                batch_size=trainer.batch_size
+            )
+            logger.info(
+                f"Compile profile {compile_profile} step time: "
+                + f"{compile_benchmark_summary['step_time_ms']:.1f} ms"
+            )
+        Compiler.create_compile_profile_json(
+            profile=compile_profile,
+            benchmark=compile_benchmark_summary,
+            file_system=file_system
         )
 
         logger.info(
@@ -246,7 +433,38 @@ class WoodgateProcess:
         )
         build_history = trainer.fit(
             bert_model=bert_model,
-            data=data
+            data=fit_data
+        )
+
+        if distiller is not None:
+            # the distillation loss expects teacher targets, the
+            # student is evaluated and saved with the regular loss
+            Compiler.compile(
+                model=bert_model,
+                optimizer=optimizer,
+                loss=loss,
+                metrics=metrics,
+                profile=compile_profile
+            )
+
+        if trainer.autotuner is not None:
+            autotune_summary = trainer.autotuner.summary
+            logger.info(
+                "Autotuner selected batch size: "
+                + f"{autotune_summary['batch_size']} ("
+                + f"{autotune_summary['examples_per_second']:.1f} "
+                + "examples/sec)"
+            )
+            if autotune_summary["memory_limit_exceeded"]:
+                logger.warning(
+                    "Autotuner batch size exceeds the memory limit: "
+                    + f"{autotune_summary['memory_limit_mb']} MB"
+                )
+            trainer.autotuner.create_autotune_json(file_system)
+
+        logger.info(
+            "Training stopped: "
+            + f"{trainer.training_summary['stop_reason']}"
         )
 
         logger.info(
@@ -254,9 +472,86 @@ class WoodgateProcess:
         )
         trainer.create_build_history_json(
             build_history=build_history,
-            file_system=file_system
+            file_system=file_system,
+            training_summary=trainer.training_summary
         )
 
+        logger.info(
+            "Creating build throughput CSV"
+        )
+        trainer.create_throughput_csv(file_system)
+
+        if pruner is not None:
+            logger.info("Pruning BERT evaluator")
+            bert_model = pruner.prune(
+                bert_model=bert_model,
+                name=model.model_name,
+                external_datasets=external_datasets,
+                data=data,
+                architecture=architecture,
+                file_system=file_system,
+                validation_split=trainer.validation_split
+            )
+            logger.info(
+                "Pruned to num_layers="
+                + f"{pruner.summary['pruned_num_layers']}, "
+                + "intermediate_size="
+                + f"{pruner.summary['pruned_intermediate_size']} ("
+                + f"{pruner.summary['flops_ratio']:.2f} of the "
+                + "FLOPs, latency speedup: "
+                + f"{pruner.summary['latency_speedup']:.2f}x)"
+            )
+
+            if pruner.recovery_epochs > 0:
+                logger.info("Fine tuning pruned BERT evaluator")
+            recovery_history = WoodgateProcess.recover(
+                bert_model=bert_model,
+                data=data,
+                trainer=trainer,
+                epochs=pruner.recovery_epochs,
+                optimizer=optimizer,
+                loss=loss,
+                metrics=metrics,
+                compile_profile=compile_profile
+            )
+            if recovery_history is not None:
+                pruner.summary["recovery_history"] = \
+                    recovery_history.history
+            pruner.create_prune_json(file_system)
+
+        if factorizer is not None:
+            logger.info("Factorizing BERT evaluator dense layers")
+            factorize_summary = factorizer.factorize(
+                bert_model=bert_model,
+                data=data
+            )
+            logger.info(
+                "Factorized parameters: "
+                + f"{factorize_summary['factorized_parameters']} of "
+                + f"{factorize_summary['parameters']}, accuracy: "
+                + f"{factorize_summary['factorized_accuracy']:.4f} ("
+                + f"{factorize_summary['accuracy']:.4f}"
+                + (", reverted)" if factorize_summary["reverted"]
+                   else ")")
+            )
+
+            if factorizer.recovery_epochs > 0 \
+                    and not factorize_summary["reverted"]:
+                logger.info("Fine tuning factorized BERT evaluator")
+                recovery_history = WoodgateProcess.recover(
+                    bert_model=bert_model,
+                    data=data,
+                    trainer=trainer,
+                    epochs=factorizer.recovery_epochs,
+                    optimizer=optimizer,
+                    loss=loss,
+                    metrics=metrics,
+                    compile_profile=compile_profile
+                )
+                factorizer.summary["recovery_history"] = \
+                    recovery_history.history
+            factorizer.create_factorize_json(file_system)
+
         logger.info(
             "Evaluating evaluator accuracy"
         )
@@ -281,11 +576,119 @@ class WoodgateProcess:
             file_system
         )
 
+        warmup_data = None
+        if serving_warmup_batch_sizes:
+            if serving_warmup_file is not None:
+                warmup_data = Preprocessor.encode(
+                    Preprocessor.tokenizer_factory(
+                        file_system.get_bert_vocab_path()
+                    ),
+                    Preprocessor.read_texts(
+                        serving_warmup_file,
+                        limit=1000
+                    ),
+                    data.max_sequence_length
+                )
+            else:
+                warmup_data = Evaluator.get_regression_token_ids(
+                    data=data,
+                    file_system=file_system
+                )
+
         logger.info("Saving evaluator to disk")
         Storage.save_model(
             bert_model=bert_model,
-            file_system=file_system
-        )
+            file_system=file_system,
+            warmup_data=warmup_data,
+            warmup_batch_sizes=serving_warmup_batch_sizes
+        )
+        if warmup_data is not None:
+            logger.info(
+                "Saved TensorFlow Serving warmup requests: "
+                + f"{Storage.get_warmup_requests_path(file_system)}"
+            )
+
+        if fast_model:
+            logger.info(
+                "Exporting fast model: "
+                + f"{Storage.get_fast_model_path(file_system)}"
+            )
+            Storage.save_fast_model(
+                bert_model=bert_model,
+                file_system=file_system
+            )
+
+            if cold_start_benchmark:
+                logger.info("Benchmarking cold start")
+                cold_start_summary = Storage.benchmark_cold_start(
+                    file_system
+                )
+                logger.info(
+                    "Cold start load time: "
+                    + f"{cold_start_summary['keras']['load_s']:.2f} s "
+                    + "(SavedModel), "
+                    + f"{cold_start_summary['fast']['load_s']:.2f} s "
+                    + "(fast model)"
+                )
+                Storage.create_cold_start_json(
+                    benchmark=cold_start_summary,
+                    file_system=file_system
+                )
+
+        if export_serving_model:
+            logger.info(
+                "Exporting serving model: "
+                + f"{Storage.get_serving_model_path(file_system)}"
+            )
+            Storage.save_serving_model(
+                bert_model=bert_model,
+                file_system=file_system,
+                intents=data.intents
+            )
+
+        if tflite_quantization is not None:
+            logger.info(
+                f"Exporting {tflite_quantization} quantized "
+                + "TFLite model"
+            )
+            Storage.save_tflite_model(
+                bert_model=bert_model,
+                file_system=file_system,
+                quantization=tflite_quantization,
+                representative_data=data.train_x
+            )
+
+            logger.info("Comparing quantized model")
+            quantization_report = Evaluator.compare_quantized_model(
+                model=bert_model,
+                tflite_model_path=Storage.get_tflite_model_path(
+                    file_system
+                ),
+                data=data,
+                file_system=file_system
+            )
+            logger.info(
+                "Quantized accuracy delta: "
+                + f"{quantization_report['accuracy_delta']:+.4f}, "
+                + "latency speedup: "
+                + f"{quantization_report['latency_speedup']:.2f}x"
+            )
+            Evaluator.create_quantization_report_json(file_system)
+
+        if artifact_store is not None:
+            logger.info(
+                "Storing build artifacts: "
+                + f"{artifact_store.store_dir}"
+            )
+            artifact_store_summary = artifact_store.put(
+                file_system.build_dir
+            )
+            logger.info(
+                f"Stored {artifact_store_summary['bytes']} bytes, "
+                + f"{artifact_store_summary['shared_bytes']} bytes "
+                + "shared with previous builds"
+            )
+            artifact_store.create_artifact_store_json(file_system)
 
         build_duration = datetime.datetime.now() - start_time
         logger.info(
@@ -294,3 +697,66 @@ class WoodgateProcess:
         )
 
         return None
+
+    @staticmethod
+    def recover(
+            bert_model: keras.Model,
+            data: Preprocessor,
+            trainer: Trainer,
+            epochs: int,
+            optimizer: keras.optimizers.Optimizer,
+            loss: keras.losses.Loss,
+            metrics: List[keras.metrics.Metric],
+            compile_profile: str = "default"
+    ) -> Optional[keras.callbacks.History]:
+        """This method recompiles `bert_model` after its weights
+        were replaced (e.g. by pruning or factorizing) with a
+        fresh copy of `optimizer`, since the optimizer state
+        belongs to the previous weights, and fine tunes it for
+        `epochs` epochs with the settings of `trainer`.
+
+        :param bert_model:
+        :type bert_model: keras.Model
+        :param data:
+        :type data: Preprocessor
+        :param trainer: The trainer of the build.
+        :type trainer: Trainer
+        :param epochs: The number of recovery epochs, if `0` the \
+        model is only recompiled.
+        :type epochs: int
+        :param optimizer:
+        :type optimizer: keras.optimizers.Optimizer
+        :param loss:
+        :type loss: keras.losses.Loss
+        :param metrics:
+        :type metrics: List[keras.metrics.Metric]
+        :param compile_profile:
+        :type compile_profile: str
+        :return: The recovery history, `None` without recovery \
+        epochs.
+        :rtype: Optional[keras.callbacks.History]
+        """
+        Compiler.compile(
+            model=bert_model,
+            optimizer=optimizer.__class__.from_config(
+                optimizer.get_config(),
+                custom_objects={"WarmupDecay": WarmupDecay}
+            ),
+            loss=loss,
+            metrics=metrics,
+            profile=compile_profile
+        )
+
+        if epochs < 1:
+            return None
+
+        return Trainer(
+            validation_split=trainer.validation_split,
+            batch_size=trainer.batch_size,
+            epochs=epochs,
+            learning_rate_schedule=trainer.learning_rate_schedule,
+            warmup_proportion=trainer.warmup_proportion
+        ).fit(
+            bert_model=bert_model,
+            data=data
+        )
@@ -35,6 +35,25 @@ class Model:
             # TODO - This should be logged.
             self.model_uuid: str = str(uuid.uuid4())
 
+    @staticmethod
+    def is_model_uuid(model_uuid: str) -> bool:
+        """This method returns whether or not `model_uuid` is a
+        (v4) UUID, which `Model` keeps instead of replacing it by
+        a random one.
+
+        :param model_uuid:
+        :type model_uuid: str
+        :return:
+        :rtype: bool
+        """
+        try:
+            # `version` overrides the version bits, so other
+            # UUIDs do not round trip
+            return str(uuid.UUID(model_uuid, version=4)) \
+                == model_uuid.lower()
+        except (ValueError, TypeError, AttributeError):
+            return False
+
 
 class Architecture:
     """
@@ -61,7 +80,10 @@ class Architecture:
             clf_out_dropout_rate: float,
             clf_out_activation: str,
             logits_dropout_rate: float,
-            logits_activation: str
+            logits_activation: str,
+            adapter_size: int = None,
+            num_layers: int = None,
+            intermediate_size: int = None
     ):
         """
 
@@ -73,6 +95,12 @@ class Architecture:
         :type logits_dropout_rate:
         :param logits_activation:
         :type logits_activation:
+        :param adapter_size:
+        :type adapter_size:
+        :param num_layers:
+        :type num_layers:
+        :param intermediate_size:
+        :type intermediate_size:
         """
         #: The `clf_out_dropout_rate` attribute represents one
         #: of two (1 / 2) dropout rates which may be customized.
@@ -114,6 +142,39 @@ class Architecture:
         else:
             raise ValueError("invalid activation identifier")
 
+        #: The `adapter_size` attribute represents the hidden
+        #: size of the adapter modules inserted into each BERT
+        #: encoder (see `https://arxiv.org/abs/1902.00751`).
+        #: When the `adapter_size` attribute is set, the original
+        #: BERT weights (except the layer norms) are frozen and
+        #: only the adapter modules and the classifier head are
+        #: trained. This attribute is set via the
+        #: `--adapter_size` command line argument. If the
+        #: `--adapter_size` command line argument is not set,
+        #: then the `adapter_size` defaults to `None` (full fine
+        #: tuning).
+        if adapter_size is not None and adapter_size < 1:
+            raise ValueError("adapter_size must be at least 1")
+        self.adapter_size: int = adapter_size
+
+        #: The `num_layers` attribute represents the number of
+        #: BERT encoder layers. It overrides the BERT config and
+        #: is set by `Pruner` for pruned models. If the
+        #: `num_layers` attribute is `None`, the number of layers
+        #: of the BERT config is used.
+        if num_layers is not None and num_layers < 1:
+            raise ValueError("num_layers must be at least 1")
+        self.num_layers: int = num_layers
+
+        #: The `intermediate_size` attribute represents the width
+        #: of the BERT feed forward layers. It overrides the BERT
+        #: config and is set by `Pruner` for pruned models. If the
+        #: `intermediate_size` attribute is `None`, the width of
+        #: the BERT config is used.
+        if intermediate_size is not None and intermediate_size < 1:
+            raise ValueError("intermediate_size must be at least 1")
+        self.intermediate_size: int = intermediate_size
+
 
 class Build:
     """
@@ -128,6 +189,17 @@ class Build:
     build_version: str = \
         datetime.datetime.now().strftime("%Y%m%d%H%M%S")
 
+    def __init__(self, build_version: str = None):
+        """
+
+        :param build_version: The version of an existing build. \
+        If `None`, the `build_version` of the current process is \
+        used.
+        :type build_version: str
+        """
+        if build_version is not None:
+            self.build_version: str = build_version
+
 
 class FileSystem:
     """
@@ -488,6 +560,25 @@ class FileSystem:
             )
         )
 
+        #: The `artifact_store_dir` attribute represents a
+        #: directory on the host file system where the blobs of
+        #: the build artifacts are stored, see
+        #: `woodgate.trainer.artifact_store.ArtifactStore`. This
+        #: attribute is set via the `ARTIFACT_STORE_DIR`
+        #: environment variable. If the `ARTIFACT_STORE_DIR`
+        #: environment variable is not set, then the
+        #: `artifact_store_dir` attribute defaults to
+        #: `$WOODGATE_BASE_DIR/artifacts`. The program will
+        #: attempt to create `ARTIFACT_STORE_DIR` if it does not
+        #: already exist.
+        self.artifact_store_dir: str = os.getenv(
+            "ARTIFACT_STORE_DIR",
+            os.path.join(
+                self.woodgate_base_dir,
+                "artifacts"
+            )
+        )
+
         #: The `bert_config_file` attribute represents the name
         #: of the BERT configuration JSON file. This attribute is
         #: set via the `BERT_CONFIG_FILE` environment variable.
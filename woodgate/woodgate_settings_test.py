@@ -4,7 +4,7 @@ contains unit tests related to the woodgate_setting.py module.
 """
 import uuid
 import unittest
-from .woodgate_settings import Model
+from .woodgate_settings import Model, Architecture
 
 
 class TestWoodgateSettingsDefaults(unittest.TestCase):
@@ -26,6 +26,55 @@ class TestWoodgateSettingsDefaults(unittest.TestCase):
 
         self.assertTrue(model.model_uuid, test_uuid)
 
+    def test_is_model_uuid(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        test_uuid = str(uuid.uuid4())
+
+        self.assertTrue(Model.is_model_uuid(test_uuid))
+        self.assertTrue(Model.is_model_uuid(test_uuid.upper()))
+        # not a v4 UUID, `Model` would replace it
+        self.assertFalse(Model.is_model_uuid(str(uuid.uuid1())))
+        self.assertFalse(Model.is_model_uuid("../models"))
+        self.assertFalse(Model.is_model_uuid(None))
+
+    def test_architecture_adapter_size(self) -> None:
+        """
+
+        :return:
+        :rtype:
+        """
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax"
+        )
+
+        self.assertIsNone(architecture.adapter_size)
+
+        architecture = Architecture(
+            clf_out_dropout_rate=0.5,
+            clf_out_activation="tanh",
+            logits_dropout_rate=0.5,
+            logits_activation="softmax",
+            adapter_size=16
+        )
+
+        self.assertEqual(architecture.adapter_size, 16)
+
+        with self.assertRaises(ValueError):
+            Architecture(
+                clf_out_dropout_rate=0.5,
+                clf_out_activation="tanh",
+                logits_dropout_rate=0.5,
+                logits_activation="softmax",
+                adapter_size=0
+            )
+
 
 if __name__ == '__main__':
     unittest.main()